@@ -10,6 +10,8 @@ Each router handles a specific domain of functionality:
 - documents: Individual document extraction and tamper detection
 - erp: Customer records and ERP integration
 - health: System health checks
+- metrics: Prometheus scrape endpoint
+- usage: Groq token usage from the shared ledger
 """
 
 from . import auth
@@ -18,6 +20,8 @@ from . import emails
 from . import erp
 from . import health
 from . import kyc
+from . import metrics
+from . import usage
 
 __all__ = [
     "auth",
@@ -26,4 +30,6 @@ __all__ = [
     "erp",
     "health",
     "kyc",
+    "metrics",
+    "usage",
 ]
\ No newline at end of file
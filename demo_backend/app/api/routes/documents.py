@@ -3,7 +3,7 @@ from fastapi import APIRouter, UploadFile, Depends, HTTPException, status
 from typing import Any
 
 from ...models.document import DocumentAnalysisResponse, TamperDetectionResponse
-from ...services.document_service import analyze_document, detect_tamper
+from ...services.document_service import analyze_document, detect_tamper, get_document_cache_stats
 from ...dependencies import get_current_user  # Simple auth dependency
 
 router = APIRouter(prefix="/documents", tags=["documents"])
@@ -92,4 +92,10 @@ async def tamper_detection_endpoint(
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="An unexpected error occurred during tamper detection.",
-        )
\ No newline at end of file
+        )
+
+
+@router.get("/cache/stats")
+async def document_cache_stats(user: Any = Depends(get_current_user)):
+    """Hit/miss counters of the content-addressed analysis and tamper caches"""
+    return get_document_cache_stats()
@@ -1,9 +1,16 @@
 # demo_backend/app/api/routes/emails.py
+import time
 from fastapi import APIRouter, HTTPException, Depends
 from typing import Any
 
-from app.models.email import EmailClassificationRequest, EmailClassificationResponse
-from app.services.email_service import classify_email
+from app.models.email import (
+    EmailClassificationRequest,
+    EmailClassificationResponse,
+    EmailBatchClassificationRequest,
+    EmailBatchClassificationResponse
+)
+from app.models.kyc import EmailClassificationResult
+from app.services.email_service import classify_email, classify_emails, get_email_cache_stats
 from app.dependencies import get_current_user  # Simple auth dependency
 
 router = APIRouter(prefix="/emails", tags=["emails"])
@@ -22,7 +29,7 @@ async def classify_email_endpoint(
     """
     try:
         # Call the KYC classification service
-        result = classify_email(
+        result = await classify_email(
             subject=email_request.subject,
             body=email_request.body,
             user=user  # Pass user context for personalization
@@ -42,4 +49,38 @@ async def classify_email_endpoint(
         raise HTTPException(
             status_code=500, 
             detail="Error processing KYC email classification."
-        )
\ No newline at end of file
+        )
+
+
+@router.post("/classify-batch", response_model=EmailBatchClassificationResponse)
+async def classify_email_batch_endpoint(
+    batch_request: EmailBatchClassificationRequest,
+    user: Any = Depends(get_current_user)
+):
+    """
+    Classify several emails at once. Uncached emails are grouped into
+    batched Groq requests that share a single system prompt, so the token
+    cost per email is much lower than calling `/emails/classify` repeatedly.
+    """
+    start_time = time.time()
+    try:
+        results = await classify_emails(
+            [(email.subject, email.body) for email in batch_request.emails],
+            user=user
+        )
+        return EmailBatchClassificationResponse(
+            results=[EmailClassificationResult(**result) for result in results],
+            processing_time=round(time.time() - start_time, 2)
+        )
+    except Exception as e:
+        print(f"Batch Email Classification Error: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail="Error processing batch KYC email classification."
+        )
+
+
+@router.get("/cache/stats")
+async def email_cache_stats(user: Any = Depends(get_current_user)):
+    """Hit/miss counters of the classification response cache"""
+    return get_email_cache_stats()
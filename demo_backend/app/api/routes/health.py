@@ -1,5 +1,18 @@
 from fastapi import APIRouter
+
+from ...services.circuit_breaker import get_circuit_breaker_states
+from ...services.cpu_pool import get_cpu_pool_stats
+from ...services.hedging import get_hedge_states
+
 router = APIRouter(prefix="/health", tags=["health"])
 @router.get("/")
 async def get_health():
-    return {"message": "Health module active"}
\ No newline at end of file
+    breakers = get_circuit_breaker_states()
+    return {
+        "message": "Health module active",
+        # Open breakers mean AI features are currently served by fallbacks
+        "status": "degraded" if any(b["state"] != "closed" for b in breakers.values()) else "ok",
+        "circuit_breakers": breakers,
+        "hedging": get_hedge_states(),
+        "document_cpu_pool": get_cpu_pool_stats()
+    }
\ No newline at end of file
@@ -1,21 +1,62 @@
 # demo_backend/app/api/routes/kyc.py
-from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Form
+import json
+from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Form, Header, Response, status
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
 from typing import List, Optional, Any
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from ...models.kyc import KYCWorkflowRequest, KYCWorkflowResponse
-from ...services.kyc_service import process_complete_kyc_workflow
+from ...models.kyc import (
+    KYCWorkflowRequest,
+    KYCWorkflowResponse,
+    KYCJobSubmitResponse,
+    KYCJobStatusResponse
+)
+from ...services.kyc_service import (
+    process_complete_kyc_workflow,
+    process_idempotent_kyc_workflow,
+    read_attachments,
+    stream_kyc_workflow
+)
+from ...services.kyc_jobs import KYCJobQueueFull, get_kyc_job_manager
+from ...services.idempotency import (
+    MAX_IDEMPOTENCY_KEY_LENGTH,
+    IdempotencyKeyInProgress,
+    IdempotencyKeyMismatch
+)
 from ...dependencies import get_current_user, get_db
 
 router = APIRouter(prefix="/kyc", tags=["kyc"])
 
+
+def _validate_submission(subject: str, body: str, attachments: Optional[List[UploadFile]]) -> None:
+    # Validate required fields
+    if not subject or not body:
+        raise HTTPException(
+            status_code=400,
+            detail="Both subject and body are required"
+        )
+
+    # Validate attachments if provided
+    if attachments:
+        for file in attachments:
+            if not file.filename:
+                raise HTTPException(
+                    status_code=400,
+                    detail="All uploaded files must have filenames"
+                )
+
+
 @router.post("/process-complete", response_model=KYCWorkflowResponse)
 async def process_complete_kyc(
+    response: Response,
     # Form fields for email content
     subject: str = Form(..., description="Email subject"),
     body: str = Form(..., description="Email body content"),
     # Optional file attachments
     attachments: Optional[List[UploadFile]] = File(None, description="Document attachments"),
+    # Optional client-generated key that makes retries safe
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
     # Dependencies
     db: AsyncSession = Depends(get_db),
     user: Any = Depends(get_current_user)
@@ -23,45 +64,55 @@ async def process_complete_kyc(
     """
     Complete KYC workflow endpoint that processes:
     1. Email classification (Onboarding/Dispute/Other)
-    2. Document analysis (if attachments provided) 
+    2. Document analysis (if attachments provided)
     3. Tamper detection (if attachments provided)
     4. Odoo ERP integration (real customer record creation)
-    
+
     This is the main endpoint used by the frontend complete workflow demo.
+
+    Send an `Idempotency-Key` header to make retries safe: a repeated key
+    returns the stored result (flagged with `Idempotent-Replayed: true`)
+    instead of processing the submission and creating Odoo records again.
     """
     try:
-        # Validate required fields
-        if not subject or not body:
+        _validate_submission(subject, body, attachments)
+        if idempotency_key is not None and not 0 < len(idempotency_key) <= MAX_IDEMPOTENCY_KEY_LENGTH:
             raise HTTPException(
                 status_code=400,
-                detail="Both subject and body are required"
+                detail=f"Idempotency-Key must be 1-{MAX_IDEMPOTENCY_KEY_LENGTH} characters"
             )
-        
-        # Validate attachments if provided
-        if attachments:
-            for file in attachments:
-                if not file.filename:
-                    raise HTTPException(
-                        status_code=400,
-                        detail="All uploaded files must have filenames"
-                    )
-        
+
         # Create request object
         workflow_request = KYCWorkflowRequest(
             subject=subject,
             body=body,
             attachments=attachments or []
         )
-        
+
+        if idempotency_key:
+            try:
+                result, replayed = await process_idempotent_kyc_workflow(
+                    request=workflow_request,
+                    user=user,
+                    idempotency_key=idempotency_key
+                )
+            except IdempotencyKeyMismatch as e:
+                raise HTTPException(status_code=422, detail=str(e))
+            except IdempotencyKeyInProgress as e:
+                raise HTTPException(status_code=409, detail=str(e), headers={"Retry-After": "5"})
+            if replayed:
+                response.headers["Idempotent-Replayed"] = "true"
+            return result
+
         # Process the complete workflow WITH ODOO INTEGRATION
         result = await process_complete_kyc_workflow(
             request=workflow_request,
             user=user,
             db=db
         )
-        
+
         return result
-        
+
     except HTTPException:
         raise
     except Exception as e:
@@ -71,13 +122,104 @@ async def process_complete_kyc(
             detail=f"Error processing complete KYC workflow: {str(e)}"
         )
 
+def _sse_event(event: str, payload: Any) -> str:
+    if isinstance(payload, BaseModel):
+        data = payload.model_dump_json(by_alias=True)
+    else:
+        data = json.dumps(payload, default=str)
+    return f"event: {event}\ndata: {data}\n\n"
+
+@router.post("/process-complete/stream")
+async def process_complete_kyc_stream(
+    subject: str = Form(..., description="Email subject"),
+    body: str = Form(..., description="Email body content"),
+    attachments: Optional[List[UploadFile]] = File(None, description="Document attachments"),
+    user: Any = Depends(get_current_user)
+):
+    """
+    Streaming variant of `/kyc/process-complete` using server-sent events.
+
+    Emits `email_classification`, `document_analysis` (one per attachment),
+    `tamper_detection` (one per attachment) and `erp_integration` events as
+    each stage finishes, then a final `complete` event with the full
+    KYCWorkflowResponse (or `error`).
+    """
+    _validate_submission(subject, body, attachments)
+
+    # Read uploads before the response starts; the stream outlives the form parser
+    documents = await read_attachments(attachments or [])
+    # Started here, not on the first read, so the uploads are released even if the client never reads
+    events = stream_kyc_workflow(subject, body, documents, user)
+
+    async def event_stream():
+        async for event, payload in events:
+            yield _sse_event(event, payload)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.post("/jobs", response_model=KYCJobSubmitResponse, status_code=status.HTTP_202_ACCEPTED)
+async def submit_kyc_job(
+    subject: str = Form(..., description="Email subject"),
+    body: str = Form(..., description="Email body content"),
+    attachments: Optional[List[UploadFile]] = File(None, description="Document attachments"),
+    user: Any = Depends(get_current_user)
+):
+    """
+    Queue the complete KYC workflow and return immediately with a job id.
+    Poll `GET /kyc/jobs/{job_id}` for stage progress and the final result.
+    """
+    _validate_submission(subject, body, attachments)
+
+    # Uploads are closed when the request ends, so read them before queueing
+    documents = await read_attachments(attachments or [])
+    try:
+        job = get_kyc_job_manager().submit(subject, body, documents, user)
+    except KYCJobQueueFull as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": "30"}
+        )
+
+    return KYCJobSubmitResponse(
+        job_id=job.id,
+        status=job.status,
+        status_url=f"{router.prefix}/jobs/{job.id}"
+    )
+
+@router.get("/jobs/{job_id}", response_model=KYCJobStatusResponse)
+async def get_kyc_job(job_id: str, user: Any = Depends(get_current_user)):
+    """Report stage progress and, once finished, the workflow result of a queued job."""
+    job = get_kyc_job_manager().get(job_id)
+    if job is None or job.owner_email != getattr(user, "email", None):
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    return KYCJobStatusResponse(
+        job_id=job.id,
+        status=job.status,
+        stages=dict(job.stages),
+        result=job.result,
+        error=job.error,
+        created_at=job.created_at,
+        started_at=job.started_at,
+        finished_at=job.finished_at
+    )
+
 @router.get("/health")
 async def kyc_health_check():
     """Health check for KYC workflow service"""
     return {
         "status": "healthy",
         "service": "KYC Complete Workflow with Odoo",
+        "job_queue_depth": get_kyc_job_manager().queue_depth,
         "endpoints": [
-            "POST /kyc/process-complete - Complete KYC automation workflow with real Odoo ERP"
+            "POST /kyc/process-complete - Complete KYC automation workflow with real Odoo ERP",
+            "POST /kyc/process-complete/stream - Same workflow streamed as server-sent events per stage",
+            "POST /kyc/jobs - Queue the complete workflow and return a job id",
+            "GET /kyc/jobs/{job_id} - Poll a queued workflow for progress and result"
         ]
-    }
\ No newline at end of file
+    }
@@ -0,0 +1,12 @@
+# demo_backend/app/api/routes/metrics.py
+from fastapi import APIRouter, Response
+
+from ...services.metrics import render_metrics
+
+router = APIRouter(tags=["metrics"])
+
+@router.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """Prometheus scrape endpoint"""
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
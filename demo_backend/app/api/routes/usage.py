@@ -0,0 +1,17 @@
+# demo_backend/app/api/routes/usage.py
+from fastapi import APIRouter, Depends
+from typing import Any
+
+from ...services.groq_client import get_groq_client
+from ...services.token_ledger import user_id_of
+from ...dependencies import get_current_user  # Simple auth dependency
+
+router = APIRouter(prefix="/usage", tags=["usage"])
+
+@router.get("/tokens")
+async def token_usage(user: Any = Depends(get_current_user)):
+    """
+    Today's Groq token usage across all workers (by model and for the
+    calling user) next to this worker's own counters and rate limiter state.
+    """
+    return await get_groq_client().usage_report(user_id_of(user))
@@ -33,6 +33,10 @@ class Settings(BaseModel):
     GROQ_API_KEY: str = Field(
         default_factory=lambda: os.getenv("GROQ_API_KEY", "")
     )
+    # Alternative API endpoint, e.g. the record/replay stand-in (app/devtools/groq_standin.py); empty uses Groq
+    GROQ_BASE_URL: str = Field(
+        default_factory=lambda: os.getenv("GROQ_BASE_URL", "")
+    )
     GROQ_MODEL_EMAIL: str = Field(
         default_factory=lambda: os.getenv("GROQ_MODEL_EMAIL", "openai/gpt-oss-20b")
     )
@@ -45,6 +49,85 @@ class Settings(BaseModel):
     GROQ_TEMPERATURE: float = Field(
         default_factory=lambda: float(os.getenv("GROQ_TEMPERATURE", "0.1"))
     )
+    # Shared keep-alive connection pool for all Groq calls in this process
+    GROQ_MAX_CONNECTIONS: int = Field(
+        default_factory=lambda: int(os.getenv("GROQ_MAX_CONNECTIONS", "100"))
+    )
+    GROQ_MAX_KEEPALIVE_CONNECTIONS: int = Field(
+        default_factory=lambda: int(os.getenv("GROQ_MAX_KEEPALIVE_CONNECTIONS", "20"))
+    )
+    GROQ_KEEPALIVE_EXPIRY: float = Field(
+        default_factory=lambda: float(os.getenv("GROQ_KEEPALIVE_EXPIRY", "30"))
+    )
+    GROQ_CONNECT_TIMEOUT: float = Field(
+        default_factory=lambda: float(os.getenv("GROQ_CONNECT_TIMEOUT", "5"))
+    )
+    GROQ_REQUEST_TIMEOUT: float = Field(
+        default_factory=lambda: float(os.getenv("GROQ_REQUEST_TIMEOUT", "60"))
+    )
+    GROQ_MAX_RETRIES: int = Field(
+        default_factory=lambda: int(os.getenv("GROQ_MAX_RETRIES", "3"))  # retries on 429/5xx/connection errors
+    )
+    # Client-side throttling (0 disables a limit)
+    GROQ_REQUESTS_PER_MINUTE: int = Field(
+        default_factory=lambda: int(os.getenv("GROQ_REQUESTS_PER_MINUTE", "30"))
+    )
+    GROQ_TOKENS_PER_MINUTE: int = Field(
+        default_factory=lambda: int(os.getenv("GROQ_TOKENS_PER_MINUTE", "60000"))
+    )
+    GROQ_MAX_CONCURRENCY: int = Field(
+        default_factory=lambda: int(os.getenv("GROQ_MAX_CONCURRENCY", "8"))
+    )
+    GROQ_BACKOFF_BASE_SECONDS: float = Field(
+        default_factory=lambda: float(os.getenv("GROQ_BACKOFF_BASE_SECONDS", "1"))
+    )
+    GROQ_BACKOFF_MAX_SECONDS: float = Field(
+        default_factory=lambda: float(os.getenv("GROQ_BACKOFF_MAX_SECONDS", "30"))
+    )
+    # Per-model circuit breaker: open on error/slow-call rate, serve fallbacks while open
+    GROQ_BREAKER_FAILURE_RATE: float = Field(
+        default_factory=lambda: float(os.getenv("GROQ_BREAKER_FAILURE_RATE", "0.5"))
+    )
+    GROQ_BREAKER_SLOW_CALL_SECONDS: float = Field(
+        default_factory=lambda: float(os.getenv("GROQ_BREAKER_SLOW_CALL_SECONDS", "20"))
+    )
+    GROQ_BREAKER_SLOW_CALL_RATE: float = Field(
+        default_factory=lambda: float(os.getenv("GROQ_BREAKER_SLOW_CALL_RATE", "0.8"))
+    )
+    GROQ_BREAKER_WINDOW: int = Field(
+        default_factory=lambda: int(os.getenv("GROQ_BREAKER_WINDOW", "20"))  # most recent calls considered
+    )
+    GROQ_BREAKER_MIN_CALLS: int = Field(
+        default_factory=lambda: int(os.getenv("GROQ_BREAKER_MIN_CALLS", "5"))
+    )
+    GROQ_BREAKER_OPEN_SECONDS: float = Field(
+        default_factory=lambda: float(os.getenv("GROQ_BREAKER_OPEN_SECONDS", "30"))
+    )
+    GROQ_BREAKER_HALF_OPEN_PROBES: int = Field(
+        default_factory=lambda: int(os.getenv("GROQ_BREAKER_HALF_OPEN_PROBES", "2"))
+    )
+    # Hedging: duplicate a call that is slower than most recent ones, first answer wins
+    GROQ_HEDGE_ENABLED: bool = Field(
+        default_factory=lambda: os.getenv("GROQ_HEDGE_ENABLED", "False").lower() == "true"
+    )
+    GROQ_HEDGE_OPERATIONS: str = Field(
+        default_factory=lambda: os.getenv("GROQ_HEDGE_OPERATIONS", "email_classification")  # comma-separated
+    )
+    GROQ_HEDGE_PERCENTILE: float = Field(
+        default_factory=lambda: float(os.getenv("GROQ_HEDGE_PERCENTILE", "95"))
+    )
+    GROQ_HEDGE_MAX_RATIO: float = Field(
+        default_factory=lambda: float(os.getenv("GROQ_HEDGE_MAX_RATIO", "0.05"))  # hedges per request, at most
+    )
+    GROQ_HEDGE_WINDOW: int = Field(
+        default_factory=lambda: int(os.getenv("GROQ_HEDGE_WINDOW", "200"))  # recent latencies considered
+    )
+    GROQ_HEDGE_MIN_SAMPLES: int = Field(
+        default_factory=lambda: int(os.getenv("GROQ_HEDGE_MIN_SAMPLES", "20"))
+    )
+    GROQ_HEDGE_MIN_DELAY_SECONDS: float = Field(
+        default_factory=lambda: float(os.getenv("GROQ_HEDGE_MIN_DELAY_SECONDS", "0.2"))
+    )
     
     # --- KYC Processing Settings ---
     KYC_MAX_FILE_SIZE: int = Field(
@@ -59,6 +142,79 @@ class Settings(BaseModel):
     KYC_ENABLE_RATE_LIMITING: bool = Field(
         default_factory=lambda: os.getenv("KYC_ENABLE_RATE_LIMITING", "True").lower() == "true"
     )
+    KYC_DOCUMENT_WORKERS: int = Field(
+        default_factory=lambda: int(os.getenv("KYC_DOCUMENT_WORKERS", "4"))  # attachments processed in parallel
+    )
+
+    # --- KYC Background Jobs ---
+    KYC_JOB_WORKERS: int = Field(
+        default_factory=lambda: int(os.getenv("KYC_JOB_WORKERS", "2"))
+    )
+    KYC_JOB_QUEUE_SIZE: int = Field(
+        default_factory=lambda: int(os.getenv("KYC_JOB_QUEUE_SIZE", "100"))
+    )
+    KYC_JOB_RETENTION_SECONDS: int = Field(
+        default_factory=lambda: int(os.getenv("KYC_JOB_RETENTION_SECONDS", "3600"))  # keep finished jobs 1h
+    )
+
+    # --- Email Classification Cache ---
+    EMAIL_CACHE_ENABLED: bool = Field(
+        default_factory=lambda: os.getenv("EMAIL_CACHE_ENABLED", "True").lower() == "true"
+    )
+    EMAIL_CACHE_MAX_ENTRIES: int = Field(
+        default_factory=lambda: int(os.getenv("EMAIL_CACHE_MAX_ENTRIES", "2048"))
+    )
+    EMAIL_CACHE_TTL_SECONDS: int = Field(
+        default_factory=lambda: int(os.getenv("EMAIL_CACHE_TTL_SECONDS", "86400"))
+    )
+    EMAIL_CACHE_DIR: str = Field(
+        default_factory=lambda: os.getenv("EMAIL_CACHE_DIR", "data/cache/emails")  # empty disables disk tier
+    )
+    EMAIL_CACHE_MAX_DISK_ENTRIES: int = Field(
+        default_factory=lambda: int(os.getenv("EMAIL_CACHE_MAX_DISK_ENTRIES", "50000"))  # oldest files pruned beyond this
+    )
+    # Bump whenever the classification prompts change so cached answers are not reused
+    EMAIL_PROMPT_VERSION: str = Field(
+        default_factory=lambda: os.getenv("EMAIL_PROMPT_VERSION", "1")
+    )
+
+    # --- Email Micro-Batching ---
+    EMAIL_BATCHING_ENABLED: bool = Field(
+        default_factory=lambda: os.getenv("EMAIL_BATCHING_ENABLED", "False").lower() == "true"
+    )
+    EMAIL_BATCH_MAX_SIZE: int = Field(
+        default_factory=lambda: int(os.getenv("EMAIL_BATCH_MAX_SIZE", "8"))
+    )
+    EMAIL_BATCH_WINDOW_MS: int = Field(
+        default_factory=lambda: int(os.getenv("EMAIL_BATCH_WINDOW_MS", "50"))  # wait for more emails before sending
+    )
+
+    # --- Local Email Fast Path ---
+    # Linear classifier trained offline on logged LLM labels; confident predictions skip Groq
+    EMAIL_FAST_PATH_ENABLED: bool = Field(
+        default_factory=lambda: os.getenv("EMAIL_FAST_PATH_ENABLED", "True").lower() == "true"
+    )
+    EMAIL_FAST_PATH_MODEL: str = Field(
+        default_factory=lambda: os.getenv("EMAIL_FAST_PATH_MODEL", "data/models/email_classifier.json")
+    )
+    EMAIL_FAST_PATH_THRESHOLD: float = Field(
+        default_factory=lambda: float(os.getenv("EMAIL_FAST_PATH_THRESHOLD", "0.9"))
+    )
+    # Opt-in: the log holds raw customer email text
+    EMAIL_LABEL_LOG: str = Field(
+        default_factory=lambda: os.getenv("EMAIL_LABEL_LOG", "")  # e.g. data/training/email_labels.jsonl
+    )
+    EMAIL_LABEL_LOG_MAX_BYTES: int = Field(
+        default_factory=lambda: int(os.getenv("EMAIL_LABEL_LOG_MAX_BYTES", "52428800"))  # 50MB, then logging stops
+    )
+
+    # --- Idempotency Keys ---
+    IDEMPOTENCY_KEY_TTL_SECONDS: int = Field(
+        default_factory=lambda: int(os.getenv("IDEMPOTENCY_KEY_TTL_SECONDS", "86400"))  # replay results for 24h
+    )
+    IDEMPOTENCY_LOCK_TIMEOUT_SECONDS: int = Field(
+        default_factory=lambda: int(os.getenv("IDEMPOTENCY_LOCK_TIMEOUT_SECONDS", "600"))  # reclaim abandoned keys
+    )
     
     # --- Token Usage Tracking ---
     GROQ_DAILY_TOKEN_LIMIT: int = Field(
@@ -67,7 +223,70 @@ class Settings(BaseModel):
     GROQ_ENABLE_TOKEN_TRACKING: bool = Field(
         default_factory=lambda: os.getenv("GROQ_ENABLE_TOKEN_TRACKING", "True").lower() == "true"
     )
+    # Workers claim the shared daily budget in leases and flush usage in batches
+    GROQ_TOKEN_LEASE_SIZE: int = Field(
+        default_factory=lambda: int(os.getenv("GROQ_TOKEN_LEASE_SIZE", "5000"))
+    )
+    GROQ_LEDGER_FLUSH_SECONDS: float = Field(
+        default_factory=lambda: float(os.getenv("GROQ_LEDGER_FLUSH_SECONDS", "5"))
+    )
+    GROQ_LEDGER_FLUSH_TOKENS: int = Field(
+        default_factory=lambda: int(os.getenv("GROQ_LEDGER_FLUSH_TOKENS", "20000"))
+    )
     
+    # --- Document Result Cache ---
+    DOCUMENT_CACHE_ENABLED: bool = Field(
+        default_factory=lambda: os.getenv("DOCUMENT_CACHE_ENABLED", "True").lower() == "true"
+    )
+    DOCUMENT_CACHE_MAX_ENTRIES: int = Field(
+        default_factory=lambda: int(os.getenv("DOCUMENT_CACHE_MAX_ENTRIES", "512"))
+    )
+    DOCUMENT_CACHE_DIR: str = Field(
+        default_factory=lambda: os.getenv("DOCUMENT_CACHE_DIR", "data/cache/documents")  # empty disables disk tier
+    )
+    DOCUMENT_CACHE_MAX_DISK_ENTRIES: int = Field(
+        default_factory=lambda: int(os.getenv("DOCUMENT_CACHE_MAX_DISK_ENTRIES", "10000"))  # per cache; oldest files pruned beyond this
+    )
+    # Bump whenever extraction, prompts or tamper heuristics change so stale results are not served
+    DOCUMENT_PIPELINE_VERSION: str = Field(
+        default_factory=lambda: os.getenv("DOCUMENT_PIPELINE_VERSION", "2")
+    )
+
+    # --- Long Document Extraction ---
+    # Extracted text is split on page boundaries into chunks of at most this many
+    # (estimated) tokens; chunks are analysed concurrently and the results merged
+    DOCUMENT_CHUNK_TOKENS: int = Field(
+        default_factory=lambda: int(os.getenv("DOCUMENT_CHUNK_TOKENS", "2500"))
+    )
+    # Cap on document text tokens sent to Groq per document (the rest is not analysed)
+    DOCUMENT_MAX_TOKENS: int = Field(
+        default_factory=lambda: int(os.getenv("DOCUMENT_MAX_TOKENS", "12000"))
+    )
+    # Process pool for PDF text extraction and OCR (0 runs them in worker threads instead)
+    DOCUMENT_CPU_WORKERS: int = Field(
+        default_factory=lambda: int(os.getenv("DOCUMENT_CPU_WORKERS", "2"))
+    )
+    DOCUMENT_CPU_MAX_TASKS_PER_WORKER: int = Field(
+        default_factory=lambda: int(os.getenv("DOCUMENT_CPU_MAX_TASKS_PER_WORKER", "50"))  # then the process is replaced
+    )
+    DOCUMENT_CPU_TASK_TIMEOUT_SECONDS: float = Field(
+        default_factory=lambda: float(os.getenv("DOCUMENT_CPU_TASK_TIMEOUT_SECONDS", "60"))
+    )
+    # PDFs with more pages are extracted as ranges of this many pages on several pool workers
+    DOCUMENT_PDF_PAGES_PER_TASK: int = Field(
+        default_factory=lambda: int(os.getenv("DOCUMENT_PDF_PAGES_PER_TASK", "25"))
+    )
+    # Stream the analysis so the KYC workflow can resolve the customer before the answer is complete
+    DOCUMENT_STREAMING_ENABLED: bool = Field(
+        default_factory=lambda: os.getenv("DOCUMENT_STREAMING_ENABLED", "True").lower() == "true"
+    )
+
+    # --- Keyword Rules ---
+    # JSON keyword table for tags and fallback classification (empty uses the bundled table)
+    KEYWORD_RULES_PATH: str = Field(
+        default_factory=lambda: os.getenv("KEYWORD_RULES_PATH", "")
+    )
+
     # --- OCR Settings ---
     TESSERACT_CMD: str = Field(
         default_factory=lambda: os.getenv("TESSERACT_CMD", "tesseract")
@@ -8,6 +8,7 @@ from sqlalchemy.future import select
 from .config import settings
 from .models.user import User
 from .services.database import get_db
+from .services.metrics import AUTH_DB_SECONDS
 
 bearer_scheme = HTTPBearer(auto_error=False)
 
@@ -41,7 +42,8 @@ async def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    result = await db.execute(select(User).where(User.email == email.lower()))
+    with AUTH_DB_SECONDS.time():
+        result = await db.execute(select(User).where(User.email == email.lower()))
     user = result.scalar_one_or_none()
     if user is None:
         raise HTTPException(
@@ -0,0 +1,5 @@
+"""
+Developer tooling that is not part of the API: the Groq record/replay
+stand-in and the offline pipeline benchmark. Run as modules, e.g.
+`python -m app.devtools.groq_standin replay`.
+"""
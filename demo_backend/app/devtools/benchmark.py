@@ -0,0 +1,155 @@
+# demo_backend/app/devtools/benchmark.py
+"""
+Offline latency benchmark for the email and document paths.
+
+Runs `classify_email` / `analyze_document_handle` against whatever
+GROQ_BASE_URL points at (normally the record/replay stand-in, see
+groq_standin.py) and reports latency percentiles, throughput and how many
+results came from a fallback:
+
+    GROQ_BASE_URL=http://127.0.0.1:8900 python -m app.devtools.benchmark emails \\
+        --count 500 --concurrency 16
+    GROQ_BASE_URL=http://127.0.0.1:8900 python -m app.devtools.benchmark documents \\
+        --files samples/id.png samples/statement.pdf --count 50
+
+Result caches are bypassed unless --use-cache is given, so every call
+reaches the (stand-in) API.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import mimetypes
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from prometheus_client import REGISTRY
+
+from ..services import database, document_service, email_service
+from ..services.document_handle import DocumentHandle
+from ..services.groq_client import close_groq_client, get_groq_client
+from ..services.token_ledger import get_token_ledger
+
+SAMPLE_EMAILS = [
+    ("New account application", "Hello, I would like to open a new account. Please find my passport and utility bill attached."),
+    ("Urgent: verification rejected", "My KYC verification was rejected again and I need this resolved today. This is unacceptable."),
+    ("Question about requirements", "Could you tell me which documents are needed for a business account?"),
+    ("Resubmitting documents", "As requested I am resending my bank statement, the previous scan was unreadable."),
+]
+
+
+def _load_emails(path: Optional[str], count: int) -> List[Tuple[str, str]]:
+    """`count` emails from a JSON-lines file with subject/body (e.g. EMAIL_LABEL_LOG) or the built-in samples."""
+    if path:
+        with open(path, encoding="utf-8") as f:
+            records = [json.loads(line) for line in f if line.strip()]
+        emails = [(r.get("subject", ""), r.get("body", "")) for r in records]
+        return [emails[i % len(emails)] for i in range(count)] if emails else []
+    emails = []
+    for i in range(count):
+        subject, body = SAMPLE_EMAILS[i % len(SAMPLE_EMAILS)]
+        # Numbered so the samples are distinct requests, not cache or single-flight hits
+        emails.append((subject, f"{body}\n\nReference #{i}"))
+    return emails
+
+
+def _percentile(ordered: List[float], p: float) -> float:
+    return ordered[min(len(ordered) - 1, int(p / 100.0 * len(ordered)))]
+
+
+def _fallbacks(component: str) -> float:
+    return REGISTRY.get_sample_value("fallback_activations_total", {"component": component}) or 0.0
+
+
+async def _run(calls: List[Callable[[], Awaitable[Any]]], concurrency: int, component: str) -> Dict[str, Any]:
+    """Run every call with bounded concurrency and summarise latency and fallbacks."""
+    slots = asyncio.Semaphore(max(1, concurrency))
+    latencies: List[float] = []
+
+    async def timed(call: Callable[[], Awaitable[Any]]) -> None:
+        async with slots:
+            started = time.perf_counter()
+            await call()
+            latencies.append(time.perf_counter() - started)
+
+    fallbacks_before = _fallbacks(component)
+    started = time.perf_counter()
+    await asyncio.gather(*(timed(call) for call in calls))
+    elapsed = time.perf_counter() - started
+    ordered = sorted(latencies)
+    return {
+        "calls": len(ordered),
+        "fallbacks": int(_fallbacks(component) - fallbacks_before),
+        "seconds": round(elapsed, 2),
+        "throughput_per_second": round(len(ordered) / elapsed, 1) if elapsed else None,
+        "latency_ms": {
+            name: round(_percentile(ordered, p) * 1000, 1)
+            for name, p in (("p50", 50), ("p90", 90), ("p95", 95), ("p99", 99), ("max", 100))
+        } if ordered else {},
+    }
+
+
+def _email_calls(args: argparse.Namespace) -> List[Callable[[], Awaitable[Any]]]:
+    def call(subject: str, body: str) -> Callable[[], Awaitable[Any]]:
+        return lambda: email_service.classify_email(subject, body, None)
+    return [call(subject, body) for subject, body in _load_emails(args.samples, args.count)]
+
+
+def _document_calls(args: argparse.Namespace) -> List[Callable[[], Awaitable[Any]]]:
+    files = []
+    for path in args.files:
+        with open(path, "rb") as f:
+            content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+            files.append((os.path.basename(path), content_type, f.read()))
+
+    def call(filename: str, content_type: str, data: bytes) -> Callable[[], Awaitable[Any]]:
+        async def _analyze() -> Any:
+            handle = DocumentHandle(filename, content_type, data)
+            try:
+                return await document_service.analyze_document_handle(handle, None)
+            finally:
+                handle.close()
+        return _analyze
+    return [call(*files[i % len(files)]) for i in range(args.count)]
+
+
+async def _main(args: argparse.Namespace) -> Dict[str, Any]:
+    if not args.use_cache:
+        email_service._classification_cache = None
+        document_service._analysis_cache = None
+    # SQL echo would bury the report
+    database.engine.echo = False
+    await database.init_db()
+    ledger = get_token_ledger()
+    await ledger.start()
+    try:
+        if args.path == "emails":
+            report = await _run(_email_calls(args), args.concurrency, "email_classification")
+        else:
+            report = await _run(_document_calls(args), args.concurrency, "document_analysis")
+        report["groq"] = get_groq_client().get_usage_stats()
+        return report
+    finally:
+        await ledger.stop()
+        await close_groq_client()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the email or document path against GROQ_BASE_URL")
+    parser.add_argument("path", choices=["emails", "documents"])
+    parser.add_argument("--count", type=int, default=200, help="Number of calls")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--samples", help="JSON-lines file of emails (subject/body) instead of the built-in samples")
+    parser.add_argument("--files", nargs="+", default=[], help="Documents to analyse (documents path)")
+    parser.add_argument("--use-cache", action="store_true", help="Keep the result caches enabled")
+    args = parser.parse_args(argv)
+    if args.path == "documents" and not args.files:
+        parser.error("documents needs --files")
+
+    print(json.dumps(asyncio.run(_main(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
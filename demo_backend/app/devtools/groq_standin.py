@@ -0,0 +1,292 @@
+# demo_backend/app/devtools/groq_standin.py
+"""
+Record/replay stand-in for the Groq (OpenAI-compatible) chat completions API.
+
+Point the backend at it with GROQ_BASE_URL and run load tests or benchmarks
+without spending Groq quota:
+
+    # 1. record real traffic (requests are forwarded to Groq)
+    python -m app.devtools.groq_standin record --port 8900 \\
+        --store data/groq_recordings.jsonl
+
+    # 2. replay it offline with the latency and failures you want to test
+    python -m app.devtools.groq_standin replay --port 8900 \\
+        --store data/groq_recordings.jsonl --latency lognormal:0.6,0.5 \\
+        --error-rate 0.01 --rpm 300
+
+    GROQ_BASE_URL=http://127.0.0.1:8900 uvicorn app.main:app
+
+Recordings are keyed by a hash of the request (model, messages and sampling
+parameters; streaming is served from the same recording) and store the
+response and the upstream latency. Prompts are only written to the file
+with --store-requests, since they contain customer data.
+
+A replayed request without an exact recording gets a recorded answer to the
+same prompt template (same model and system prompt), chosen by its hash so
+runs are repeatable; --on-miss error turns that into a 404 instead.
+
+Latency specs: recorded[:SCALE], fixed:SECONDS, uniform:LOW,HIGH,
+normal:MEAN,STDDEV, lognormal:MEDIAN,SIGMA.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import os
+import random
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+import httpx
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+DEFAULT_UPSTREAM = "https://api.groq.com"
+COMPLETIONS_PATHS = ("/openai/v1/chat/completions", "/v1/chat/completions")
+# Parameters that change the answer; "stream" does not, so it is left out
+KEY_FIELDS = ("model", "messages", "temperature", "max_tokens", "top_p", "response_format", "seed", "stop")
+STREAM_PIECE_CHARS = 16
+
+
+def request_key(body: Dict[str, Any]) -> str:
+    """Hash of everything in a request that determines the answer."""
+    material = {field: body.get(field) for field in KEY_FIELDS}
+    return hashlib.sha256(json.dumps(material, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def template_key(body: Dict[str, Any]) -> str:
+    """Hash of the model and system prompt, i.e. the kind of request (email, document, ...)."""
+    system = next((m.get("content") for m in body.get("messages") or [] if m.get("role") == "system"), "")
+    return hashlib.sha256(f"{body.get('model')}\n{system}".encode("utf-8")).hexdigest()
+
+
+def parse_latency(spec: str) -> Callable[[float, random.Random], float]:
+    """Turn a latency spec into `sample(recorded_seconds, rng) -> seconds`."""
+    kind, _, args = spec.partition(":")
+    values = [float(value) for value in args.split(",") if value.strip()]
+    if kind == "recorded":
+        scale = values[0] if values else 1.0
+        return lambda recorded, rng: recorded * scale
+    if kind == "fixed" and len(values) == 1:
+        return lambda recorded, rng: values[0]
+    if kind == "uniform" and len(values) == 2:
+        return lambda recorded, rng: rng.uniform(values[0], values[1])
+    if kind == "normal" and len(values) == 2:
+        return lambda recorded, rng: max(0.0, rng.gauss(values[0], values[1]))
+    if kind == "lognormal" and len(values) == 2:
+        return lambda recorded, rng: rng.lognormvariate(math.log(values[0]), values[1])
+    raise ValueError(f"Invalid latency spec: {spec!r}")
+
+
+class RecordingStore:
+    """Recordings kept in memory and appended to a JSON-lines file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.exact: Dict[str, Dict[str, Any]] = {}
+        self.by_template: Dict[str, List[Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if line:
+                        self._index(json.loads(line))
+
+    def _index(self, record: Dict[str, Any]) -> None:
+        if record["key"] not in self.exact:
+            self.by_template.setdefault(record["template"], []).append(record)
+        self.exact[record["key"]] = record
+
+    def find(self, key: str, template: str, exact_only: bool) -> Tuple[Optional[Dict[str, Any]], bool]:
+        """Recording for a request and whether it was an exact match."""
+        record = self.exact.get(key)
+        if record is not None or exact_only:
+            return record, record is not None
+        candidates = self.by_template.get(template)
+        if not candidates:
+            return None, False
+        return candidates[int(key[:8], 16) % len(candidates)], False
+
+    def add(self, record: Dict[str, Any]) -> None:
+        with self._lock:
+            self._index(record)
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def __len__(self) -> int:
+        return len(self.exact)
+
+
+class RequestWindow:
+    """Requests-per-minute limit over a sliding 60 s window, answering like Groq with 429 + Retry-After."""
+
+    def __init__(self, requests_per_minute: int):
+        self.limit = requests_per_minute
+        self._sent: Deque[float] = deque()
+
+    def retry_after(self) -> Optional[float]:
+        """None if the request may proceed (and counts it), else seconds until a slot frees up."""
+        now = time.monotonic()
+        while self._sent and now - self._sent[0] >= 60.0:
+            self._sent.popleft()
+        if len(self._sent) >= self.limit:
+            return 60.0 - (now - self._sent[0])
+        self._sent.append(now)
+        return None
+
+
+def _error(status: int, message: str, error_type: str, headers: Optional[Dict[str, str]] = None) -> JSONResponse:
+    return JSONResponse({"error": {"message": message, "type": error_type}}, status_code=status, headers=headers)
+
+
+def _stream_response(response: Dict[str, Any], first_delay: float, total_delay: float) -> StreamingResponse:
+    """Serve a recorded completion as server-sent chunks spread over `total_delay`."""
+    content = response["choices"][0]["message"].get("content") or ""
+    pieces = [content[i:i + STREAM_PIECE_CHARS] for i in range(0, len(content), STREAM_PIECE_CHARS)] or [""]
+    gap = max(0.0, total_delay - first_delay) / len(pieces)
+    base = {key: response.get(key) for key in ("id", "created", "model", "system_fingerprint")}
+    base["object"] = "chat.completion.chunk"
+
+    async def events():
+        await asyncio.sleep(first_delay)
+        for index, piece in enumerate(pieces):
+            if index:
+                await asyncio.sleep(gap)
+            chunk = dict(base, choices=[{"index": 0, "delta": {"content": piece}, "finish_reason": None}])
+            yield f"data: {json.dumps(chunk)}\n\n"
+        final = dict(base, choices=[{"index": 0, "delta": {}, "finish_reason": "stop"}])
+        final["x_groq"] = {"id": response.get("id"), "usage": response.get("usage")}
+        yield f"data: {json.dumps(final)}\n\n"
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+def create_app(args: argparse.Namespace) -> FastAPI:
+    store = RecordingStore(args.store)
+    rng = random.Random(args.seed)
+    latency = parse_latency(args.latency) if args.mode == "replay" else None
+    window = RequestWindow(args.rpm) if args.rpm > 0 else None
+    upstream = httpx.AsyncClient(base_url=args.upstream, timeout=args.upstream_timeout) if args.mode == "record" else None
+    stats = {"requests": 0, "exact": 0, "similar": 0, "misses": 0, "recorded": 0, "errors": 0, "rate_limited": 0}
+    print(f"[STANDIN] {args.mode} mode, {len(store)} recordings in {args.store}")
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        yield
+        if upstream is not None:
+            await upstream.aclose()
+
+    app = FastAPI(title="Groq stand-in", lifespan=lifespan)
+
+    @app.get("/stats")
+    async def get_stats() -> Dict[str, Any]:
+        return dict(stats, recordings=len(store))
+
+    async def chat_completions(request: Request):
+        body = await request.json()
+        stats["requests"] += 1
+        key, template = request_key(body), template_key(body)
+
+        if window is not None:
+            wait = window.retry_after()
+            if wait is not None:
+                stats["rate_limited"] += 1
+                return _error(
+                    429,
+                    f"Rate limit reached for requests per minute (RPM): Limit {args.rpm}",
+                    "requests",
+                    {"retry-after": str(max(1, math.ceil(wait)))}
+                )
+        if args.rate_limit_rate and rng.random() < args.rate_limit_rate:
+            stats["rate_limited"] += 1
+            return _error(429, "Rate limit reached (injected)", "tokens", {"retry-after": str(args.retry_after)})
+        if args.error_rate and rng.random() < args.error_rate:
+            stats["errors"] += 1
+            return _error(503, "Service unavailable (injected)", "internal_server_error")
+
+        if args.mode == "record":
+            record = store.exact.get(key)
+            if record is None:
+                forwarded = {name: value for name, value in body.items() if name not in ("stream", "stream_options")}
+                headers = {"Authorization": request.headers.get("authorization") or f"Bearer {args.api_key}"}
+                started = time.monotonic()
+                upstream_response = await upstream.post(request.url.path, json=forwarded, headers=headers)
+                elapsed = time.monotonic() - started
+                if upstream_response.status_code != 200:
+                    return JSONResponse(
+                        upstream_response.json(),
+                        status_code=upstream_response.status_code,
+                        headers={name: value for name, value in upstream_response.headers.items() if name.startswith("retry-after")}
+                    )
+                record = {
+                    "key": key,
+                    "template": template,
+                    "model": body.get("model"),
+                    "latency": round(elapsed, 4),
+                    "response": upstream_response.json(),
+                    "recorded_at": time.time(),
+                }
+                if args.store_requests:
+                    record["request"] = forwarded
+                store.add(record)
+                stats["recorded"] += 1
+                delay = 0.0
+            else:
+                stats["exact"] += 1
+                delay = record["latency"]
+        else:
+            record, exact = store.find(key, template, args.on_miss == "error")
+            if record is None:
+                stats["misses"] += 1
+                return _error(404, "No recording for this request", "invalid_request_error")
+            stats["exact" if exact else "similar"] += 1
+            delay = latency(record["latency"], rng)
+
+        if body.get("stream"):
+            return _stream_response(record["response"], delay * args.first_token_fraction, delay)
+        await asyncio.sleep(delay)
+        return JSONResponse(record["response"])
+
+    for path in COMPLETIONS_PATHS:
+        app.add_api_route(path, chat_completions, methods=["POST"])
+
+    return app
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Record/replay stand-in for the Groq chat completions API")
+    parser.add_argument("mode", choices=["record", "replay"])
+    parser.add_argument("--store", default="data/groq_recordings.jsonl", help="JSON-lines recordings file")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--upstream", default=DEFAULT_UPSTREAM, help="API to record from")
+    parser.add_argument("--upstream-timeout", type=float, default=60.0)
+    parser.add_argument("--api-key", default=os.getenv("GROQ_API_KEY", ""), help="Used if the client sends none")
+    parser.add_argument("--store-requests", action="store_true", help="Also write prompts to the recordings file")
+    parser.add_argument("--latency", default="recorded", help="Replay latency spec (see module docs)")
+    parser.add_argument("--first-token-fraction", type=float, default=0.2, help="Share of the latency before the first streamed chunk")
+    parser.add_argument("--on-miss", choices=["similar", "error"], default="similar")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered with 503")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Share of requests answered with 429")
+    parser.add_argument("--retry-after", type=int, default=2, help="Retry-After seconds on injected 429s")
+    parser.add_argument("--rpm", type=int, default=0, help="Requests per minute before answering 429 (0 = unlimited)")
+    parser.add_argument("--seed", type=int, default=None, help="Seed for latency and fault injection")
+    args = parser.parse_args(argv)
+
+    uvicorn.run(create_app(args), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
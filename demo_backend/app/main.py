@@ -4,13 +4,21 @@ from fastapi.middleware.cors import CORSMiddleware
 
 from .config import settings
 # Importing all router modules
-from .api.routes import auth, documents, emails, erp, health, kyc
+from .api.routes import auth, documents, emails, erp, health, kyc, metrics, usage
 from .services import database
+from .services.cpu_pool import close_cpu_pool
+from .services.groq_client import close_groq_client
+from .services.keyword_engine import get_keyword_matcher
+from .services.kyc_jobs import get_kyc_job_manager
+from .services.token_ledger import get_token_ledger
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Create tables on startup
     await database.init_db()
+
+    # Compile the keyword table now so a broken rules file fails at startup
+    get_keyword_matcher()
     
     # Test Odoo connection on startup
     try:
@@ -21,9 +29,22 @@ async def lifespan(app: FastAPI):
             print("⚠️ Failed to connect to Odoo - ERP features may not work")
     except Exception as e:
         print(f"⚠️ Odoo connection error: {e}")
-    
+
+    # Periodically flush this worker's Groq token usage to the shared ledger
+    token_ledger = get_token_ledger()
+    await token_ledger.start()
+
+    # Start background workers for queued KYC jobs
+    job_manager = get_kyc_job_manager()
+    await job_manager.start()
+
     yield
 
+    await job_manager.stop()
+    await token_ledger.stop()
+    await close_groq_client()
+    await close_cpu_pool()
+
 app = FastAPI(
     title=settings.app_name,
     version="1.0.0",
@@ -42,7 +63,9 @@ app.add_middleware(
 # --- Registering Routes ---
 # Core System Routes
 app.include_router(health.router)
+app.include_router(metrics.router)     # Prometheus scrape endpoint
 app.include_router(auth.router)
+app.include_router(usage.router)       # Shared Groq token usage
 
 # KYC Complete Workflow (MAIN FEATURE)
 app.include_router(kyc.router)         # Complete KYC automation workflow
@@ -42,6 +42,8 @@ class DocumentAnalysisResponse(BaseModel):
     """Response model for document analysis (KYC data extraction)"""
     document_type: str = Field(alias="documentType", description="Type: ID_Document, Invoice, Bank_Statement, or Other")
     page_count: int = Field(ge=1, alias="pageCount")
+    pages_analyzed: Optional[int] = Field(default=None, alias="pagesAnalyzed", description="Pages whose text was sent for analysis")
+    page_offsets: List[int] = Field(default_factory=list, alias="pageOffsets", description="Start of each extracted page in the extracted text")
     detected_currency: str | None = Field(default=None, alias="detectedCurrency")
     received_at: str = Field(alias="receivedAt")
     extracted_data: Optional[Dict[str, Any]] = Field(default=None, alias="extractedData")
@@ -57,6 +59,8 @@ class DocumentAnalysisResponse(BaseModel):
             "example": {
                 "documentType": "ID_Document",
                 "pageCount": 1,
+                "pagesAnalyzed": 1,
+                "pageOffsets": [0],
                 "entities": ["Name: John Smith", "DOB: 1985-03-15", "Document: Driver License"],
                 "detectedCurrency": None,
                 "confidence": 0.94,
@@ -2,6 +2,8 @@
 from pydantic import BaseModel, Field
 from typing import List
 
+from .kyc import EmailClassificationResult
+
 class EmailClassificationRequest(BaseModel):
     subject: str = Field(min_length=3, max_length=200)
     body: str = Field(min_length=10, max_length=8000)
@@ -24,6 +26,13 @@ class EmailClassificationResponse(BaseModel):
             }
         }
 
+class EmailBatchClassificationRequest(BaseModel):
+    emails: List[EmailClassificationRequest] = Field(min_length=1, max_length=100)
+
+class EmailBatchClassificationResponse(BaseModel):
+    results: List[EmailClassificationResult] = Field(description="One result per submitted email, in order")
+    processing_time: float = Field(description="Total processing duration in seconds")
+
 # Legacy response model for backward compatibility
 class LegacyEmailClassificationResponse(BaseModel):
     category: str
@@ -35,6 +35,7 @@ class DocumentExtractionResult(BaseModel):
     preview: Optional[str] = Field(description="Document preview text")
     extracted_data: Optional[Dict[str, Any]] = Field(alias="extractedData", description="Structured extracted data")
     processing_time: float = Field(alias="processingTime", description="Processing duration")
+    filename: Optional[str] = Field(default=None, description="Attachment the result belongs to")
 
     class Config:
         populate_by_name = True
@@ -47,6 +48,7 @@ class TamperDetectionResult(BaseModel):
     risk_level: str = Field(alias="riskLevel", description="Risk assessment: Low, Medium, High")
     analysis_details: Dict[str, bool] = Field(alias="analysisDetails", description="Detailed analysis breakdown")
     processing_time: float = Field(alias="processingTime", description="Processing duration")
+    filename: Optional[str] = Field(default=None, description="Attachment the result belongs to")
 
     class Config:
         populate_by_name = True
@@ -65,9 +67,47 @@ class KYCWorkflowResponse(BaseModel):
     email_classification: EmailClassificationResult = Field(alias="emailClassification")
     document_analysis: Optional[DocumentExtractionResult] = Field(alias="documentAnalysis", default=None)
     tamper_detection: Optional[TamperDetectionResult] = Field(alias="tamperDetection", default=None)
+    document_analyses: List[DocumentExtractionResult] = Field(
+        alias="documentAnalyses",
+        default_factory=list,
+        description="Extraction results for every attachment, in upload order"
+    )
+    tamper_detections: List[TamperDetectionResult] = Field(
+        alias="tamperDetections",
+        default_factory=list,
+        description="Tamper detection results for every attachment, in upload order"
+    )
     erp_integration: ERPIntegrationResult = Field(alias="erpIntegration")
     processing_time: float = Field(alias="processingTime", description="Total workflow processing time")
-    
+    stage_timings: Dict[str, float] = Field(
+        alias="stageTimings",
+        default_factory=dict,
+        description="Wall-clock duration in seconds of each workflow stage"
+    )
+
+    class Config:
+        populate_by_name = True
+
+class KYCJobSubmitResponse(BaseModel):
+    """Returned when a KYC workflow is queued for background processing"""
+    job_id: str = Field(alias="jobId", description="Identifier to poll for the job result")
+    status: str = Field(description="Job status: queued, running, completed or failed")
+    status_url: str = Field(alias="statusUrl", description="Endpoint that reports job progress")
+
+    class Config:
+        populate_by_name = True
+
+class KYCJobStatusResponse(BaseModel):
+    """Progress and result of a background KYC workflow job"""
+    job_id: str = Field(alias="jobId")
+    status: str = Field(description="Job status: queued, running, completed or failed")
+    stages: Dict[str, str] = Field(default_factory=dict, description="Stage name to started/completed/failed")
+    result: Optional[KYCWorkflowResponse] = Field(default=None, description="Workflow result once completed")
+    error: Optional[str] = Field(default=None, description="Failure reason if the job failed")
+    created_at: float = Field(alias="createdAt", description="Submission time (epoch seconds)")
+    started_at: Optional[float] = Field(default=None, alias="startedAt")
+    finished_at: Optional[float] = Field(default=None, alias="finishedAt")
+
     class Config:
         populate_by_name = True
 
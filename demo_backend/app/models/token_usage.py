@@ -0,0 +1,23 @@
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, Date, DateTime, BigInteger, UniqueConstraint
+from ..services.database import Base
+
+class TokenUsage(Base):
+    """Groq tokens spent per day, user and model (user_id 0 = system/unattributed)"""
+    __tablename__ = "groq_token_usage"
+    __table_args__ = (UniqueConstraint("usage_date", "user_id", "model", name="uq_groq_token_usage_day_user_model"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    usage_date = Column(Date, nullable=False, index=True)
+    user_id = Column(Integer, nullable=False, default=0)
+    model = Column(String, nullable=False)
+    tokens = Column(BigInteger, nullable=False, default=0)
+    requests = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+class TokenBudgetLease(Base):
+    """Daily budget handed out to worker processes in leases"""
+    __tablename__ = "groq_token_budget_leases"
+
+    usage_date = Column(Date, primary_key=True)
+    leased_tokens = Column(BigInteger, nullable=False, default=0)
@@ -0,0 +1,174 @@
+# demo_backend/app/services/circuit_breaker.py
+"""
+Circuit breakers for upstream dependencies (one per Groq model).
+
+A breaker watches a sliding window of recent calls. When the failure rate
+or the share of slow calls crosses its threshold it opens, and callers are
+rejected immediately (so services serve their fallback at once instead of
+waiting on a failing upstream). After `open_seconds` it lets a few probe
+calls through (half-open); if they succeed it closes, otherwise it opens
+again.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Tuple
+
+from ..config import settings
+from .metrics import CIRCUIT_BREAKER_REJECTIONS, CIRCUIT_BREAKER_STATE
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpenError(Exception):
+    """Raised when a call is rejected because the breaker is open."""
+
+
+class CircuitBreaker:
+    """Failure-rate and slow-call-rate breaker over a sliding window of calls."""
+
+    def __init__(
+        self,
+        name: str,
+        failure_rate_threshold: float,
+        slow_call_seconds: float,
+        slow_call_rate_threshold: float,
+        window_size: int,
+        min_calls: int,
+        open_seconds: float,
+        half_open_probes: int
+    ):
+        self.name = name
+        self.failure_rate_threshold = failure_rate_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate_threshold = slow_call_rate_threshold
+        self.min_calls = max(1, min_calls)
+        self.open_seconds = open_seconds
+        self.half_open_probes = max(1, half_open_probes)
+        self._window: Deque[Tuple[bool, bool]] = deque(maxlen=max(self.min_calls, window_size))
+        self._lock = threading.Lock()
+        self.state = CLOSED
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        self.rejected = 0
+        CIRCUIT_BREAKER_STATE.labels(name).set(0)
+
+    def allow_request(self) -> bool:
+        """Whether a call may go upstream now; every allowed call must be recorded."""
+        with self._lock:
+            if self.state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+                self._transition(HALF_OPEN)
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN and self._probes_in_flight < self.half_open_probes:
+                self._probes_in_flight += 1
+                return True
+            self.rejected += 1
+        CIRCUIT_BREAKER_REJECTIONS.labels(self.name).inc()
+        return False
+
+    def record_success(self, duration: float) -> None:
+        self._record(failed=False, slow=duration >= self.slow_call_seconds)
+
+    def record_failure(self, duration: float = 0.0) -> None:
+        self._record(failed=True, slow=duration >= self.slow_call_seconds)
+
+    def record_ignored(self) -> None:
+        """Release a probe slot for a call whose outcome says nothing about upstream health."""
+        with self._lock:
+            if self.state == HALF_OPEN and self._probes_in_flight:
+                self._probes_in_flight -= 1
+
+    def _record(self, failed: bool, slow: bool) -> None:
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._probes_in_flight = max(0, self._probes_in_flight - 1)
+                if failed or slow:
+                    self._transition(OPEN)
+                    return
+                self._probe_successes += 1
+                if self._probe_successes >= self.half_open_probes:
+                    self._transition(CLOSED)
+                return
+            if self.state == OPEN:
+                # Late result of a call started before the breaker opened
+                return
+
+            self._window.append((failed, slow))
+            if len(self._window) < self.min_calls:
+                return
+            calls = len(self._window)
+            failure_rate = sum(1 for f, _ in self._window if f) / calls
+            slow_rate = sum(1 for _, s in self._window if s) / calls
+            if failure_rate >= self.failure_rate_threshold or slow_rate >= self.slow_call_rate_threshold:
+                print(
+                    f"[BREAKER] {self.name} opening: failure rate {failure_rate:.0%}, "
+                    f"slow call rate {slow_rate:.0%} over {calls} calls"
+                )
+                self._transition(OPEN)
+
+    def _transition(self, state: str) -> None:
+        # Caller holds the lock
+        if state == self.state:
+            return
+        print(f"[BREAKER] {self.name}: {self.state} -> {state}")
+        self.state = state
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        if state == OPEN:
+            self._opened_at = time.monotonic()
+        if state == CLOSED:
+            self._window.clear()
+        CIRCUIT_BREAKER_STATE.labels(self.name).set(_STATE_VALUES[state])
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            calls = len(self._window)
+            snapshot = {
+                "state": self.state,
+                "window_calls": calls,
+                "failure_rate": round(sum(1 for f, _ in self._window if f) / calls, 3) if calls else 0.0,
+                "slow_call_rate": round(sum(1 for _, s in self._window if s) / calls, 3) if calls else 0.0,
+                "rejected_calls": self.rejected,
+            }
+            if self.state == OPEN:
+                snapshot["retry_in_seconds"] = round(
+                    max(0.0, self.open_seconds - (time.monotonic() - self._opened_at)), 1
+                )
+            return snapshot
+
+
+# Global registry, one breaker per upstream model
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+def get_circuit_breaker(name: str) -> CircuitBreaker:
+    """Get (or create) the breaker guarding `name`"""
+    with _breakers_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            breaker = CircuitBreaker(
+                name,
+                failure_rate_threshold=settings.GROQ_BREAKER_FAILURE_RATE,
+                slow_call_seconds=settings.GROQ_BREAKER_SLOW_CALL_SECONDS,
+                slow_call_rate_threshold=settings.GROQ_BREAKER_SLOW_CALL_RATE,
+                window_size=settings.GROQ_BREAKER_WINDOW,
+                min_calls=settings.GROQ_BREAKER_MIN_CALLS,
+                open_seconds=settings.GROQ_BREAKER_OPEN_SECONDS,
+                half_open_probes=settings.GROQ_BREAKER_HALF_OPEN_PROBES
+            )
+            _breakers[name] = breaker
+        return breaker
+
+def get_circuit_breaker_states() -> Dict[str, Dict[str, Any]]:
+    """State of every breaker created so far"""
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return {breaker.name: breaker.snapshot() for breaker in breakers}
@@ -0,0 +1,200 @@
+# demo_backend/app/services/cpu_pool.py
+"""
+Process pool for CPU-bound document work (PDF text extraction, OCR).
+
+PyMuPDF and the image decoding around Tesseract hold the GIL, so running
+them in worker threads still starves the event loop on a large scan. Tasks
+submitted here run in separate processes instead:
+
+- DOCUMENT_CPU_WORKERS processes (0 disables the pool; callers then use a
+  worker thread as before)
+- each process is replaced after DOCUMENT_CPU_MAX_TASKS_PER_WORKER tasks,
+  so memory leaked by native libraries is returned to the OS
+- at most one task per worker is handed to the executor; the rest wait in
+  the event loop, so the DOCUMENT_CPU_TASK_TIMEOUT_SECONDS timeout covers
+  execution only. A task that exceeds it raises CPUTaskTimeout and the pool
+  is replaced, because a worker process cannot be interrupted; tasks lost
+  with it are resubmitted once
+- queue depth, queue wait and task duration are exported as metrics
+
+Workers are forked from a forkserver that has the document modules
+preloaded, so recycling a worker does not re-import the application.
+"""
+from __future__ import annotations
+
+import asyncio
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from ..config import settings
+from .metrics import (
+    CPU_POOL_QUEUE_WAIT_SECONDS,
+    CPU_POOL_RESTARTS,
+    CPU_POOL_TASK_SECONDS,
+    CPU_POOL_TASKS,
+    CPU_POOL_TIMEOUTS
+)
+
+# Imported once by the forkserver so recycled workers start instantly
+PRELOAD_MODULES = ["app.services.document_service"]
+
+
+class CPUTaskTimeout(TimeoutError):
+    """Raised when a pool task does not finish within the task timeout."""
+
+
+def _timed_call(fn: Callable[..., Any], args: Tuple[Any, ...]) -> Tuple[float, float, Any]:
+    """Runs in the worker: the result plus wall-clock start and end, for queue-wait metrics."""
+    started = time.time()
+    result = fn(*args)
+    return started, time.time(), result
+
+
+def _mp_context() -> multiprocessing.context.BaseContext:
+    # max_tasks_per_child is not supported with "fork"
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("forkserver")
+        context.set_forkserver_preload(PRELOAD_MODULES)
+        return context
+    return multiprocessing.get_context("spawn")
+
+
+class CPUPool:
+    """Recycling process pool with per-task timeouts, used from the event loop."""
+
+    def __init__(self, workers: int, max_tasks_per_worker: int, task_timeout: float):
+        self.workers = max(1, workers)
+        self.max_tasks_per_worker = max(1, max_tasks_per_worker)
+        self.task_timeout = task_timeout if task_timeout > 0 else None
+        self._context = _mp_context()
+        self._executor = self._new_executor()
+        # One slot per worker: tasks beyond that queue in the event loop, not in the executor
+        self._slots = asyncio.Semaphore(self.workers)
+        self._waiting = 0
+        self._running = 0
+        self.completed = 0
+        self.timeouts = 0
+        self.restarts = 0
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=self._context,
+            max_tasks_per_child=self.max_tasks_per_worker
+        )
+
+    def _replace(self, executor: ProcessPoolExecutor, reason: str) -> None:
+        """Swap in a fresh executor and kill the workers of `executor` (once per broken executor)."""
+        if executor is not self._executor:
+            return
+        print(f"[CPU_POOL] Replacing worker processes ({reason})")
+        CPU_POOL_RESTARTS.labels(reason).inc()
+        self.restarts += 1
+        self._executor = self._new_executor()
+        # A running task cannot be cancelled, only its process killed
+        for process in list((getattr(executor, "_processes", None) or {}).values()):
+            process.terminate()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def _set_gauges(self) -> None:
+        CPU_POOL_TASKS.labels("running").set(self._running)
+        CPU_POOL_TASKS.labels("queued").set(self._waiting)
+
+    async def run(self, task: str, fn: Callable[..., Any], *args: Any) -> Any:
+        """Run `fn(*args)` in a worker process; `fn` and its arguments must be picklable."""
+        submitted = time.time()
+        # Wait for a free worker here, so the task timeout only covers execution
+        self._waiting += 1
+        self._set_gauges()
+        try:
+            await self._slots.acquire()
+        finally:
+            self._waiting -= 1
+            self._set_gauges()
+        self._running += 1
+        self._set_gauges()
+        try:
+            return await self._run_in_slot(task, fn, args, submitted)
+        finally:
+            self._running -= 1
+            self._slots.release()
+            self._set_gauges()
+
+    async def _run_in_slot(self, task: str, fn: Callable[..., Any], args: Tuple[Any, ...], submitted: float) -> Any:
+        for attempt in range(2):
+            executor = self._executor
+            try:
+                future = executor.submit(_timed_call, fn, args)
+            except (BrokenProcessPool, RuntimeError):
+                self._replace(executor, "broken")
+                continue
+
+            try:
+                started, finished, result = await asyncio.wait_for(asyncio.wrap_future(future), self.task_timeout)
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                CPU_POOL_TIMEOUTS.labels(task).inc()
+                # With at most `workers` tasks submitted, a running future is executing
+                # (not just sitting in the call queue), so its worker is stuck
+                if future.running() and not future.cancel():
+                    self._replace(executor, "timeout")
+                raise CPUTaskTimeout(f"{task} did not finish within {self.task_timeout:g}s")
+            except BrokenProcessPool:
+                # Its worker died or was killed to clear a timed-out task
+                self._replace(executor, "broken")
+                if attempt:
+                    raise
+                print(f"[CPU_POOL] Resubmitting {task} after losing its worker")
+                continue
+
+            self.completed += 1
+            CPU_POOL_QUEUE_WAIT_SECONDS.labels(task).observe(max(0.0, started - submitted))
+            CPU_POOL_TASK_SECONDS.labels(task).observe(finished - started)
+            return result
+        raise BrokenProcessPool(f"No worker available for {task}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "max_tasks_per_worker": self.max_tasks_per_worker,
+            "task_timeout_seconds": self.task_timeout,
+            "running": self._running,
+            "queued": self._waiting,
+            "completed": self.completed,
+            "timeouts": self.timeouts,
+            "restarts": self.restarts,
+        }
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+
+# Global instance
+_cpu_pool_instance: Optional[CPUPool] = None
+
+def get_cpu_pool() -> Optional[CPUPool]:
+    """Get the shared document CPU pool, or None if DOCUMENT_CPU_WORKERS is 0"""
+    global _cpu_pool_instance
+    if _cpu_pool_instance is None and settings.DOCUMENT_CPU_WORKERS > 0:
+        _cpu_pool_instance = CPUPool(
+            workers=settings.DOCUMENT_CPU_WORKERS,
+            max_tasks_per_worker=settings.DOCUMENT_CPU_MAX_TASKS_PER_WORKER,
+            task_timeout=settings.DOCUMENT_CPU_TASK_TIMEOUT_SECONDS
+        )
+    return _cpu_pool_instance
+
+def get_cpu_pool_stats() -> Dict[str, Any]:
+    """Pool size and task counters (enabled False when documents are processed in threads)"""
+    if _cpu_pool_instance is None:
+        return {"enabled": settings.DOCUMENT_CPU_WORKERS > 0, "started": False}
+    return {"enabled": True, "started": True, **_cpu_pool_instance.stats()}
+
+async def close_cpu_pool() -> None:
+    """Stop the worker processes (call on shutdown)"""
+    global _cpu_pool_instance
+    if _cpu_pool_instance is not None:
+        pool, _cpu_pool_instance = _cpu_pool_instance, None
+        await asyncio.to_thread(pool.shutdown)
@@ -15,7 +15,7 @@ async def get_db():
 
 async def init_db():
     # Import models so metadata includes tables
-    from ..models import user, user_api_key  # noqa: F401
+    from ..models import user, user_api_key, idempotency_key, token_usage  # noqa: F401
 
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
\ No newline at end of file
@@ -0,0 +1,182 @@
+# demo_backend/app/services/document_chunker.py
+"""
+Token-aware chunking and merging for long documents.
+
+Text extraction returns ExtractedPages: the text of the pages it read
+(extraction stops once the text budget is filled) plus the real page count.
+Extracted text is split on page boundaries into chunks that fit a token
+budget (a page that is too large on its own is split on paragraphs, then
+lines, then hard cut). Each chunk is analysed separately and the per-chunk
+answers are merged back into one document-level result.
+"""
+from __future__ import annotations
+
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Dict, List, Sequence
+
+from .rate_limiter import CHARS_PER_TOKEN
+
+
+def estimate_text_tokens(text: str) -> int:
+    """Cheap token estimate for plain text (same ratio the rate limiter uses)."""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+@dataclass(frozen=True)
+class ExtractedPages:
+    """Text of pages 1..len(pages); fewer than `page_count` if extraction stopped at the text budget."""
+    pages: List[str]
+    page_count: int
+
+    @property
+    def text(self) -> str:
+        return "\n".join(self.pages)
+
+    @property
+    def offsets(self) -> List[int]:
+        """Start of each page within `text`."""
+        offsets: List[int] = []
+        position = 0
+        for page in self.pages:
+            offsets.append(position)
+            position += len(page) + 1
+        return offsets
+
+
+@dataclass(frozen=True)
+class DocumentChunk:
+    """A run of text covering pages `first_page`..`last_page` (1-based)."""
+    text: str
+    first_page: int
+    last_page: int
+    tokens: int
+
+    @property
+    def pages(self) -> str:
+        if self.first_page == self.last_page:
+            return f"page {self.first_page}"
+        return f"pages {self.first_page}-{self.last_page}"
+
+
+def _split_oversized(text: str, max_chars: int) -> List[str]:
+    """Split one page that exceeds the budget, preferring paragraph and line breaks."""
+    pieces: List[str] = []
+    rest = text
+    while len(rest) > max_chars:
+        window = rest[:max_chars]
+        cut = window.rfind("\n\n")
+        if cut < max_chars // 2:
+            cut = window.rfind("\n")
+        if cut < max_chars // 2:
+            cut = window.rfind(" ")
+        if cut < max_chars // 2:
+            cut = max_chars
+        pieces.append(rest[:cut])
+        rest = rest[cut:].lstrip()
+    if rest:
+        pieces.append(rest)
+    return pieces
+
+
+def chunk_pages(pages: Sequence[str], chunk_tokens: int, max_tokens: int) -> List[DocumentChunk]:
+    """
+    Pack pages into chunks of at most `chunk_tokens` tokens, stopping once
+    `max_tokens` tokens of text have been taken from the document.
+    """
+    max_chars = max(1, chunk_tokens) * CHARS_PER_TOKEN
+    budget_chars = max(1, max_tokens) * CHARS_PER_TOKEN
+    chunks: List[DocumentChunk] = []
+    parts: List[str] = []
+    first_page = last_page = 0
+    size = 0
+
+    def close_chunk() -> None:
+        nonlocal parts, size
+        if parts:
+            text = "\n".join(parts)
+            chunks.append(DocumentChunk(text, first_page, last_page, estimate_text_tokens(text)))
+        parts, size = [], 0
+
+    for page_number, page_text in enumerate(pages, start=1):
+        page_text = page_text.strip()
+        if not page_text:
+            continue
+        for piece in _split_oversized(page_text, max_chars):
+            if budget_chars <= 0:
+                close_chunk()
+                return chunks
+            piece = piece[:budget_chars]
+            budget_chars -= len(piece)
+            if parts and size + len(piece) + 1 > max_chars:
+                close_chunk()
+            if not parts:
+                first_page = page_number
+            parts.append(piece)
+            last_page = page_number
+            size += len(piece) + 1
+    close_chunk()
+    return chunks
+
+
+def _is_empty(value: Any) -> bool:
+    return value is None or (isinstance(value, (str, list, dict)) and not value) or (
+        isinstance(value, str) and value.strip().lower() in ("null", "none", "n/a")
+    )
+
+
+def _merge_value(current: Any, new: Any) -> Any:
+    if _is_empty(current):
+        return new
+    if _is_empty(new):
+        return current
+    if isinstance(current, list) and isinstance(new, list):
+        return current + [item for item in new if item not in current]
+    if isinstance(current, dict) and isinstance(new, dict):
+        return merge_structured_data([current, new])
+    # Scalars: the earliest chunk wins (headers carry names, numbers and dates)
+    return current
+
+
+def merge_structured_data(parts: Sequence[Dict[str, Any]]) -> Dict[str, Any]:
+    """Combine per-chunk `structured_data`: first non-null value wins, lists are concatenated."""
+    merged: Dict[str, Any] = {}
+    for part in parts:
+        if not isinstance(part, dict):
+            continue
+        for key, value in part.items():
+            merged[key] = _merge_value(merged.get(key), value)
+    return merged
+
+
+def merge_chunk_results(results: Sequence[Dict[str, Any]], chunks: Sequence[DocumentChunk]) -> Dict[str, Any]:
+    """Reduce per-chunk AI answers (same shape as a single-call answer) into one."""
+    if len(results) == 1:
+        return results[0]
+
+    # Document type: the most token-weighted vote, ignoring "Other" when anything more specific was seen
+    votes: Counter = Counter()
+    for result, chunk in zip(results, chunks):
+        votes[result.get("document_type") or "Other"] += chunk.tokens
+    specific = {k: v for k, v in votes.items() if k != "Other"}
+    document_type = max(specific or votes, key=(specific or votes).get)
+
+    entities: List[str] = []
+    for result in results:
+        for entity in result.get("extracted_entities") or []:
+            if entity not in entities:
+                entities.append(entity)
+
+    total_tokens = sum(chunk.tokens for chunk in chunks) or 1
+    confidence = sum(
+        float(result.get("confidence", 0.85) or 0.0) * chunk.tokens for result, chunk in zip(results, chunks)
+    ) / total_tokens
+
+    summaries = [f"{chunk.pages}: {result['summary']}" for result, chunk in zip(results, chunks) if result.get("summary")]
+    return {
+        "document_type": document_type,
+        "extracted_entities": entities,
+        "structured_data": merge_structured_data([result.get("structured_data") or {} for result in results]),
+        "confidence": round(confidence, 3),
+        "summary": " ".join(summaries),
+    }
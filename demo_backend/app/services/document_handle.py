@@ -0,0 +1,86 @@
+# demo_backend/app/services/document_handle.py
+"""
+Parse-once, in-memory representation of an uploaded document.
+
+A DocumentHandle is created once per upload and shared by text extraction,
+tamper detection and the ERP upload. It keeps a read-only view of the bytes
+and lazily opens the PyMuPDF document / decodes the image the first time a
+stage needs it, so multi-megabyte scans are read and parsed only once.
+"""
+from __future__ import annotations
+
+import hashlib
+import io
+import threading
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+import fitz  # PyMuPDF for PDF processing
+from fastapi import UploadFile
+from PIL import Image
+
+
+class DocumentHandle:
+    """Immutable view of one uploaded file plus its lazily parsed forms."""
+
+    __slots__ = ("filename", "content_type", "sha256", "_data", "_lock", "_pdf", "_image")
+
+    def __init__(self, filename: str, content_type: Optional[str], data: bytes):
+        self.filename = filename
+        self.content_type = content_type
+        self._data = memoryview(data).toreadonly()
+        self.sha256 = hashlib.sha256(self._data).hexdigest()
+        # Guards lazy parsing and PyMuPDF access, which is not thread-safe
+        self._lock = threading.RLock()
+        self._pdf: Optional[fitz.Document] = None
+        self._image: Optional[Image.Image] = None
+
+    @classmethod
+    async def from_upload(cls, file: UploadFile) -> "DocumentHandle":
+        await file.seek(0)
+        return cls(file.filename, file.content_type, await file.read())
+
+    @property
+    def data(self) -> memoryview:
+        """Read-only view of the raw file bytes."""
+        return self._data
+
+    def raw_bytes(self) -> bytes:
+        """The file as a bytes object, e.g. to send to a worker process (no copy for bytes uploads)."""
+        if isinstance(self._data.obj, bytes) and len(self._data.obj) == self._data.nbytes:
+            return self._data.obj
+        return self._data.tobytes()
+
+    @property
+    def size(self) -> int:
+        return self._data.nbytes
+
+    @contextmanager
+    def open_pdf(self) -> Iterator[fitz.Document]:
+        """Yield the parsed PDF, opening it on first use; access is serialised."""
+        with self._lock:
+            if self._pdf is None:
+                self._pdf = fitz.open(stream=self._data, filetype="pdf")
+            yield self._pdf
+
+    def image(self) -> Image.Image:
+        """Return the decoded image, decoding it on first use."""
+        with self._lock:
+            if self._image is None:
+                image = Image.open(io.BytesIO(self._data))
+                image.load()
+                self._image = image
+            return self._image
+
+    def close(self) -> None:
+        """Release parsed forms; the handle stays usable and re-parses on demand."""
+        with self._lock:
+            if self._pdf is not None:
+                self._pdf.close()
+                self._pdf = None
+            if self._image is not None:
+                self._image.close()
+                self._image = None
+
+    def __repr__(self) -> str:
+        return f"DocumentHandle({self.filename!r}, {self.content_type!r}, {self.size} bytes, sha256={self.sha256[:12]})"
@@ -1,24 +1,58 @@
 # app/services/document_service.py
 from __future__ import annotations
 
-import io
+import asyncio
 import os
 import time
-import json
 import base64
-from typing import Any, Dict
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
 from fastapi import HTTPException, UploadFile, status
-from groq import Groq
 import fitz  # PyMuPDF for PDF processing
 from PIL import Image
 import pytesseract
 
-# Initialize Groq client
-def get_groq_client():
-    api_key = os.getenv("GROQ_API_KEY")
-    if not api_key:
-        raise ValueError("GROQ_API_KEY not found in environment variables")
-    return Groq(api_key=api_key)
+from ..config import settings
+from .cpu_pool import CPUPool, get_cpu_pool
+from .document_chunker import DocumentChunk, ExtractedPages, chunk_pages, merge_chunk_results
+from .document_handle import DocumentHandle
+from .groq_client import get_groq_client
+from .json_stream import FieldPath, IncrementalJSONParser
+from .keyword_engine import get_keyword_matcher
+from .llm_output import LLMOutputError, parse_llm_json
+from .metrics import (
+    OCR_SECONDS,
+    TAMPER_DETECTION_SECONDS,
+    TEXT_EXTRACTION_SECONDS,
+    record_fallback
+)
+from .prompts import DOCUMENT_ANALYSIS_VALIDATOR
+from .rate_limiter import CHARS_PER_TOKEN
+from .result_cache import ResultCache
+from .token_ledger import user_id_of
+
+def _build_cache(name: str) -> ResultCache | None:
+    if not settings.DOCUMENT_CACHE_ENABLED:
+        return None
+    directory = os.path.join(settings.DOCUMENT_CACHE_DIR, name) if settings.DOCUMENT_CACHE_DIR else None
+    return ResultCache(
+        name,
+        settings.DOCUMENT_CACHE_MAX_ENTRIES,
+        directory,
+        max_disk_entries=settings.DOCUMENT_CACHE_MAX_DISK_ENTRIES
+    )
+
+# Content-addressed caches for analysis and tamper results (keyed by SHA-256 + pipeline version)
+_analysis_cache = _build_cache("document_analysis")
+_tamper_cache = _build_cache("tamper_detection")
+
+def get_document_cache_stats() -> Dict[str, Any]:
+    """Hit/miss counters for the document result caches"""
+    return {
+        "enabled": settings.DOCUMENT_CACHE_ENABLED,
+        "pipeline_version": settings.DOCUMENT_PIPELINE_VERSION,
+        "caches": [cache.stats() for cache in (_analysis_cache, _tamper_cache) if cache]
+    }
 
 # Supported file types
 SUPPORTED_TYPES = {
@@ -31,6 +65,19 @@ SUPPORTED_TYPES = {
     "text/plain": "Text"
 }
 
+# Receives each member of the model's answer as soon as it has streamed in
+FieldCallback = Callable[[FieldPath, Any], None]
+
+# Neutral values for fields a partially valid answer lost
+DOCUMENT_ANSWER_DEFAULTS = {
+    "document_type": "Other",
+    "extracted_entities": [],
+    "structured_data": {},
+    "confidence": 0.5,
+    "summary": "Partially recovered AI analysis"
+}
+DOCUMENT_ANSWER_ESSENTIAL = ("document_type", "structured_data")
+
 # Document analysis prompts
 DOCUMENT_ANALYSIS_SYSTEM_PROMPT = """
 You are an expert AI system for KYC document analysis. Your task is to extract critical information from identity documents and financial documents for customer onboarding.
@@ -75,63 +122,171 @@ DOCUMENT TEXT:
 
 FILENAME: {filename}
 
-Respond with a JSON object containing:
+Respond with a JSON object containing, in this order:
 {{
     "document_type": "ID_Document|Financial_Document|Proof_of_Address|Other",
-    "extracted_entities": ["Entity 1", "Entity 2", "..."],
     "structured_data": {{
         "field_name": "value",
         "field_name2": "value2"
     }},
     "confidence": 0.0-1.0,
+    "extracted_entities": ["Entity 1", "Entity 2", "..."],
     "summary": "Brief description of document content"
 }}
 
 Extract all relevant KYC information. Use null for missing fields.
 """
 
-async def extract_text_from_file(file: UploadFile) -> str:
-    """Extract text from various file types using appropriate methods"""
+# File types whose extraction is CPU-bound and goes to the document CPU pool
+CPU_BOUND_TYPES = {"PDF", "Image"}
+
+async def extract_pages(handle: DocumentHandle, budget_chars: Optional[int] = None) -> ExtractedPages:
+    """
+    Extract text per page without blocking the event loop: PDFs and images
+    go to the document CPU pool, everything else (and everything when the
+    pool is disabled) to a worker thread. PDF extraction stops after the
+    page that fills `budget_chars`. Raises CPUTaskTimeout if extraction
+    exceeds DOCUMENT_CPU_TASK_TIMEOUT_SECONDS.
+    """
+    file_type = SUPPORTED_TYPES.get(handle.content_type, "Unknown")
+    pool = get_cpu_pool()
+    if pool is None or file_type not in CPU_BOUND_TYPES:
+        return await asyncio.to_thread(extract_pages_from_handle, handle, budget_chars)
+    # One bytes object for every task; the upload is only parsed in the workers
+    data = handle.raw_bytes()
+    step = max(1, settings.DOCUMENT_PDF_PAGES_PER_TASK) if file_type == "PDF" else None
+    # Timed here since the worker's own observations stay in its process
+    with TEXT_EXTRACTION_SECONDS.labels(file_type).time():
+        # The first task extracts up to one range of a PDF and reports its page count
+        extracted = await pool.run(
+            f"{file_type.lower()}_extraction",
+            _extract_pages_task,
+            handle.filename,
+            handle.content_type,
+            data,
+            budget_chars,
+            step
+        )
+        if len(extracted.pages) >= extracted.page_count:
+            return extracted
+        remaining = budget_chars
+        if remaining is not None:
+            remaining -= sum(len(page.strip()) for page in extracted.pages)
+            if remaining <= 0:
+                return extracted
+        return await _extract_pdf_ranges(pool, data, extracted, remaining)
+
+async def _extract_pdf_ranges(
+    pool: CPUPool,
+    data: bytes,
+    extracted: ExtractedPages,
+    budget_chars: Optional[int]
+) -> ExtractedPages:
+    """
+    Extract the rest of a long PDF, after the pages of the first task, as
+    DOCUMENT_PDF_PAGES_PER_TASK-page ranges on several pool workers,
+    consumed in page order until the text budget is filled. A statement
+    usually fills the budget within the first task, and then no range is
+    started at all.
+    """
+    step = max(1, settings.DOCUMENT_PDF_PAGES_PER_TASK)
+    page_count = extracted.page_count
+    ranges = deque((first, min(first + step, page_count)) for first in range(len(extracted.pages), page_count, step))
+    in_flight: Deque[asyncio.Future] = deque()
+    pages: List[str] = list(extracted.pages)
+    remaining = budget_chars
     try:
-        file_type = SUPPORTED_TYPES.get(file.content_type, "Unknown")
-        contents = await file.read()
-        
-        if file_type == "PDF":
-            # Use PyMuPDF for PDF text extraction
-            return extract_pdf_text(contents)
-        elif file_type == "Image":
-            # Use OCR for image files
-            return extract_image_text(contents)
-        elif file_type == "Text":
-            # Direct text extraction
-            return contents.decode('utf-8', errors='ignore')
-        else:
-            # Try to decode as text for DOC/DOCX (basic approach)
-            return contents.decode('utf-8', errors='ignore')[:2000]
-            
-    except Exception as e:
-        print(f"Text extraction error: {e}")
-        return f"Error extracting text from {file.filename}: {str(e)}"
+        while ranges or in_flight:
+            while ranges and len(in_flight) < pool.workers:
+                first, last = ranges.popleft()
+                in_flight.append(asyncio.ensure_future(
+                    pool.run("pdf_extraction", _extract_pdf_range_task, data, first, last, remaining)
+                ))
+            range_pages = await in_flight.popleft()
+            if remaining is None:
+                pages.extend(range_pages)
+                continue
+            # Ranges started in parallel share the budget left at their start; stop at the page that fills it
+            for page in range_pages:
+                pages.append(page)
+                remaining -= len(page.strip())
+                if remaining <= 0:
+                    break
+            if remaining <= 0:
+                break
+    finally:
+        # Ranges past the budget are not needed
+        for future in in_flight:
+            future.cancel()
+    return ExtractedPages(pages, page_count)
 
-def extract_pdf_text(pdf_bytes: bytes) -> str:
-    """Extract text from PDF using PyMuPDF"""
+def _extract_pages_task(
+    filename: str,
+    content_type: Optional[str],
+    data: bytes,
+    budget_chars: Optional[int] = None,
+    max_pages: Optional[int] = None
+) -> ExtractedPages:
+    """Runs in a CPU pool worker: parse the raw bytes there and extract per page"""
+    handle = DocumentHandle(filename, content_type, data)
     try:
-        doc = fitz.open(stream=pdf_bytes, filetype="pdf")
-        text = ""
-        for page in doc:
-            text += page.get_text()
+        return extract_pages_from_handle(handle, budget_chars, max_pages)
+    finally:
+        handle.close()
+
+def _extract_pdf_range_task(data: bytes, first: int, last: int, budget_chars: Optional[int]) -> List[str]:
+    """Runs in a CPU pool worker: text of pages first..last-1 (0-based) of a PDF"""
+    doc = fitz.open(stream=data, filetype="pdf")
+    try:
+        return extract_pdf_pages(doc, first, last, budget_chars)
+    finally:
         doc.close()
-        return text[:3000]  # Limit text size for API
+
+def extract_pages_from_handle(
+    handle: DocumentHandle,
+    budget_chars: Optional[int] = None,
+    max_pages: Optional[int] = None
+) -> ExtractedPages:
+    """Extract text per page (one entry for images and plain text), PDFs up to `max_pages`; blocking"""
+    file_type = SUPPORTED_TYPES.get(handle.content_type, "Unknown")
+    try:
+        with TEXT_EXTRACTION_SECONDS.labels(file_type).time():
+            if file_type == "PDF":
+                # Use PyMuPDF for PDF text extraction
+                with handle.open_pdf() as doc:
+                    last = doc.page_count if max_pages is None else min(max_pages, doc.page_count)
+                    return ExtractedPages(extract_pdf_pages(doc, 0, last, budget_chars), doc.page_count)
+            elif file_type == "Image":
+                # Use OCR for image files
+                return ExtractedPages([ocr_image(handle.image())], 1)
+            elif file_type == "Text":
+                # Direct text extraction
+                return ExtractedPages([str(handle.data, 'utf-8', errors='ignore')], 1)
+            else:
+                # Try to decode as text for DOC/DOCX (basic approach)
+                return ExtractedPages([str(handle.data, 'utf-8', errors='ignore')[:2000]], 1)
+            
     except Exception as e:
-        print(f"PDF extraction error: {e}")
-        return "Unable to extract text from PDF"
+        print(f"Text extraction error: {e}")
+        return ExtractedPages([f"Error extracting text from {handle.filename}: {str(e)}"], 1)
 
-def extract_image_text(image_bytes: bytes) -> str:
-    """Extract text from image using OCR"""
+def extract_pdf_pages(doc: fitz.Document, first: int, last: int, budget_chars: Optional[int] = None) -> List[str]:
+    """Text of pages first..last-1 (0-based), stopping after the page that fills `budget_chars`"""
+    pages: List[str] = []
+    size = 0
+    for number in range(first, last):
+        text = doc.load_page(number).get_text()
+        pages.append(text)
+        size += len(text.strip())
+        if budget_chars is not None and size >= budget_chars:
+            break
+    return pages
+
+def ocr_image(image: Image.Image) -> str:
+    """Extract text from a decoded image using OCR"""
     try:
-        image = Image.open(io.BytesIO(image_bytes))
-        text = pytesseract.image_to_string(image)
-        return text[:3000]  # Limit text size for API
+        with OCR_SECONDS.time():
+            return pytesseract.image_to_string(image)
     except Exception as e:
         print(f"OCR extraction error: {e}")
         return "Unable to extract text from image"
@@ -140,62 +295,117 @@ async def analyze_document(file: UploadFile, user: Any | None) -> Dict[str, Any]
     """
     Analyze document for KYC data extraction using real Groq AI.
     """
-    start_time = time.time()
-    
     # Validate file
     if not file or not file.filename:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="No file provided"
         )
-    
+
+    handle = await DocumentHandle.from_upload(file)
+    try:
+        return await analyze_document_handle(handle, user)
+    finally:
+        handle.close()
+
+async def analyze_document_handle(
+    handle: DocumentHandle,
+    user: Any | None,
+    on_field: Optional[FieldCallback] = None
+) -> Dict[str, Any]:
+    """
+    Analyze a parsed-once document. Text extraction runs in the document
+    CPU pool (or a worker thread) and the Groq call is awaited on the shared async client, so
+    concurrent workflow stages keep progressing.
+
+    With `on_field`, a single-chunk analysis is streamed and every answer
+    member (document_type, each structured_data field, ...) is passed to it
+    as soon as the model has written it; the values are unvalidated, the
+    returned result is authoritative.
+    """
+    start_time = time.time()
+
     # Check file type
-    file_type = SUPPORTED_TYPES.get(file.content_type, "Unknown")
+    file_type = SUPPORTED_TYPES.get(handle.content_type, "Unknown")
     if file_type == "Unknown":
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Unsupported file type: {file.content_type}"
+            detail=f"Unsupported file type: {handle.content_type}"
         )
-    
+
+    # Identical uploads yield the same analysis, so serve resubmissions from cache;
+    # the filename is part of the prompt, so it is part of the key
+    cache_key = ResultCache.make_key(
+        "analysis",
+        settings.DOCUMENT_PIPELINE_VERSION,
+        settings.DOCUMENT_CHUNK_TOKENS,
+        settings.DOCUMENT_MAX_TOKENS,
+        file_type,
+        handle.sha256,
+        handle.filename
+    )
+    result = await _analysis_cache.get(cache_key) if _analysis_cache else None
+    if result is not None:
+        print(f"[DOCUMENT] Cache hit for {handle.filename} ({handle.sha256[:12]})")
+        from_ai = True
+    else:
+        result, from_ai = await _analyze_document_uncached(handle, file_type, start_time, user_id_of(user), on_field)
+        # Only successful AI analyses are worth keeping; fallbacks should be retried
+        if from_ai and _analysis_cache:
+            await _analysis_cache.set(cache_key, result)
+
+    if from_ai and user:
+        result["entities"].append(f"Processed by: {getattr(user, 'email', 'Unknown')}")
+    result["receivedAt"] = time.strftime("%Y-%m-%d %H:%M:%S")
+    result["processingTime"] = round(time.time() - start_time, 2)
+    return result
+
+async def _analyze_document_uncached(
+    handle: DocumentHandle,
+    file_type: str,
+    start_time: float,
+    user_id: Optional[int] = None,
+    on_field: Optional[FieldCallback] = None
+) -> Tuple[Dict[str, Any], bool]:
+    """
+    Extract text and call Groq; returns the result and whether the AI produced it.
+    Long documents are split into page-aligned chunks that are analysed
+    concurrently and merged (map-reduce).
+    """
+    filename = handle.filename
+
     try:
         # Extract text from document
-        print(f"[DOCUMENT] Extracting text from {file.filename} ({file_type})")
-        document_text = await extract_text_from_file(file)
-        
+        print(f"[DOCUMENT] Extracting text from {filename} ({file_type})")
+        # Text past DOCUMENT_MAX_TOKENS is never analysed, so extraction stops there
+        extracted = await extract_pages(handle, settings.DOCUMENT_MAX_TOKENS * CHARS_PER_TOKEN)
+        pages = extracted.pages
+        document_text = extracted.text
+
         if not document_text or len(document_text.strip()) < 10:
             raise HTTPException(
                 status_code=400,
                 detail="Could not extract readable text from document"
             )
-        
+
+        chunks = chunk_pages(pages, settings.DOCUMENT_CHUNK_TOKENS, settings.DOCUMENT_MAX_TOKENS)
+
         # Use Groq AI for document analysis
-        print(f"[DOCUMENT] Analyzing document with AI...")
-        client = get_groq_client()
-        
-        user_prompt = DOCUMENT_ANALYSIS_USER_PROMPT.format(
-            document_text=document_text,
-            filename=file.filename
+        print(f"[DOCUMENT] Analyzing document with AI ({len(chunks)} chunk(s), {len(pages)} of {extracted.page_count} page(s))...")
+        answers = await asyncio.gather(
+            # Fields of one chunk are not final once merged, so only single-chunk answers stream
+            *(
+                _analyze_chunk(chunk, len(chunks) > 1, len(pages), filename, user_id, on_field if len(chunks) == 1 else None)
+                for chunk in chunks
+            ),
+            return_exceptions=True
         )
-        
-        chat_completion = client.chat.completions.create(
-            messages=[
-                {
-                    "role": "system",
-                    "content": DOCUMENT_ANALYSIS_SYSTEM_PROMPT
-                },
-                {
-                    "role": "user",
-                    "content": user_prompt
-                }
-            ],
-            model="openai/gpt-oss-20b",
-            temperature=0.1,
-            max_tokens=800,
-            response_format={"type": "json_object"}
-        )
-        
-        # Parse AI response
-        ai_response = json.loads(chat_completion.choices[0].message.content)
+        succeeded = [(answer, chunk) for answer, chunk in zip(answers, chunks) if not isinstance(answer, BaseException)]
+        if not succeeded:
+            raise answers[0]
+        if len(succeeded) < len(chunks):
+            print(f"[DOCUMENT] {len(chunks) - len(succeeded)} of {len(chunks)} chunks failed; merging the rest")
+        ai_response = merge_chunk_results([answer for answer, _ in succeeded], [chunk for _, chunk in succeeded])
         
         # Build entities list from structured data
         entities = []
@@ -211,14 +421,14 @@ async def analyze_document(file: UploadFile, user: Any | None) -> Dict[str, Any]
         
         # Add file metadata
         entities.insert(0, f"File Type: {file_type}")
-        if user:
-            entities.append(f"Processed by: {getattr(user, 'email', 'Unknown')}")
         
         processing_time = time.time() - start_time
         
         return {
             "documentType": ai_response.get("document_type", "Other"),
-            "pageCount": 1,  # Could be enhanced to count actual pages
+            "pageCount": max(1, extracted.page_count),
+            "pagesAnalyzed": chunks[-1].last_page if chunks else 0,
+            "pageOffsets": extracted.offsets,
             "entities": entities,
             "detectedCurrency": extract_currency(structured_data),
             "confidence": float(ai_response.get("confidence", 0.85)),
@@ -226,14 +436,78 @@ async def analyze_document(file: UploadFile, user: Any | None) -> Dict[str, Any]
             "preview": document_text[:400],
             "extractedData": structured_data,
             "processingTime": round(processing_time, 2)
-        }
+        }, True
         
-    except json.JSONDecodeError as e:
-        print(f"JSON parsing error: {e}")
-        return _fallback_document_analysis(file, document_text if 'document_text' in locals() else "", start_time)
+    except LLMOutputError as e:
+        print(f"AI answer unusable after repair: {e}")
+        return _fallback_document_analysis(filename, document_text, start_time, extracted.page_count), False
     except Exception as e:
         print(f"Document analysis error: {e}")
-        return _fallback_document_analysis(file, "", start_time)
+        page_count = extracted.page_count if 'extracted' in locals() else 1
+        return _fallback_document_analysis(filename, "", start_time, page_count), False
+
+async def _analyze_chunk(
+    chunk: DocumentChunk,
+    chunked: bool,
+    page_count: int,
+    filename: str,
+    user_id: Optional[int],
+    on_field: Optional[FieldCallback] = None
+) -> Dict[str, Any]:
+    """One Groq extraction call for one chunk (streamed if `on_field` is given); returns the parsed answer"""
+    document_text = chunk.text
+    if chunked:
+        document_text = f"[Excerpt: {chunk.pages} of {page_count}]\n{document_text}"
+
+    user_prompt = DOCUMENT_ANALYSIS_USER_PROMPT.format(
+        document_text=document_text,
+        filename=filename
+    )
+
+    on_delta = None
+    if on_field is not None and settings.DOCUMENT_STREAMING_ENABLED:
+        parser = IncrementalJSONParser()
+
+        def _feed_fields(delta: str) -> None:
+            for path, value in parser.feed(delta):
+                try:
+                    on_field(path, value)
+                except Exception as e:
+                    print(f"[DOCUMENT] Field listener error for {'.'.join(path)}: {e}")
+
+        on_delta = _feed_fields
+
+    completion = await get_groq_client().chat_completion(
+        messages=[
+            {
+                "role": "system",
+                "content": DOCUMENT_ANALYSIS_SYSTEM_PROMPT
+            },
+            {
+                "role": "user",
+                "content": user_prompt
+            }
+        ],
+        model=settings.GROQ_MODEL_DOCUMENT,
+        temperature=0.1,
+        max_tokens=800,
+        response_format={"type": "json_object"},
+        operation="document_analysis",
+        user_id=user_id,
+        on_delta=on_delta
+    )
+    if not completion["success"]:
+        raise RuntimeError(completion["error"])
+
+    # Parse AI response (repaired or salvaged if malformed)
+    return parse_llm_json(
+        completion["content"],
+        DOCUMENT_ANALYSIS_VALIDATOR,
+        "document_analysis",
+        DOCUMENT_ANSWER_DEFAULTS,
+        DOCUMENT_ANSWER_ESSENTIAL,
+        tokens_used=completion["tokens_used"]
+    )
 
 def extract_currency(structured_data: Dict[str, Any]) -> str | None:
     """Extract currency from structured data"""
@@ -252,18 +526,41 @@ async def detect_tamper(file: UploadFile, user: Any | None) -> Dict[str, Any]:
     """
     Detect document tampering using metadata analysis and content inspection.
     """
-    start_time = time.time()
-    
     # Validate file
     if not file or not file.filename:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="No file provided"
         )
-    
+
+    handle = await DocumentHandle.from_upload(file)
+    try:
+        return await detect_tamper_handle(handle, user)
+    finally:
+        handle.close()
+
+async def detect_tamper_handle(handle: DocumentHandle, user: Any | None) -> Dict[str, Any]:
+    """Run tamper detection on a parsed-once document in a worker thread."""
+    start_time = time.time()
+    file_type = SUPPORTED_TYPES.get(handle.content_type, "Unknown")
+    cache_key = ResultCache.make_key("tamper", settings.DOCUMENT_PIPELINE_VERSION, file_type, handle.sha256)
+    result = await _tamper_cache.get(cache_key) if _tamper_cache else None
+    if result is not None:
+        result["processingTime"] = round(time.time() - start_time, 2)
+        return result
+
+    with TAMPER_DETECTION_SECONDS.labels(file_type).time():
+        result = await asyncio.to_thread(_detect_tamper_sync, handle)
+    # A failed analysis is reported as an error verdict; don't pin it in the cache
+    if _tamper_cache and "Analysis failed due to technical error" not in result["detectedIssues"]:
+        await _tamper_cache.set(cache_key, result)
+    return result
+
+def _detect_tamper_sync(handle: DocumentHandle) -> Dict[str, Any]:
+    start_time = time.time()
+
     try:
-        contents = await file.read()
-        file_type = SUPPORTED_TYPES.get(file.content_type, "Unknown")
+        file_type = SUPPORTED_TYPES.get(handle.content_type, "Unknown")
         
         # Basic tamper detection analysis
         is_authentic = True
@@ -271,7 +568,7 @@ async def detect_tamper(file: UploadFile, user: Any | None) -> Dict[str, Any]:
         confidence_score = 0.95
         
         # Check file size anomalies
-        if len(contents) < 1000:
+        if handle.size < 1000:
             detected_issues.append("Unusually small file size")
             confidence_score -= 0.1
         
@@ -279,15 +576,13 @@ async def detect_tamper(file: UploadFile, user: Any | None) -> Dict[str, Any]:
         if file_type == "PDF":
             # Analyze PDF metadata
             try:
-                doc = fitz.open(stream=contents, filetype="pdf")
-                metadata = doc.metadata
+                with handle.open_pdf() as doc:
+                    metadata = doc.metadata
                 
                 # Check for suspicious creation/modification patterns
                 if metadata.get("creator") and "photoshop" in metadata.get("creator", "").lower():
                     detected_issues.append("Document created with image editing software")
                     confidence_score -= 0.2
-                    
-                doc.close()
             except:
                 pass
         
@@ -332,26 +627,25 @@ async def detect_tamper(file: UploadFile, user: Any | None) -> Dict[str, Any]:
             "processingTime": round(time.time() - start_time, 2)
         }
 
-def _fallback_document_analysis(file: UploadFile, document_text: str, start_time: float) -> Dict[str, Any]:
+def _fallback_document_analysis(filename: str | None, document_text: str, start_time: float, page_count: int = 1) -> Dict[str, Any]:
     """Fallback document analysis if AI fails"""
     print("[DOCUMENT] Using fallback analysis due to API error")
+    record_fallback("document_analysis")
     
-    filename = file.filename.lower() if file.filename else ""
+    keywords = get_keyword_matcher()
     
     # Basic document type detection
-    if any(word in filename for word in ["license", "passport", "id"]):
-        doc_type = "ID_Document"
+    doc_type = keywords.first(keywords.scan(filename or ""), "document_type") or "Other"
+    if doc_type == "ID_Document":
         entities = ["Document type detected from filename", "Manual review recommended"]
-    elif any(word in filename for word in ["invoice", "statement", "bill"]):
-        doc_type = "Financial_Document"
+    elif doc_type == "Financial_Document":
         entities = ["Financial document detected", "Manual extraction required"]
     else:
-        doc_type = "Other"
         entities = ["Unknown document type", "Manual review required"]
     
     return {
         "documentType": doc_type,
-        "pageCount": 1,
+        "pageCount": max(1, page_count),
         "entities": entities,
         "detectedCurrency": None,
         "confidence": 0.6,
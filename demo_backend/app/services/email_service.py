@@ -1,18 +1,78 @@
 # app/services/email_service.py
 from __future__ import annotations
 
-import os
-import json
+import asyncio
 import time
-from typing import Any, Dict
-from groq import Groq
+import unicodedata
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 
-# Initialize Groq client
-def get_groq_client():
-    api_key = os.getenv("GROQ_API_KEY")
-    if not api_key:
-        raise ValueError("GROQ_API_KEY not found in environment variables")
-    return Groq(api_key=api_key)
+from ..config import settings
+from .groq_client import get_groq_client
+from .fast_classifier import fast_path_result, get_fast_classifier, log_llm_label
+from .keyword_engine import get_keyword_matcher
+from .llm_output import LLMOutputError, load_llm_json, parse_llm_json, validate_llm_object
+from .metrics import CACHE_TOKENS_SAVED, EMAIL_FAST_PATH, record_fallback
+from .micro_batcher import MicroBatcher
+from .prompts import EMAIL_CLASSIFICATION_VALIDATOR
+from .result_cache import ResultCache
+from .token_ledger import user_id_of
+
+def _build_cache() -> ResultCache | None:
+    if not settings.EMAIL_CACHE_ENABLED:
+        return None
+    return ResultCache(
+        "email_classification",
+        settings.EMAIL_CACHE_MAX_ENTRIES,
+        settings.EMAIL_CACHE_DIR or None,
+        ttl_seconds=settings.EMAIL_CACHE_TTL_SECONDS,
+        max_disk_entries=settings.EMAIL_CACHE_MAX_DISK_ENTRIES
+    )
+
+# Templated emails arrive over and over; reuse the model's answer for them
+_classification_cache = _build_cache()
+
+def _normalize_email_text(text: str) -> str:
+    """Case, Unicode form and whitespace differences don't change the classification"""
+    return " ".join(unicodedata.normalize("NFKC", text or "").casefold().split())
+
+def _classification_cache_key(subject: str, body: str) -> str:
+    return ResultCache.make_key(
+        "email",
+        settings.EMAIL_PROMPT_VERSION,
+        settings.GROQ_MODEL_EMAIL,
+        _normalize_email_text(subject),
+        _normalize_email_text(body)
+    )
+
+def _fast_path_answer(subject: str, body: str) -> Dict[str, Any] | None:
+    """Local classifier answer if it is confident enough, else None (ask Groq)"""
+    model = get_fast_classifier()
+    if model is None:
+        return None
+    prediction = model.predict(subject, body)
+    if prediction["category"][1] < settings.EMAIL_FAST_PATH_THRESHOLD:
+        EMAIL_FAST_PATH.labels("deferred").inc()
+        return None
+    EMAIL_FAST_PATH.labels("answered").inc()
+    return fast_path_result(prediction)
+
+def get_email_cache_stats() -> Dict[str, Any]:
+    """Hit/miss counters for the classification cache"""
+    return {
+        "enabled": settings.EMAIL_CACHE_ENABLED,
+        "prompt_version": settings.EMAIL_PROMPT_VERSION,
+        "cache": _classification_cache.stats() if _classification_cache else None
+    }
+
+# Neutral values for fields a partially valid answer lost; the category must survive
+EMAIL_ANSWER_DEFAULTS = {
+    "priority": "Medium",
+    "sentiment": "Neutral",
+    "confidence": 0.5,
+    "tags": [],
+    "reasoning": "Partially recovered AI classification"
+}
+EMAIL_ANSWER_ESSENTIAL = ("category",)
 
 # Advanced prompts for KYC email classification
 EMAIL_CLASSIFICATION_SYSTEM_PROMPT = """
@@ -65,99 +125,300 @@ Respond with a JSON object containing:
 Focus on the customer's intent, urgency, emotional tone, and any KYC-related keywords or phrases.
 """
 
-def classify_email(subject: str, body: str, user: Dict[str, Any] | None) -> Dict[str, Any]:
+# Batched variant: the system prompt is sent once for several emails
+BATCH_EMAIL_CLASSIFICATION_USER_PROMPT = """
+Analyze each of these {count} customer emails independently for KYC classification:
+
+{emails}
+Respond with a JSON object containing one result per email, in the same order:
+{{
+    "results": [
+        {{
+            "index": 0,
+            "category": "Onboarding|Dispute|Other",
+            "priority": "High|Medium|Low",
+            "sentiment": "Positive|Negative|Neutral",
+            "confidence": 0.0-1.0,
+            "tags": ["relevant", "tags", "here"],
+            "reasoning": "Explanation of classification decision"
+        }}
+    ]
+}}
+
+Focus on each customer's intent, urgency, emotional tone, and any KYC-related keywords or phrases.
+"""
+
+EMAIL_BATCH_ITEM_TEMPLATE = """EMAIL {index}
+SUBJECT: {subject}
+
+BODY: {body}
+"""
+
+# Completion budget per email in a batched request
+EMAIL_BATCH_TOKENS_PER_ITEM = 350
+
+# Global instance
+_email_batcher_instance = None
+
+def get_email_batcher() -> MicroBatcher:
+    """Get singleton batcher used by classify_email when EMAIL_BATCHING_ENABLED is set"""
+    global _email_batcher_instance
+    if _email_batcher_instance is None:
+        _email_batcher_instance = MicroBatcher(
+            "email-classification",
+            request_classification_batch,
+            max_batch_size=settings.EMAIL_BATCH_MAX_SIZE,
+            max_wait_seconds=settings.EMAIL_BATCH_WINDOW_MS / 1000
+        )
+    return _email_batcher_instance
+
+async def classify_email(subject: str, body: str, user: Dict[str, Any] | None) -> Dict[str, Any]:
     """
     Classify emails into KYC categories using Groq API for real AI analysis.
     """
     start_time = time.time()
     
     try:
-        # Initialize Groq client
-        client = get_groq_client()
-        
-        # Format the prompt with actual email content
-        user_prompt = EMAIL_CLASSIFICATION_USER_PROMPT.format(
-            subject=subject,
-            body=body
-        )
-        
-        # Call Groq API
-        chat_completion = client.chat.completions.create(
-            messages=[
-                {
-                    "role": "system",
-                    "content": EMAIL_CLASSIFICATION_SYSTEM_PROMPT
-                },
-                {
-                    "role": "user", 
-                    "content": user_prompt
-                }
-            ],
-            model="openai/gpt-oss-20b",  # Use the most capable model
-            temperature=0.1,  # Low temperature for consistent classification
-            max_tokens=500,
-            response_format={"type": "json_object"}  # Ensure JSON response
-        )
-        
-        # Parse the response
-        response_content = chat_completion.choices[0].message.content
-        ai_result = json.loads(response_content)
-        
-        # Add additional context tags
-        additional_tags = []
-        content = f"{subject} {body}".lower()
-        
-        if user:
-            additional_tags.append("authenticated_user")
-        if any(word in content for word in ["attach", "attached", "document", "file"]):
-            additional_tags.append("documents_mentioned")
-        if any(word in content for word in ["asap", "urgent", "immediately", "emergency"]):
-            additional_tags.append("urgent_request")
-        if any(word in content for word in ["new", "first", "initial", "opening"]):
-            additional_tags.append("new_customer")
+        cache_key = _classification_cache_key(subject, body)
+        cached = await _classification_cache.get(cache_key) if _classification_cache else None
+        if cached is not None:
+            ai_result = cached["result"]
+            CACHE_TOKENS_SAVED.labels("email_classification").inc(cached.get("tokens_used", 0))
+        else:
+            # Routine mail: the local model answers without a Groq round trip
+            fast_result = _fast_path_answer(subject, body)
+            if fast_result is not None:
+                return _build_classification(subject, body, user, fast_result, start_time)
+
+            if settings.EMAIL_BATCHING_ENABLED:
+                # Share one request (and one system prompt) with concurrent callers
+                ai_result, tokens_used = await get_email_batcher().submit((subject, body))
+                if ai_result is None:
+                    ai_result, tokens_used = await _request_classification(subject, body, user_id_of(user))
+            else:
+                ai_result, tokens_used = await _request_classification(subject, body, user_id_of(user))
         
-        # Merge AI tags with additional context tags
-        all_tags = list(set(ai_result.get("tags", []) + additional_tags))
+        result = _build_classification(subject, body, user, ai_result, start_time)
         
-        processing_time = time.time() - start_time
+        # Cache the raw model answer only; context tags depend on the caller
+        if cached is None:
+            await log_llm_label(subject, body, ai_result)
+            if _classification_cache:
+                await _classification_cache.set(cache_key, {"result": ai_result, "tokens_used": tokens_used})
         
-        return {
-            "category": ai_result.get("category", "Other"),
-            "priority": ai_result.get("priority", "Medium"),
-            "sentiment": ai_result.get("sentiment", "Neutral"),
-            "confidence": float(ai_result.get("confidence", 0.85)),
-            "tags": sorted(all_tags),
-            "reasoning": ai_result.get("reasoning", "AI classification completed"),
-            "processing_time": round(processing_time, 2)
-        }
+        return result
         
-    except json.JSONDecodeError as e:
-        print(f"JSON parsing error: {e}")
+    except LLMOutputError as e:
+        print(f"AI answer unusable after repair: {e}")
         return _fallback_classification(subject, body, user)
     except Exception as e:
         print(f"Groq API error: {e}")
         return _fallback_classification(subject, body, user)
 
+async def classify_emails(emails: List[Tuple[str, str]], user: Dict[str, Any] | None) -> List[Dict[str, Any]]:
+    """
+    Classify many emails with as few Groq requests as possible: cached emails
+    and confident local-model predictions are answered locally and the rest
+    are sent EMAIL_BATCH_MAX_SIZE at a time.
+    """
+    start_time = time.time()
+    results: List[Dict[str, Any] | None] = [None] * len(emails)
+    misses: List[int] = []
+    for i, (subject, body) in enumerate(emails):
+        cached = await _classification_cache.get(_classification_cache_key(subject, body)) if _classification_cache else None
+        if cached is not None:
+            CACHE_TOKENS_SAVED.labels("email_classification").inc(cached.get("tokens_used", 0))
+            results[i] = _build_classification(subject, body, user, cached["result"], start_time)
+            continue
+        fast_result = _fast_path_answer(subject, body)
+        if fast_result is not None:
+            results[i] = _build_classification(subject, body, user, fast_result, start_time)
+        else:
+            misses.append(i)
+
+    async def classify_chunk(indices: List[int]) -> None:
+        try:
+            answers = await request_classification_batch([emails[i] for i in indices], user_id_of(user))
+        except Exception as e:
+            print(f"[EMAIL] Batch classification failed, classifying individually: {e}")
+            answers = [(None, 0)] * len(indices)
+        for i, (ai_result, tokens_used) in zip(indices, answers):
+            subject, body = emails[i]
+            if ai_result is None:
+                results[i] = await classify_email(subject, body, user)
+                continue
+            results[i] = _build_classification(subject, body, user, ai_result, start_time)
+            await log_llm_label(subject, body, ai_result)
+            if _classification_cache:
+                await _classification_cache.set(
+                    _classification_cache_key(subject, body), {"result": ai_result, "tokens_used": tokens_used}
+                )
+
+    size = max(1, settings.EMAIL_BATCH_MAX_SIZE)
+    await asyncio.gather(*(classify_chunk(misses[i:i + size]) for i in range(0, len(misses), size)))
+    return results
+
+async def _request_classification(
+    subject: str,
+    body: str,
+    user_id: Optional[int] = None
+) -> Tuple[Dict[str, Any], int]:
+    """One Groq request for one email; returns the parsed answer and tokens used"""
+    # Shared async client (pooled connections, never blocks the event loop)
+    client = get_groq_client()
+    
+    # Format the prompt with actual email content
+    user_prompt = EMAIL_CLASSIFICATION_USER_PROMPT.format(
+        subject=subject,
+        body=body
+    )
+    
+    # Call Groq API
+    completion = await client.chat_completion(
+        messages=[
+            {
+                "role": "system",
+                "content": EMAIL_CLASSIFICATION_SYSTEM_PROMPT
+            },
+            {
+                "role": "user", 
+                "content": user_prompt
+            }
+        ],
+        model=settings.GROQ_MODEL_EMAIL,
+        temperature=0.1,  # Low temperature for consistent classification
+        max_tokens=500,
+        response_format={"type": "json_object"},  # Ensure JSON response
+        operation="email_classification",
+        user_id=user_id
+    )
+    if not completion["success"]:
+        raise RuntimeError(completion["error"])
+    
+    # Parse the response (repaired or salvaged if malformed)
+    answer = parse_llm_json(
+        completion["content"],
+        EMAIL_CLASSIFICATION_VALIDATOR,
+        "email_classification",
+        EMAIL_ANSWER_DEFAULTS,
+        EMAIL_ANSWER_ESSENTIAL,
+        tokens_used=completion["tokens_used"]
+    )
+    return answer, completion["tokens_used"]
+
+async def request_classification_batch(
+    emails: Sequence[Tuple[str, str]],
+    user_id: Optional[int] = None
+) -> List[Tuple[Dict[str, Any] | None, int]]:
+    """
+    Classify several emails in one Groq request. Returns (answer, token share)
+    per email, in order; answer is None for emails missing from the response.
+    Micro-batched requests mix callers, so they are booked without a user.
+    """
+    if not emails:
+        return []
+    if len(emails) == 1:
+        return [await _request_classification(*emails[0], user_id)]
+
+    email_blocks = "\n".join(
+        EMAIL_BATCH_ITEM_TEMPLATE.format(index=i, subject=subject, body=body)
+        for i, (subject, body) in enumerate(emails)
+    )
+    completion = await get_groq_client().chat_completion(
+        messages=[
+            {
+                "role": "system",
+                "content": EMAIL_CLASSIFICATION_SYSTEM_PROMPT
+            },
+            {
+                "role": "user",
+                "content": BATCH_EMAIL_CLASSIFICATION_USER_PROMPT.format(count=len(emails), emails=email_blocks)
+            }
+        ],
+        model=settings.GROQ_MODEL_EMAIL,
+        temperature=0.1,
+        max_tokens=EMAIL_BATCH_TOKENS_PER_ITEM * len(emails),
+        response_format={"type": "json_object"},
+        operation="email_classification_batch",
+        user_id=user_id
+    )
+    if not completion["success"]:
+        raise RuntimeError(completion["error"])
+
+    # A truncated batch is repaired so the complete items are kept; each item
+    # is then validated on its own and only unusable ones are re-requested
+    data, outcome = load_llm_json(completion["content"])
+    items = data.get("results", []) if isinstance(data, dict) else []
+    token_share = completion["tokens_used"] // len(emails)
+    answers: List[Dict[str, Any] | None] = [None] * len(emails)
+    for position, item in enumerate(items):
+        if not isinstance(item, dict):
+            continue
+        index = item.pop("index", position)
+        if isinstance(index, int) and 0 <= index < len(emails) and answers[index] is None:
+            answers[index] = validate_llm_object(
+                item,
+                EMAIL_CLASSIFICATION_VALIDATOR,
+                "email_classification_batch",
+                EMAIL_ANSWER_DEFAULTS,
+                EMAIL_ANSWER_ESSENTIAL,
+                outcome,
+                token_share
+            )
+    return [(answer, token_share) for answer in answers]
+
+def _build_classification(
+    subject: str,
+    body: str,
+    user: Dict[str, Any] | None,
+    ai_result: Dict[str, Any],
+    start_time: float
+) -> Dict[str, Any]:
+    """Merge the model's answer with keyword context tags into the result shape"""
+    # Add additional context tags (one pass over the text for every keyword)
+    additional_tags = []
+    keywords = get_keyword_matcher()
+    found = keywords.scan(subject, body)
+    
+    if user:
+        additional_tags.append("authenticated_user")
+    additional_tags.extend(keywords.labels(found, "email_tags"))
+    
+    # Merge AI tags with additional context tags
+    all_tags = list(set(ai_result.get("tags", []) + additional_tags))
+    
+    processing_time = time.time() - start_time
+    
+    return {
+        "category": ai_result.get("category", "Other"),
+        "priority": ai_result.get("priority", "Medium"),
+        "sentiment": ai_result.get("sentiment", "Neutral"),
+        "confidence": float(ai_result.get("confidence", 0.85)),
+        "tags": sorted(all_tags),
+        "reasoning": ai_result.get("reasoning", "AI classification completed"),
+        "processing_time": round(processing_time, 2)
+    }
+
 def _fallback_classification(subject: str, body: str, user: Any) -> Dict[str, Any]:
     """
     Fallback classification using keyword matching if Groq API fails.
     """
     print("[EMAIL] Using fallback classification due to API error")
+    record_fallback("email_classification")
     
-    content = f"{subject} {body}".lower()
+    keywords = get_keyword_matcher()
+    found = keywords.scan(subject, body)
     
     # Simple keyword-based classification
-    if any(word in content for word in ["kyc", "onboard", "verification", "application", "new account"]):
-        category = "Onboarding"
-        priority = "High" if any(word in content for word in ["urgent", "asap"]) else "Medium"
-    elif any(word in content for word in ["dispute", "appeal", "rejected", "complaint", "error"]):
-        category = "Dispute" 
+    category = keywords.first(found, "email_category") or "Other"
+    if category == "Onboarding":
+        priority = keywords.first(found, "email_priority") or "Medium"
+    elif category == "Dispute":
         priority = "High"
     else:
-        category = "Other"
         priority = "Low"
     
-    sentiment = "Negative" if any(word in content for word in ["angry", "frustrated", "upset"]) else "Neutral"
+    sentiment = keywords.first(found, "email_sentiment") or "Neutral"
     
     tags = ["fallback_classification"]
     if user:
@@ -178,7 +439,7 @@ async def classify_email_chain(subject: str, body: str) -> Dict[str, Any]:
     """
     Legacy wrapper function for backward compatibility.
     """
-    result = classify_email(subject, body, None)
+    result = await classify_email(subject, body, None)
     
     return {
         "category": result["category"],
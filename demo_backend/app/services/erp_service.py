@@ -1,10 +1,51 @@
 from __future__ import annotations
 
+import base64
 import requests
 from datetime import datetime
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterator, List, Optional
 import json
 
+from .document_handle import DocumentHandle
+from .metrics import ODOO_RPC_SECONDS
+
+# Raw bytes encoded per chunk when streaming attachments; a multiple of 3 so
+# every chunk encodes to base64 without padding.
+ATTACHMENT_STREAM_CHUNK_SIZE = 3 * 64 * 1024
+
+
+class Base64JSONBody:
+    """
+    Iterable JSON-RPC request body whose binary field is base64-encoded on the
+    fly, chunk by chunk. The full encoded string is never materialised, and
+    the exact length is known up front so the request is sent with a normal
+    Content-Length instead of chunked transfer encoding.
+    """
+
+    _PLACEHOLDER = "__BASE64_PAYLOAD__"
+
+    def __init__(self, envelope: Dict[str, Any], field_path: List[Any], data: memoryview):
+        # Serialise the envelope around a placeholder, then split it out
+        target = envelope
+        for key in field_path[:-1]:
+            target = target[key]
+        target[field_path[-1]] = self._PLACEHOLDER
+        prefix, suffix = json.dumps(envelope).split(f'"{self._PLACEHOLDER}"', 1)
+        self._prefix = (prefix + '"').encode("utf-8")
+        self._suffix = ('"' + suffix).encode("utf-8")
+        self._data = data
+
+    def __len__(self) -> int:
+        encoded_len = 4 * ((self._data.nbytes + 2) // 3)
+        return len(self._prefix) + encoded_len + len(self._suffix)
+
+    def __iter__(self) -> Iterator[bytes]:
+        yield self._prefix
+        for start in range(0, self._data.nbytes, ATTACHMENT_STREAM_CHUNK_SIZE):
+            yield base64.b64encode(self._data[start:start + ATTACHMENT_STREAM_CHUNK_SIZE])
+        yield self._suffix
+
+
 class OdooClient:
     def __init__(self):
         self.url = "http://3.6.198.245:8089"
@@ -21,7 +62,8 @@ class OdooClient:
                 return True
 
             # First get database list
-            response = requests.post(f"{self.url}/web/database/list", json={})
+            with ODOO_RPC_SECONDS.labels("db", "list").time():
+                response = requests.post(f"{self.url}/web/database/list", json={})
             if response.status_code == 200:
                 result = response.json()
                 if result.get('result') and len(result['result']) > 0:
@@ -31,13 +73,14 @@ class OdooClient:
                     return False
             
             # Now authenticate
-            auth_response = requests.post(f"{self.url}/web/session/authenticate", json={
-                'params': {
-                    'db': self.db,
-                    'login': self.username,
-                    'password': self.password
-                }
-            })
+            with ODOO_RPC_SECONDS.labels("session", "authenticate").time():
+                auth_response = requests.post(f"{self.url}/web/session/authenticate", json={
+                    'params': {
+                        'db': self.db,
+                        'login': self.username,
+                        'password': self.password
+                    }
+                })
             
             if auth_response.status_code == 200:
                 result = auth_response.json()
@@ -56,17 +99,18 @@ class OdooClient:
             return None
                 
         try:
-            response = requests.post(f"{self.url}/web/dataset/call_kw", 
-                json={
-                    'params': {
-                        'model': model,
-                        'method': 'create',
-                        'args': [data],
-                        'kwargs': {}
-                    }
-                },
-                cookies={'session_id': self.session_id}
-            )
+            with ODOO_RPC_SECONDS.labels(model, "create").time():
+                response = requests.post(f"{self.url}/web/dataset/call_kw", 
+                    json={
+                        'params': {
+                            'model': model,
+                            'method': 'create',
+                            'args': [data],
+                            'kwargs': {}
+                        }
+                    },
+                    cookies={'session_id': self.session_id}
+                )
             
             if response.status_code == 200:
                 result = response.json()
@@ -89,6 +133,44 @@ class OdooClient:
             'type': 'binary'
         }
         return self.create_record('ir.attachment', attachment_data)
+
+    def create_attachment_stream(self, name: str, data: memoryview, res_model: str, res_id: int) -> Optional[int]:
+        """Create an attachment, streaming the base64 payload into the request body"""
+        if not self.authenticate():
+            return None
+
+        envelope = {
+            'params': {
+                'model': 'ir.attachment',
+                'method': 'create',
+                'args': [{
+                    'name': name,
+                    'datas': None,  # filled in chunk by chunk by Base64JSONBody
+                    'res_model': res_model,
+                    'res_id': res_id,
+                    'type': 'binary'
+                }],
+                'kwargs': {}
+            }
+        }
+        try:
+            with ODOO_RPC_SECONDS.labels("ir.attachment", "create").time():
+                response = requests.post(f"{self.url}/web/dataset/call_kw",
+                    data=Base64JSONBody(envelope, ['params', 'args', 0, 'datas'], data),
+                    headers={'Content-Type': 'application/json'},
+                    cookies={'session_id': self.session_id}
+                )
+
+            if response.status_code == 200:
+                result = response.json()
+                if result.get('result'):
+                    return result['result']
+                else:
+                    print(f"[ODOO] Error creating attachment {name}: {result}")
+            return None
+        except Exception as e:
+            print(f"[ODOO] Exception creating attachment {name}: {e}")
+            return None
     
     def search_records(self, model: str, domain: List = None, fields: List = None) -> List[Dict]:
         """Search records in Odoo"""
@@ -96,17 +178,18 @@ class OdooClient:
             return []
                 
         try:
-            response = requests.post(f"{self.url}/web/dataset/call_kw",
-                json={
-                    'params': {
-                        'model': model,
-                        'method': 'search_read',
-                        'args': [domain or []],
-                        'kwargs': {'fields': fields or []}
-                    }
-                },
-                cookies={'session_id': self.session_id}
-            )
+            with ODOO_RPC_SECONDS.labels(model, "search_read").time():
+                response = requests.post(f"{self.url}/web/dataset/call_kw",
+                    json={
+                        'params': {
+                            'model': model,
+                            'method': 'search_read',
+                            'args': [domain or []],
+                            'kwargs': {'fields': fields or []}
+                        }
+                    },
+                    cookies={'session_id': self.session_id}
+                )
             
             if response.status_code == 200:
                 result = response.json()
@@ -122,17 +205,18 @@ class OdooClient:
             return False
                 
         try:
-            response = requests.post(f"{self.url}/web/dataset/call_kw",
-                json={
-                    'params': {
-                        'model': model,
-                        'method': 'unlink',
-                        'args': [[record_id]],
-                        'kwargs': {}
-                    }
-                },
-                cookies={'session_id': self.session_id}
-            )
+            with ODOO_RPC_SECONDS.labels(model, "unlink").time():
+                response = requests.post(f"{self.url}/web/dataset/call_kw",
+                    json={
+                        'params': {
+                            'model': model,
+                            'method': 'unlink',
+                            'args': [[record_id]],
+                            'kwargs': {}
+                        }
+                    },
+                    cookies={'session_id': self.session_id}
+                )
             
             if response.status_code == 200:
                 result = response.json()
@@ -172,7 +256,9 @@ def create_kyc_processing_record(
     email_body: str,
     document_data: Optional[Dict[str, Any]] = None,
     tamper_data: Optional[Dict[str, Any]] = None,
-    attachments: List[Dict[str, str]] = None
+    attachments: Optional[List[DocumentHandle]] = None,
+    document_analyses: Optional[List[Dict[str, Any]]] = None,
+    tamper_detections: Optional[List[Dict[str, Any]]] = None
 ) -> Optional[int]:
     """Create KYC processing record using crm.lead model"""
     
@@ -223,6 +309,9 @@ def create_kyc_processing_record(
         "email_classification": email_data,
         "document_analysis": document_data,
         "tamper_detection": tamper_data,
+        # Per-attachment results; the singular keys above hold the primary document
+        "document_analyses": document_analyses or [],
+        "tamper_detections": tamper_detections or [],
         "processing_timestamp": datetime.utcnow().isoformat(),
         "processed_by": user_email
     }
@@ -238,11 +327,12 @@ def create_kyc_processing_record(
     
     if lead_id and attachments:
         print(f"[KYC] Uploading {len(attachments)} attachments to Odoo CRM...")
+        # One attachment at a time, each encoded while it is being sent
         for att in attachments:
-            _odoo_client.create_attachment(
-                name=att['name'], 
-                datas=att['content'], 
-                res_model='crm.lead', 
+            _odoo_client.create_attachment_stream(
+                name=att.filename,
+                data=att.data,
+                res_model='crm.lead',
                 res_id=lead_id
             )
             
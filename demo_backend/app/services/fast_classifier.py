@@ -0,0 +1,248 @@
+# demo_backend/app/services/fast_classifier.py
+"""
+Local fast-path email classifier.
+
+A multinomial logistic regression over hashed word unigrams and bigrams,
+one softmax head each for category, priority and sentiment. It is trained
+offline on the labels the LLM produced (logged to the opt-in
+EMAIL_LABEL_LOG) and stored as a small JSON file of sparse weights, so
+scoring an email is a few hundred dict lookups. `classify_email` returns its answer directly when
+the category probability clears EMAIL_FAST_PATH_THRESHOLD and asks Groq
+otherwise.
+
+Train with `python -m app.services.train_email_classifier`.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+import unicodedata
+import zlib
+from itertools import islice
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from ..config import settings
+from .llm_output import SALVAGED
+
+HEADS: Dict[str, Tuple[str, ...]] = {
+    "category": ("Onboarding", "Dispute", "Other"),
+    "priority": ("High", "Medium", "Low"),
+    "sentiment": ("Positive", "Negative", "Neutral"),
+}
+MODEL_FORMAT = 1
+DEFAULT_FEATURE_BITS = 18
+# Long bodies add little signal after the first few hundred words and would only cost latency
+MAX_TOKENS = 300
+# Characters scanned per wanted word, so a huge body is never normalised in full
+_SCAN_CHARS_PER_WORD = 64
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+
+
+def tokenize(text: str, limit: Optional[int] = None) -> List[str]:
+    """Lower-cased words of `text`; with `limit`, the scan stops after that many words."""
+    if limit is None:
+        return _TOKEN_RE.findall(unicodedata.normalize("NFKC", text or "").casefold())
+    normalized = unicodedata.normalize("NFKC", (text or "")[:limit * _SCAN_CHARS_PER_WORD]).casefold()
+    return [match.group() for match in islice(_TOKEN_RE.finditer(normalized), limit)]
+
+
+def hash_features(subject: str, body: str, feature_bits: int) -> Dict[int, float]:
+    """L2-normalised binary features: subject words, body words and body bigrams."""
+    mask = (1 << feature_bits) - 1
+    words = tokenize(body, MAX_TOKENS)
+    keys = [f"s:{w}" for w in tokenize(subject)]
+    keys += words
+    keys += [f"{a} {b}" for a, b in zip(words, words[1:])]
+    indices = {zlib.crc32(key.encode()) & mask for key in keys}
+    if not indices:
+        return {}
+    value = 1.0 / math.sqrt(len(indices))
+    return {index: value for index in indices}
+
+
+def _softmax(scores: List[float]) -> List[float]:
+    top = max(scores)
+    exps = [math.exp(s - top) for s in scores]
+    total = sum(exps)
+    return [e / total for e in exps]
+
+
+class LinearEmailClassifier:
+    """Sparse multi-head softmax classifier over hashed features."""
+
+    def __init__(
+        self,
+        feature_bits: int = DEFAULT_FEATURE_BITS,
+        weights: Optional[Dict[str, Dict[int, List[float]]]] = None,
+        biases: Optional[Dict[str, List[float]]] = None,
+        metadata: Optional[Dict[str, Any]] = None
+    ):
+        self.feature_bits = feature_bits
+        self.weights = weights or {head: {} for head in HEADS}
+        self.biases = biases or {head: [0.0] * len(labels) for head, labels in HEADS.items()}
+        self.metadata = metadata or {}
+
+    def _probabilities(self, head: str, features: Dict[int, float]) -> List[float]:
+        weights = self.weights[head]
+        scores = list(self.biases[head])
+        for index, value in features.items():
+            row = weights.get(index)
+            if row is not None:
+                for k, w in enumerate(row):
+                    scores[k] += w * value
+        return _softmax(scores)
+
+    def predict(self, subject: str, body: str) -> Dict[str, Any]:
+        """Label and probability per head, e.g. {"category": ("Onboarding", 0.97), ...}."""
+        features = hash_features(subject, body, self.feature_bits)
+        prediction: Dict[str, Any] = {}
+        for head, labels in HEADS.items():
+            probabilities = self._probabilities(head, features)
+            best = max(range(len(labels)), key=probabilities.__getitem__)
+            prediction[head] = (labels[best], probabilities[best])
+        return prediction
+
+    def fit(
+        self,
+        examples: Sequence[Dict[str, Any]],
+        epochs: int = 8,
+        learning_rate: float = 0.5,
+        l2: float = 1e-6,
+        seed: int = 13
+    ) -> None:
+        """Plain SGD on the cross-entropy of every head; examples need subject, body and labels."""
+        rng = random.Random(seed)
+        samples = [
+            (hash_features(e.get("subject", ""), e.get("body", ""), self.feature_bits), e) for e in examples
+        ]
+        for epoch in range(epochs):
+            rng.shuffle(samples)
+            rate = learning_rate / (1 + epoch)
+            for features, example in samples:
+                for head, labels in HEADS.items():
+                    label = example.get(head)
+                    if label not in labels:
+                        continue
+                    target = labels.index(label)
+                    probabilities = self._probabilities(head, features)
+                    gradient = [p - (1.0 if k == target else 0.0) for k, p in enumerate(probabilities)]
+                    bias = self.biases[head]
+                    weights = self.weights[head]
+                    for k, g in enumerate(gradient):
+                        bias[k] -= rate * g
+                    for index, value in features.items():
+                        row = weights.setdefault(index, [0.0] * len(labels))
+                        for k, g in enumerate(gradient):
+                            row[k] -= rate * (g * value + l2 * row[k])
+
+    def save(self, path: str) -> None:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        payload = {
+            "format": MODEL_FORMAT,
+            "feature_bits": self.feature_bits,
+            "labels": {head: list(labels) for head, labels in HEADS.items()},
+            "biases": self.biases,
+            # Rounded and sparse: unused hash buckets are not stored
+            "weights": {
+                head: {str(index): [round(w, 5) for w in row] for index, row in rows.items() if any(row)}
+                for head, rows in self.weights.items()
+            },
+            "metadata": self.metadata,
+        }
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(payload, f, separators=(",", ":"))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "LinearEmailClassifier":
+        with open(path, encoding="utf-8") as f:
+            payload = json.load(f)
+        if payload.get("format") != MODEL_FORMAT:
+            raise ValueError(f"Unsupported email classifier format: {payload.get('format')}")
+        if payload.get("labels") != {head: list(labels) for head, labels in HEADS.items()}:
+            raise ValueError("Email classifier was trained with different labels")
+        weights = {
+            head: {int(index): row for index, row in rows.items()} for head, rows in payload["weights"].items()
+        }
+        return cls(payload["feature_bits"], weights, payload["biases"], payload.get("metadata"))
+
+
+def fast_path_result(prediction: Dict[str, Any]) -> Dict[str, Any]:
+    """Turn a prediction into the same answer shape the LLM returns."""
+    category, confidence = prediction["category"]
+    return {
+        "category": category,
+        "priority": prediction["priority"][0],
+        "sentiment": prediction["sentiment"][0],
+        "confidence": round(confidence, 3),
+        "tags": ["local_model"],
+        "reasoning": f"Classified by the local model trained on previous AI classifications (p={confidence:.2f})",
+    }
+
+
+# Global instance (None when disabled or no trained model is available)
+_fast_classifier_instance: Optional[LinearEmailClassifier] = None
+_fast_classifier_loaded = False
+
+def get_fast_classifier() -> Optional[LinearEmailClassifier]:
+    """Load the trained model once; returns None if the fast path is unavailable"""
+    global _fast_classifier_instance, _fast_classifier_loaded
+    if not _fast_classifier_loaded:
+        _fast_classifier_loaded = True
+        path = settings.EMAIL_FAST_PATH_MODEL
+        if settings.EMAIL_FAST_PATH_ENABLED and path and os.path.exists(path):
+            try:
+                _fast_classifier_instance = LinearEmailClassifier.load(path)
+                print(f"[EMAIL] Local fast-path classifier loaded from {path}")
+            except Exception as e:
+                print(f"[EMAIL] Could not load local classifier from {path}: {e}")
+    return _fast_classifier_instance
+
+
+# Serialises appends from the worker threads that write the label log
+_label_log_lock = threading.Lock()
+_label_log_full = False
+
+async def log_llm_label(subject: str, body: str, answer: Dict[str, Any]) -> None:
+    """Append an LLM classification to the training log (EMAIL_LABEL_LOG, opt-in) off the event loop"""
+    path = settings.EMAIL_LABEL_LOG
+    # Salvaged answers carry default priority/sentiment, which would be learned as labels
+    if not path or _label_log_full or getattr(answer, "outcome", None) == SALVAGED:
+        return
+    record = {
+        "subject": subject,
+        "body": body,
+        "category": answer.get("category"),
+        "priority": answer.get("priority"),
+        "sentiment": answer.get("sentiment"),
+        "model": settings.GROQ_MODEL_EMAIL,
+        "prompt_version": settings.EMAIL_PROMPT_VERSION,
+        "logged_at": time.time(),
+    }
+    await asyncio.to_thread(_append_label, path, json.dumps(record, ensure_ascii=False) + "\n")
+
+def _append_label(path: str, line: str) -> None:
+    global _label_log_full
+    try:
+        with _label_log_lock:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            if os.path.exists(path) and os.path.getsize(path) >= settings.EMAIL_LABEL_LOG_MAX_BYTES:
+                _label_log_full = True
+                print(f"[EMAIL] Label log {path} reached EMAIL_LABEL_LOG_MAX_BYTES; no longer logging")
+                return
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(line)
+    except OSError as e:
+        print(f"[EMAIL] Could not log classification label: {e}")
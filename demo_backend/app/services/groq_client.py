@@ -2,24 +2,71 @@
 from __future__ import annotations
 
 import asyncio
+import hashlib
+import json
 import time
-from typing import Dict, Any, Optional
-from groq import Groq
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, Optional
+import httpx
+from groq import APIConnectionError, APIStatusError, AsyncGroq, RateLimitError
 from ..config import settings
+from .metrics import (
+    GROQ_COALESCED_REQUESTS,
+    GROQ_HEDGED_REQUESTS,
+    GROQ_REQUEST_SECONDS,
+    GROQ_RETRIES,
+    GROQ_THROTTLE_SECONDS,
+    GROQ_TIME_TO_FIRST_TOKEN,
+    record_groq_usage
+)
+from .circuit_breaker import CircuitOpenError, get_circuit_breaker
+from .hedging import get_hedge_policy
+from .rate_limiter import CHARS_PER_TOKEN, RateLimiter, backoff_delay, estimate_prompt_tokens, parse_retry_after
+from .token_ledger import TokenBudgetExceeded, get_token_ledger
 
 class GroqClient:
     """
     Groq API client wrapper with rate limiting, error handling, and token usage tracking.
+
+    One instance is shared per process: it holds an async client over a
+    keep-alive connection pool, so concurrent requests reuse connections and
+    never block the event loop.
     """
     
-    def __init__(self):
+    def __init__(self, http_client: Optional[httpx.AsyncClient] = None):
         if not settings.GROQ_API_KEY:
             raise ValueError("GROQ_API_KEY is required but not found in environment")
         
-        self.client = Groq(api_key=settings.GROQ_API_KEY)
+        # Tests pass a client with their own transport (e.g. httpx.MockTransport)
+        self.http_client = http_client or httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=settings.GROQ_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.GROQ_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=settings.GROQ_KEEPALIVE_EXPIRY
+            ),
+            timeout=httpx.Timeout(settings.GROQ_REQUEST_TIMEOUT, connect=settings.GROQ_CONNECT_TIMEOUT)
+        )
+        # Retries are handled here (honouring Retry-After) rather than inside the SDK
+        self.client = AsyncGroq(
+            api_key=settings.GROQ_API_KEY,
+            base_url=settings.GROQ_BASE_URL or None,
+            http_client=self.http_client,
+            max_retries=0
+        )
+        self.rate_limiter = RateLimiter(
+            requests_per_minute=settings.GROQ_REQUESTS_PER_MINUTE,
+            tokens_per_minute=settings.GROQ_TOKENS_PER_MINUTE,
+            max_concurrency=settings.GROQ_MAX_CONCURRENCY
+        )
+        # Shared, persistent budget; the counters below are this process only
+        self.ledger = get_token_ledger()
         self.daily_token_usage = 0
         self.last_reset_date = time.strftime("%Y-%m-%d")
         self.request_count = 0
+        if settings.GROQ_BASE_URL:
+            print(f"[GROQ] Using API endpoint {settings.GROQ_BASE_URL}")
+        # Single-flight: identical requests in flight share one upstream call
+        self._inflight: Dict[str, asyncio.Task] = {}
         
     def _reset_daily_counters_if_needed(self):
         """Reset daily counters if it's a new day"""
@@ -30,14 +77,6 @@ class GroqClient:
             self.last_reset_date = current_date
             print(f"[GROQ] Daily counters reset for {current_date}")
     
-    def _check_token_limit(self) -> bool:
-        """Check if daily token limit has been exceeded"""
-        if not settings.GROQ_ENABLE_TOKEN_TRACKING:
-            return True
-            
-        self._reset_daily_counters_if_needed()
-        return self.daily_token_usage < settings.GROQ_DAILY_TOKEN_LIMIT
-    
     def _update_token_usage(self, completion_response) -> int:
         """Update token usage tracking and return tokens used"""
         if not settings.GROQ_ENABLE_TOKEN_TRACKING:
@@ -60,39 +99,86 @@ class GroqClient:
         model: Optional[str] = None,
         temperature: Optional[float] = None,
         max_tokens: Optional[int] = None,
-        response_format: Optional[Dict[str, Any]] = None
+        response_format: Optional[Dict[str, Any]] = None,
+        operation: str = "chat",
+        user_id: Optional[int] = None,
+        on_delta: Optional[Callable[[str], None]] = None
     ) -> Dict[str, Any]:
         """
         Make a chat completion request to Groq API with error handling and rate limiting.
+
+        Concurrent calls from the same `user_id` with an identical payload
+        are coalesced: the first caller makes the request and every duplicate
+        receives the same result (including the same error result). Tokens
+        are booked once, to `user_id`, in the shared ledger, so calls from
+        different users are never joined; raises TokenBudgetExceeded once
+        the daily budget is used up.
+
+        With `on_delta` the completion is streamed and each piece of content
+        is passed to it as it arrives; the returned dict is the same. Streamed
+        calls are neither coalesced nor hedged, since every caller needs its
+        own deltas.
         """
-        # Check token limits
-        if not self._check_token_limit():
-            raise Exception(f"Daily token limit ({settings.GROQ_DAILY_TOKEN_LIMIT}) exceeded")
-        
         # Set defaults from config
         model = model or settings.GROQ_MODEL_EMAIL
         temperature = temperature if temperature is not None else settings.GROQ_TEMPERATURE
         max_tokens = max_tokens or settings.GROQ_MAX_TOKENS
         
+        completion_args = {
+            "messages": messages,
+            "model": model,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+        }
+        
+        if on_delta is not None:
+            # JSON mode is not available for streamed completions; the prompt
+            # asks for JSON and the answer is repaired/validated afterwards
+            completion_args["stream"] = True
+            return await self._create_completion(completion_args, operation, user_id, on_delta)
+
+        if response_format:
+            completion_args["response_format"] = response_format
+        
+        # Per user, so each user's usage in the ledger is exactly what was sent for them
+        key = hashlib.sha256(json.dumps([user_id, completion_args], sort_keys=True).encode("utf-8")).hexdigest()
+        task = self._inflight.get(key)
+        if task is not None:
+            GROQ_COALESCED_REQUESTS.labels(operation).inc()
+            print(f"[GROQ] Joining in-flight request for model: {model}")
+        else:
+            task = asyncio.create_task(self._create_completion(completion_args, operation, user_id))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        
+        # Shielded so one caller going away does not cancel the call for the others
+        return dict(await asyncio.shield(task))
+    
+    async def _create_completion(
+        self,
+        completion_args: Dict[str, Any],
+        operation: str,
+        user_id: Optional[int],
+        on_delta: Optional[Callable[[str], None]] = None
+    ) -> Dict[str, Any]:
+        model = completion_args["model"]
+        reserved = 0
+        if settings.GROQ_ENABLE_TOKEN_TRACKING:
+            # Check token limits (reserve the prompt estimate from the shared budget)
+            reserved = estimate_prompt_tokens(completion_args["messages"])
+            await self.ledger.reserve(reserved)
         try:
-            # Make the API call
-            self.request_count += 1
-            print(f"[GROQ] Making API request #{self.request_count} to model: {model}")
-            
-            completion_args = {
-                "messages": messages,
-                "model": model,
-                "temperature": temperature,
-                "max_tokens": max_tokens,
-            }
-            
-            if response_format:
-                completion_args["response_format"] = response_format
-            
-            completion = self.client.chat.completions.create(**completion_args)
+            if on_delta is not None:
+                completion = await self._send_with_retries(completion_args, operation, on_delta)
+            else:
+                completion = await self._send_hedged(completion_args, operation, user_id)
             
             # Track token usage
             tokens_used = self._update_token_usage(completion)
+            record_groq_usage(operation, getattr(completion, "usage", None))
+            if reserved:
+                self.ledger.record(user_id, model, tokens_used, reserved)
+                reserved = 0
             
             # Extract response content
             response_content = completion.choices[0].message.content
@@ -106,6 +192,8 @@ class GroqClient:
             
         except Exception as e:
             print(f"[GROQ] API Error: {str(e)}")
+            if reserved:
+                self.ledger.release(reserved)
             return {
                 "content": None,
                 "error": str(e),
@@ -114,6 +202,188 @@ class GroqClient:
                 "success": False
             }
     
+    async def _send_hedged(
+        self,
+        completion_args: Dict[str, Any],
+        operation: str,
+        user_id: Optional[int]
+    ) -> Any:
+        """
+        Send, and for hedged operations send a duplicate once the call has run
+        longer than the operation's hedge delay (see hedging.py). The first
+        successful answer wins and the other call is cancelled; the duplicate
+        is booked to the ledger separately, since upstream may already have
+        processed its prompt.
+        """
+        policy = get_hedge_policy(operation)
+        if policy is None:
+            return await self._send_with_retries(completion_args, operation)
+
+        delay = policy.hedge_delay()
+        started = time.monotonic()
+        primary = asyncio.create_task(self._send_with_retries(completion_args, operation))
+        hedge: Optional[asyncio.Task] = None
+        winner: Optional[asyncio.Task] = None
+        hedge_reserved = 0
+        try:
+            if delay is not None:
+                await asyncio.wait({primary}, timeout=delay)
+                if not primary.done():
+                    if policy.try_hedge():
+                        hedge_reserved = await self._reserve_hedge(completion_args)
+                        if hedge_reserved >= 0:
+                            print(f"[GROQ] {operation} still running after {delay:.2f}s, sending a hedged request")
+                            hedge = asyncio.create_task(self._send_with_retries(completion_args, operation))
+                        else:
+                            # Daily budget used up: no duplicate, so the credit is not spent
+                            policy.refund_hedge()
+                            GROQ_HEDGED_REQUESTS.labels(operation, "no_budget").inc()
+                    else:
+                        GROQ_HEDGED_REQUESTS.labels(operation, "denied").inc()
+
+            pending = {primary} if hedge is None else {primary, hedge}
+            while pending and winner is None:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                winner = next((task for task in done if task.exception() is None), None)
+            if winner is None:
+                # Every attempt failed: surface the original call's error
+                return primary.result()
+
+            policy.observe(time.monotonic() - started)
+            if hedge is not None:
+                GROQ_HEDGED_REQUESTS.labels(operation, "won" if winner is hedge else "lost").inc()
+            return winner.result()
+        finally:
+            for task in (primary, hedge):
+                if task is not None and not task.done():
+                    task.cancel()
+            if hedge is not None:
+                loser = primary if winner is hedge else hedge
+                await self._settle_hedge(completion_args, operation, user_id, loser, hedge_reserved)
+
+    async def _reserve_hedge(self, completion_args: Dict[str, Any]) -> int:
+        """Reserve the duplicate's prompt estimate; -1 (no hedge) if the daily budget is used up."""
+        if not settings.GROQ_ENABLE_TOKEN_TRACKING:
+            return 0
+        estimate = estimate_prompt_tokens(completion_args["messages"])
+        try:
+            await self.ledger.reserve(estimate)
+        except TokenBudgetExceeded:
+            return -1
+        return estimate
+
+    async def _settle_hedge(
+        self,
+        completion_args: Dict[str, Any],
+        operation: str,
+        user_id: Optional[int],
+        loser: asyncio.Task,
+        reserved: int
+    ) -> None:
+        """Book the tokens of the call that did not provide the answer against the hedge reservation."""
+        await asyncio.gather(loser, return_exceptions=True)
+        if loser.cancelled():
+            tokens = reserved
+        elif loser.exception() is not None:
+            tokens = 0
+        else:
+            # Both answered: the second answer was paid for as well
+            usage = getattr(loser.result(), "usage", None)
+            record_groq_usage(operation, usage)
+            tokens = getattr(usage, "total_tokens", 0) or 0
+        self.daily_token_usage += tokens
+        if not settings.GROQ_ENABLE_TOKEN_TRACKING:
+            return
+        if tokens:
+            self.ledger.record(user_id, completion_args["model"], tokens, reserved)
+        else:
+            self.ledger.release(reserved)
+
+    async def _send_with_retries(
+        self,
+        completion_args: Dict[str, Any],
+        operation: str,
+        on_delta: Optional[Callable[[str], None]] = None
+    ) -> Any:
+        """
+        Send through the circuit breaker and rate limiter, retrying 429/5xx/
+        connection errors with jittered backoff. Raises CircuitOpenError at
+        once while the model's breaker is open. A streamed completion is read
+        to the end inside the request slot, so it counts as in flight until
+        its last delta.
+        """
+        model = completion_args["model"]
+        breaker = get_circuit_breaker(model)
+        estimated_tokens = estimate_prompt_tokens(completion_args["messages"])
+        attempt = 0
+        delivered = [0]
+        if on_delta is not None:
+            forward = on_delta
+
+            def on_delta(delta: str) -> None:
+                delivered[0] += 1
+                forward(delta)
+        while True:
+            if not breaker.allow_request():
+                raise CircuitOpenError(f"Circuit breaker open for {model}; serving fallback")
+            # The call below records its outcome; until it starts, a cancellation
+            # (e.g. a hedge loser still waiting for a slot) must hand the permit back
+            in_slot = False
+            try:
+                async with self.rate_limiter.slot(estimated_tokens) as waited:
+                    in_slot = True
+                    GROQ_THROTTLE_SECONDS.labels(operation).observe(waited)
+                    self.request_count += 1
+                    print(f"[GROQ] Making API request #{self.request_count} to model: {model}")
+                    started = time.monotonic()
+                    try:
+                        with GROQ_REQUEST_SECONDS.labels(operation).time():
+                            completion = await self.client.chat.completions.create(**completion_args)
+                            if on_delta is not None:
+                                completion = await _read_stream(
+                                    completion, on_delta, completion_args["messages"], operation, started
+                                )
+                    except (RateLimitError, APIStatusError, APIConnectionError) as e:
+                        status_code = getattr(e, "status_code", None)
+                        retryable = isinstance(e, (RateLimitError, APIConnectionError)) or (status_code or 0) >= 500
+                        if retryable:
+                            breaker.record_failure(time.monotonic() - started)
+                        else:
+                            # A rejected request (4xx) says nothing about upstream health
+                            breaker.record_ignored()
+                        # A stream that already delivered content cannot be replayed to the caller
+                        if not retryable or delivered[0] or attempt >= settings.GROQ_MAX_RETRIES:
+                            raise
+                        response = getattr(e, "response", None)
+                        retry_after = parse_retry_after(response.headers if response is not None else None)
+                        delay = backoff_delay(
+                            attempt, retry_after, settings.GROQ_BACKOFF_BASE_SECONDS, settings.GROQ_BACKOFF_MAX_SECONDS
+                        )
+                        if isinstance(e, RateLimitError):
+                            # Everyone backs off, not just this request
+                            self.rate_limiter.pause(delay)
+                        reason = str(status_code) if status_code else "connection"
+                        GROQ_RETRIES.labels(operation, reason).inc()
+                        print(f"[GROQ] Retryable error ({reason}), retrying in {delay:.2f}s")
+                    except BaseException:
+                        breaker.record_ignored()
+                        raise
+                    else:
+                        breaker.record_success(time.monotonic() - started)
+                        usage = getattr(completion, "usage", None)
+                        self.rate_limiter.settle(estimated_tokens, getattr(usage, "total_tokens", 0) or 0)
+                        return completion
+            except BaseException:
+                if not in_slot:
+                    breaker.record_ignored()
+                raise
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    async def aclose(self) -> None:
+        """Close pooled connections (called on application shutdown)"""
+        await self.http_client.aclose()
+
     def get_usage_stats(self) -> Dict[str, Any]:
         """Get current usage statistics"""
         self._reset_daily_counters_if_needed()
@@ -123,9 +393,48 @@ class GroqClient:
             "daily_token_limit": settings.GROQ_DAILY_TOKEN_LIMIT,
             "requests_today": self.request_count,
             "last_reset_date": self.last_reset_date,
-            "tokens_remaining": settings.GROQ_DAILY_TOKEN_LIMIT - self.daily_token_usage
+            "tokens_remaining": settings.GROQ_DAILY_TOKEN_LIMIT - self.daily_token_usage,
+            "rate_limiter": self.rate_limiter.stats()
         }
 
+    async def usage_report(self, user_id: Optional[int] = None) -> Dict[str, Any]:
+        """Shared daily usage from the ledger (all workers) plus this worker's stats"""
+        return {
+            "shared": await self.ledger.usage_report(user_id),
+            "worker": self.get_usage_stats()
+        }
+
+async def _read_stream(
+    stream: Any,
+    on_delta: Callable[[str], None],
+    messages: list[Dict[str, str]],
+    operation: str,
+    started: float
+) -> Any:
+    """Pass a streamed completion's deltas on; returns a completion-shaped object for the usual bookkeeping."""
+    parts: list[str] = []
+    usage = None
+    async for chunk in stream:
+        if chunk.choices:
+            delta = chunk.choices[0].delta.content
+            if delta:
+                if not parts:
+                    GROQ_TIME_TO_FIRST_TOKEN.labels(operation).observe(time.monotonic() - started)
+                parts.append(delta)
+                on_delta(delta)
+        # Groq reports usage on the last chunk (x_groq.usage)
+        usage = getattr(chunk, "usage", None) or getattr(getattr(chunk, "x_groq", None), "usage", None) or usage
+    content = "".join(parts)
+    if usage is None:
+        prompt_tokens = estimate_prompt_tokens(messages)
+        completion_tokens = len(content) // CHARS_PER_TOKEN
+        usage = SimpleNamespace(
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            total_tokens=prompt_tokens + completion_tokens
+        )
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))], usage=usage)
+
 # Global instance
 _groq_client_instance = None
 
@@ -134,4 +443,11 @@ def get_groq_client() -> GroqClient:
     global _groq_client_instance
     if _groq_client_instance is None:
         _groq_client_instance = GroqClient()
-    return _groq_client_instance
\ No newline at end of file
+    return _groq_client_instance
+
+async def close_groq_client() -> None:
+    """Close the shared client if it was created"""
+    global _groq_client_instance
+    if _groq_client_instance is not None:
+        await _groq_client_instance.aclose()
+        _groq_client_instance = None
\ No newline at end of file
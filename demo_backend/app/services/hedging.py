@@ -0,0 +1,126 @@
+# demo_backend/app/services/hedging.py
+"""
+Hedged requests for latency-sensitive Groq operations.
+
+Per operation, the latencies of recent calls are kept in a sliding window.
+When a call is still running after the window's GROQ_HEDGE_PERCENTILE
+latency, a duplicate is sent and whichever answers first wins; the other is
+cancelled. A credit bucket caps the extra spend: every request earns
+GROQ_HEDGE_MAX_RATIO of a hedge and every hedge costs a whole one, so at most
+that share of requests is ever duplicated.
+"""
+from __future__ import annotations
+
+import math
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, Optional
+
+from ..config import settings
+
+
+class HedgePolicy:
+    """Hedge delay and spend cap for one operation."""
+
+    def __init__(
+        self,
+        percentile: float,
+        max_ratio: float,
+        window_size: int,
+        min_samples: int,
+        min_delay: float,
+        max_burst: float = 5.0
+    ):
+        self.percentile = min(100.0, max(0.0, percentile))
+        self.max_ratio = max(0.0, max_ratio)
+        self.min_samples = max(1, min_samples)
+        self.min_delay = max(0.0, min_delay)
+        # A burst of slow calls may use up to this many saved-up hedges at once
+        self.max_burst = max(1.0, max_burst)
+        self._latencies: Deque[float] = deque(maxlen=max(self.min_samples, window_size))
+        self._credit = 0.0
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.hedges = 0
+        self.denied = 0
+
+    def observe(self, seconds: float) -> None:
+        with self._lock:
+            self._latencies.append(seconds)
+
+    def hedge_delay(self) -> Optional[float]:
+        """Seconds to wait before hedging a new request; None until enough latencies are known."""
+        with self._lock:
+            self.requests += 1
+            self._credit = min(self.max_burst, self._credit + self.max_ratio)
+            ordered = sorted(self._latencies)
+        return self._delay(ordered)
+
+    def _delay(self, ordered: list[float]) -> Optional[float]:
+        if len(ordered) < self.min_samples:
+            return None
+        rank = max(0, math.ceil(self.percentile / 100.0 * len(ordered)) - 1)
+        return max(self.min_delay, ordered[rank])
+
+    def try_hedge(self) -> bool:
+        """Spend one hedge credit; False once the ratio cap is reached."""
+        with self._lock:
+            if self._credit >= 1.0:
+                self._credit -= 1.0
+                self.hedges += 1
+                return True
+            self.denied += 1
+            return False
+
+    def refund_hedge(self) -> None:
+        """Give back a hedge granted by try_hedge that was not sent after all."""
+        with self._lock:
+            self._credit = min(self.max_burst, self._credit + 1.0)
+            self.hedges -= 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            ordered = sorted(self._latencies)
+            requests, hedges, denied = self.requests, self.hedges, self.denied
+        delay = self._delay(ordered)
+        return {
+            "samples": len(ordered),
+            "p50_seconds": round(ordered[len(ordered) // 2], 3) if ordered else None,
+            "hedge_after_seconds": round(delay, 3) if delay is not None else None,
+            "requests": requests,
+            "hedges": hedges,
+            "hedges_denied": denied,
+            "hedge_ratio": round(hedges / requests, 4) if requests else 0.0,
+        }
+
+
+def _parse_operations(value: str) -> Iterable[str]:
+    return [operation.strip() for operation in value.split(",") if operation.strip()]
+
+
+# Global registry, one policy per hedged operation
+_policies: Dict[str, HedgePolicy] = {}
+_policies_lock = threading.Lock()
+
+def get_hedge_policy(operation: str) -> Optional[HedgePolicy]:
+    """Policy for `operation`, or None if hedging is off for it"""
+    if not settings.GROQ_HEDGE_ENABLED or operation not in _parse_operations(settings.GROQ_HEDGE_OPERATIONS):
+        return None
+    with _policies_lock:
+        policy = _policies.get(operation)
+        if policy is None:
+            policy = HedgePolicy(
+                percentile=settings.GROQ_HEDGE_PERCENTILE,
+                max_ratio=settings.GROQ_HEDGE_MAX_RATIO,
+                window_size=settings.GROQ_HEDGE_WINDOW,
+                min_samples=settings.GROQ_HEDGE_MIN_SAMPLES,
+                min_delay=settings.GROQ_HEDGE_MIN_DELAY_SECONDS
+            )
+            _policies[operation] = policy
+        return policy
+
+def get_hedge_states() -> Dict[str, Dict[str, Any]]:
+    """Latency and spend of every hedged operation so far"""
+    with _policies_lock:
+        policies = dict(_policies)
+    return {operation: policy.snapshot() for operation, policy in policies.items()}
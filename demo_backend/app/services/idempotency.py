@@ -0,0 +1,174 @@
+# demo_backend/app/services/idempotency.py
+"""
+Idempotency-Key support for non-repeatable workflow submissions.
+
+The first request for a (user, key) pair claims a row in `idempotency_keys`
+and runs the workflow; its response is stored on completion. Duplicates that
+arrive while it is running wait on the same execution (in-process) or poll
+the row (other workers), and later replays are answered from the stored
+response without calling Groq or Odoo again.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import time
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple, Type, TypeVar
+
+from pydantic import BaseModel
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.future import select
+
+from ..config import settings
+from ..models.idempotency_key import IdempotencyKey
+from .database import AsyncSessionLocal
+from .document_handle import DocumentHandle
+
+ResponseT = TypeVar("ResponseT", bound=BaseModel)
+
+MAX_IDEMPOTENCY_KEY_LENGTH = 255
+
+
+class IdempotencyKeyMismatch(Exception):
+    """The key was already used for a request with a different payload."""
+
+
+class IdempotencyKeyInProgress(Exception):
+    """Another worker still holds the key after the wait timeout."""
+
+
+def request_fingerprint(subject: str, body: str, attachments: List[DocumentHandle]) -> str:
+    """Hash of everything that determines the workflow result."""
+    digest = hashlib.sha256()
+    for part in (subject, body, *(f"{doc.filename}:{doc.sha256}" for doc in attachments)):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\x1f")
+    return digest.hexdigest()
+
+
+class IdempotencyStore:
+    """Coordinates executions per (user, key) and persists their responses."""
+
+    def __init__(self, ttl_seconds: int, lock_timeout_seconds: int, poll_interval: float = 0.5):
+        self.ttl_seconds = ttl_seconds
+        self.lock_timeout_seconds = lock_timeout_seconds
+        self.poll_interval = poll_interval
+        self._inflight: Dict[Tuple[int, str], Tuple[str, asyncio.Task]] = {}
+
+    async def run(
+        self,
+        user_id: int,
+        key: str,
+        request_hash: str,
+        response_model: Type[ResponseT],
+        execute: Callable[[], Awaitable[ResponseT]]
+    ) -> Tuple[ResponseT, bool]:
+        """Return (response, replayed); `execute` runs at most once per key."""
+        deadline = time.monotonic() + self.lock_timeout_seconds
+        while True:
+            inflight = self._inflight.get((user_id, key))
+            if inflight is not None:
+                inflight_hash, task = inflight
+                if inflight_hash != request_hash:
+                    raise IdempotencyKeyMismatch("Idempotency-Key was already used with a different request")
+                # Shielded so a disconnecting duplicate never cancels the original execution
+                return await asyncio.shield(task), True
+
+            outcome, stored = await self._claim(user_id, key, request_hash)
+            if outcome == "replay":
+                print(f"[IDEMPOTENCY] Replaying stored response for key {key!r}")
+                return response_model.model_validate_json(stored), True
+            if outcome == "owner":
+                task = asyncio.create_task(self._execute(user_id, key, execute))
+                self._inflight[(user_id, key)] = (request_hash, task)
+                task.add_done_callback(lambda _: self._inflight.pop((user_id, key), None))
+                return await asyncio.shield(task), False
+
+            # Held by another worker process: poll until it completes or is abandoned
+            if time.monotonic() > deadline:
+                raise IdempotencyKeyInProgress("A request with this Idempotency-Key is still being processed")
+            await asyncio.sleep(self.poll_interval)
+
+    async def _claim(self, user_id: int, key: str, request_hash: str) -> Tuple[str, Optional[str]]:
+        now = datetime.utcnow()
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(IdempotencyKey).where(IdempotencyKey.user_id == user_id, IdempotencyKey.key == key)
+            )
+            record = result.scalar_one_or_none()
+            if record is not None:
+                age = now - record.created_at
+                expired = age > timedelta(seconds=self.ttl_seconds)
+                abandoned = record.status == "in_progress" and age > timedelta(seconds=self.lock_timeout_seconds)
+                if not expired and not abandoned:
+                    if record.request_hash != request_hash:
+                        raise IdempotencyKeyMismatch("Idempotency-Key was already used with a different request")
+                    if record.status == "completed":
+                        return "replay", record.response_body
+                    return "wait", None
+                await db.delete(record)
+                await db.flush()
+
+            db.add(IdempotencyKey(user_id=user_id, key=key, request_hash=request_hash, status="in_progress"))
+            try:
+                await db.commit()
+            except IntegrityError:
+                # Lost the race to another worker; it owns the execution now
+                await db.rollback()
+                return "wait", None
+            return "owner", None
+
+    async def _execute(self, user_id: int, key: str, execute: Callable[[], Awaitable[ResponseT]]) -> ResponseT:
+        try:
+            response = await execute()
+        except BaseException:
+            # Failed runs are not recorded, so the client may retry with the same key
+            await self._release(user_id, key)
+            raise
+
+        try:
+            async with AsyncSessionLocal() as db:
+                result = await db.execute(
+                    select(IdempotencyKey).where(IdempotencyKey.user_id == user_id, IdempotencyKey.key == key)
+                )
+                record = result.scalar_one_or_none()
+                if record is not None:
+                    record.status = "completed"
+                    record.response_body = response.model_dump_json(by_alias=True)
+                    record.completed_at = datetime.utcnow()
+                    await db.commit()
+        except Exception as e:
+            print(f"[IDEMPOTENCY] Failed to store response for key {key!r}: {e}")
+        return response
+
+    async def _release(self, user_id: int, key: str) -> None:
+        try:
+            async with AsyncSessionLocal() as db:
+                result = await db.execute(
+                    select(IdempotencyKey).where(
+                        IdempotencyKey.user_id == user_id,
+                        IdempotencyKey.key == key,
+                        IdempotencyKey.status == "in_progress"
+                    )
+                )
+                record = result.scalar_one_or_none()
+                if record is not None:
+                    await db.delete(record)
+                    await db.commit()
+        except Exception as e:
+            print(f"[IDEMPOTENCY] Failed to release key {key!r}: {e}")
+
+
+# Global instance
+_idempotency_store_instance = None
+
+def get_idempotency_store() -> IdempotencyStore:
+    """Get singleton idempotency store instance"""
+    global _idempotency_store_instance
+    if _idempotency_store_instance is None:
+        _idempotency_store_instance = IdempotencyStore(
+            ttl_seconds=settings.IDEMPOTENCY_KEY_TTL_SECONDS,
+            lock_timeout_seconds=settings.IDEMPOTENCY_LOCK_TIMEOUT_SECONDS
+        )
+    return _idempotency_store_instance
@@ -0,0 +1,121 @@
+# demo_backend/app/services/json_stream.py
+"""
+Incremental JSON field parser for streamed LLM answers.
+
+Text is fed in as it arrives; every member of the answer object (and of
+objects nested up to `max_depth` levels) is returned as soon as its value is
+complete, e.g. ``(("document_type",), "ID_Document")`` and then
+``(("structured_data", "full_name"), "Jane Doe")`` long before the closing
+brace. Anything before the first "{" (prose, a code fence) is skipped. It
+only tracks structure; the full answer is still parsed and validated
+normally once the stream ends.
+"""
+from __future__ import annotations
+
+import json
+from typing import Any, List, Optional, Tuple
+
+FieldPath = Tuple[str, ...]
+
+# Member states of an object frame
+_KEY, _COLON, _VALUE_START, _VALUE = range(4)
+
+
+class _Frame:
+    __slots__ = ("path", "tracked", "state", "key", "value_start")
+
+    def __init__(self, path: FieldPath, tracked: bool):
+        self.path = path
+        # Untracked frames (arrays, objects nested too deep) only count nesting
+        self.tracked = tracked
+        self.state = _KEY
+        self.key: Optional[str] = None
+        self.value_start = 0
+
+
+class IncrementalJSONParser:
+    """Feeds chunks of one JSON object and returns the members completed by each chunk."""
+
+    def __init__(self, max_depth: int = 2):
+        self.max_depth = max(1, max_depth)
+        self.complete = False
+        self._text = ""
+        self._pos = 0
+        self._frames: List[_Frame] = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+
+    def feed(self, chunk: str) -> List[Tuple[FieldPath, Any]]:
+        self._text += chunk
+        text = self._text
+        frames = self._frames
+        fields: List[Tuple[FieldPath, Any]] = []
+        i = self._pos
+        end = len(text)
+        while i < end and not self.complete:
+            ch = text[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    frame = frames[-1]
+                    if frame.tracked and frame.state == _KEY:
+                        frame.key = json.loads(text[self._string_start:i + 1])
+                        frame.state = _COLON
+                i += 1
+                continue
+
+            if not frames:
+                if ch == "{":
+                    frames.append(_Frame((), True))
+                i += 1
+                continue
+
+            frame = frames[-1]
+            if ch in " \t\r\n":
+                pass
+            elif ch == '"':
+                self._in_string = True
+                self._string_start = i
+                self._start_value(frame, i)
+            elif ch == "{" or ch == "[":
+                self._start_value(frame, i)
+                nested = frame.tracked and ch == "{" and len(frame.path) + 1 < self.max_depth
+                frames.append(_Frame(frame.path + (frame.key,), True) if nested else _Frame((), False))
+            elif ch == "}" or ch == "]":
+                if frame.tracked and frame.state == _VALUE:
+                    self._finish_member(frame, i, fields)
+                frames.pop()
+                if not frames:
+                    self.complete = True
+            elif frame.tracked:
+                if ch == ",":
+                    if frame.state == _VALUE:
+                        self._finish_member(frame, i, fields)
+                    frame.state = _KEY
+                elif ch == ":":
+                    if frame.state == _COLON:
+                        frame.state = _VALUE_START
+                else:
+                    self._start_value(frame, i)
+            i += 1
+        self._pos = i
+        return fields
+
+    @staticmethod
+    def _start_value(frame: _Frame, index: int) -> None:
+        if frame.tracked and frame.state == _VALUE_START:
+            frame.value_start = index
+            frame.state = _VALUE
+
+    def _finish_member(self, frame: _Frame, index: int, fields: List[Tuple[FieldPath, Any]]) -> None:
+        frame.state = _KEY
+        try:
+            value = json.loads(self._text[frame.value_start:index])
+        except ValueError:
+            return
+        fields.append((frame.path + (frame.key,), value))
@@ -0,0 +1,129 @@
+# demo_backend/app/services/keyword_engine.py
+"""
+Compiled keyword matcher for tags and fallback classification.
+
+A declarative table (group -> label -> keywords, see keyword_rules.json) is
+compiled once into lookup structures:
+
+- plain keywords: a dict of whole words, matched with one set intersection
+  against the words of the text
+- wildcard keywords: a substring search anchored by spaces where there is no
+  "*" - "attach*" looks for " attach" (word start), "*bill" for "bill " (word
+  end) and "*license*" for "license" anywhere, so run-together file names
+  like DriversLicense.pdf still match
+- phrases ("new account"): all words present, then a search of the
+  single-spaced text
+
+The text is lowercased, punctuation is turned into spaces and it is split
+into words once per scan, all with C-level string operations, so the cost of
+a scan hardly grows with the size of the table. Keywords without "*" only
+match whole words: "new" no longer fires inside "renewal", nor "file" inside
+"profile".
+"""
+from __future__ import annotations
+
+import json
+import os
+import string
+from typing import Dict, List, Mapping, Optional, Sequence, Set, Tuple
+
+from ..config import settings
+
+DEFAULT_RULES_PATH = os.path.join(os.path.dirname(__file__), "keyword_rules.json")
+
+# Punctuation (including "_", so file names like id_scan.png split) and whitespace become spaces
+_SEPARATORS = str.maketrans({char: " " for char in string.punctuation + string.whitespace + "‘’“”–—…«»"})
+
+Label = Tuple[str, str]
+
+
+def _words(text: str) -> List[str]:
+    return text.lower().translate(_SEPARATORS).split()
+
+
+class KeywordMatcher:
+    """Finds every (group, label) of a keyword table in one scan of the text."""
+
+    def __init__(self, table: Mapping[str, Mapping[str, Sequence[str]]]):
+        self.groups: Dict[str, List[str]] = {}
+        self._exact: Dict[str, Set[Label]] = {}
+        wildcards: Dict[str, Set[Label]] = {}
+        phrases: Dict[Tuple[str, ...], Set[Label]] = {}
+        for group, labels in table.items():
+            if group.startswith("_"):
+                continue
+            self.groups[group] = list(labels)
+            for label, keywords in labels.items():
+                for keyword in keywords:
+                    keyword = keyword.strip()
+                    parts = tuple(_words(keyword))
+                    if not parts:
+                        continue
+                    if len(parts) > 1:
+                        phrases.setdefault(parts, set()).add((group, label))
+                    elif keyword.startswith("*") or keyword.endswith("*"):
+                        # A space stands for the word boundary on each side without "*"
+                        needle = ("" if keyword.startswith("*") else " ") + parts[0] + ("" if keyword.endswith("*") else " ")
+                        wildcards.setdefault(needle, set()).add((group, label))
+                    else:
+                        self._exact.setdefault(parts[0], set()).add((group, label))
+
+        self._exact_words = frozenset(self._exact)
+        self._wildcards = list(wildcards.items())
+        self._phrases = [(parts, f" {' '.join(parts)} ", labels) for parts, labels in phrases.items()]
+
+    def scan(self, *texts: str) -> Dict[str, Set[str]]:
+        """Labels found per group, e.g. {"email_tags": {"urgent_request"}, ...}."""
+        found: Dict[str, Set[str]] = {group: set() for group in self.groups}
+        for text in texts:
+            if not text:
+                continue
+            # Surrounding spaces so every word, including the first and last, is delimited by them
+            normalized = f" {text.lower().translate(_SEPARATORS)} "
+            word_list = normalized.split()
+            words = set(word_list)
+            hits: List[Set[Label]] = [self._exact[word] for word in self._exact_words.intersection(words)]
+            for needle, labels in self._wildcards:
+                if needle in normalized:
+                    hits.append(labels)
+            single_spaced = None
+            for parts, needle, labels in self._phrases:
+                if all(part in words for part in parts):
+                    if single_spaced is None:
+                        single_spaced = f" {' '.join(word_list)} "
+                    if needle in single_spaced:
+                        hits.append(labels)
+            for labels in hits:
+                for group, label in labels:
+                    found[group].add(label)
+        return found
+
+    def first(self, found: Mapping[str, Set[str]], group: str) -> Optional[str]:
+        """The highest-priority label of `group` that was found (table order)."""
+        hits = found.get(group)
+        if not hits:
+            return None
+        return next((label for label in self.groups[group] if label in hits), None)
+
+    def labels(self, found: Mapping[str, Set[str]], group: str) -> List[str]:
+        """Found labels of `group` in table order."""
+        hits = found.get(group) or set()
+        return [label for label in self.groups.get(group, []) if label in hits]
+
+    @classmethod
+    def from_file(cls, path: str) -> "KeywordMatcher":
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f))
+
+
+# Global instance
+_keyword_matcher_instance: Optional[KeywordMatcher] = None
+
+def get_keyword_matcher() -> KeywordMatcher:
+    """Get singleton matcher built from KEYWORD_RULES_PATH (or the bundled table)"""
+    global _keyword_matcher_instance
+    if _keyword_matcher_instance is None:
+        path = settings.KEYWORD_RULES_PATH or DEFAULT_RULES_PATH
+        _keyword_matcher_instance = KeywordMatcher.from_file(path)
+        print(f"[KEYWORDS] Loaded keyword rules from {path}")
+    return _keyword_matcher_instance
@@ -0,0 +1,142 @@
+# demo_backend/app/services/kyc_jobs.py
+"""
+Background job runner for the complete KYC workflow.
+
+Submissions are queued in memory and executed by a fixed pool of worker
+tasks, so `POST /kyc/jobs` can return a job id immediately while clients
+poll `GET /kyc/jobs/{id}` for stage progress and the final result.
+"""
+from __future__ import annotations
+
+import asyncio
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from ..config import settings
+from ..models.kyc import KYCWorkflowResponse
+from .document_handle import DocumentHandle
+from .kyc_service import close_attachments, run_kyc_workflow
+
+
+class KYCJobQueueFull(Exception):
+    """Raised when the job queue has reached KYC_JOB_QUEUE_SIZE."""
+
+
+@dataclass
+class KYCJob:
+    id: str
+    owner_email: Optional[str]
+    subject: str
+    body: str
+    attachments: List[DocumentHandle]
+    user: Any
+    status: str = "queued"  # queued | running | completed | failed
+    stages: Dict[str, str] = field(default_factory=dict)
+    result: Optional[KYCWorkflowResponse] = None
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+    def record_stage(self, name: str, event: str, result: Any) -> None:
+        self.stages[name] = event
+
+
+class KYCJobManager:
+    """In-process queue plus worker pool for KYC workflow jobs."""
+
+    def __init__(self, workers: int, queue_size: int, retention_seconds: int):
+        self.workers = max(1, workers)
+        self.retention_seconds = retention_seconds
+        self._queue: asyncio.Queue[KYCJob] = asyncio.Queue(maxsize=max(1, queue_size))
+        self._jobs: Dict[str, KYCJob] = {}
+        self._worker_tasks: List[asyncio.Task] = []
+
+    async def start(self) -> None:
+        if self._worker_tasks:
+            return
+        for i in range(self.workers):
+            self._worker_tasks.append(asyncio.create_task(self._worker(), name=f"kyc-job-worker-{i}"))
+        print(f"[KYC-JOBS] Started {self.workers} workers (queue size {self._queue.maxsize})")
+
+    async def stop(self) -> None:
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+
+    def submit(self, subject: str, body: str, attachments: List[DocumentHandle], user: Any) -> KYCJob:
+        self._prune_finished()
+        job = KYCJob(
+            id=uuid.uuid4().hex,
+            owner_email=getattr(user, "email", None),
+            subject=subject,
+            body=body,
+            attachments=attachments,
+            user=user
+        )
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            raise KYCJobQueueFull(f"KYC job queue is full ({self._queue.maxsize} pending jobs)")
+        self._jobs[job.id] = job
+        return job
+
+    def get(self, job_id: str) -> Optional[KYCJob]:
+        return self._jobs.get(job_id)
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    async def _worker(self) -> None:
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._run(job)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job: KYCJob) -> None:
+        job.status = "running"
+        job.started_at = time.time()
+        try:
+            job.result = await run_kyc_workflow(
+                job.subject, job.body, job.attachments, job.user, listener=job.record_stage
+            )
+            job.status = "completed"
+        except Exception as e:
+            print(f"[KYC-JOBS] Job {job.id} failed: {e}")
+            job.error = str(e)
+            job.status = "failed"
+        finally:
+            job.finished_at = time.time()
+            # Release the uploaded bytes as soon as the pipeline is done with them
+            close_attachments(job.attachments)
+            job.attachments = []
+
+    def _prune_finished(self) -> None:
+        cutoff = time.time() - self.retention_seconds
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.finished_at is not None and job.finished_at < cutoff
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+
+# Global instance
+_job_manager_instance = None
+
+def get_kyc_job_manager() -> KYCJobManager:
+    """Get singleton KYC job manager instance"""
+    global _job_manager_instance
+    if _job_manager_instance is None:
+        _job_manager_instance = KYCJobManager(
+            workers=settings.KYC_JOB_WORKERS,
+            queue_size=settings.KYC_JOB_QUEUE_SIZE,
+            retention_seconds=settings.KYC_JOB_RETENTION_SECONDS
+        )
+    return _job_manager_instance
@@ -1,144 +1,417 @@
 # demo_backend/app/services/kyc_service.py
 from __future__ import annotations
 
+import asyncio
 import time
-import base64
-from typing import Any, Dict, List, Optional
+from typing import Any, AsyncIterator, Dict, List, NamedTuple, Optional, Sequence, Tuple, Union
 from fastapi import UploadFile
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from ..models.kyc import (
-    KYCWorkflowRequest, 
-    KYCWorkflowResponse, 
-    EmailClassificationResult, 
-    DocumentExtractionResult, 
-    TamperDetectionResult, 
+    KYCWorkflowRequest,
+    KYCWorkflowResponse,
+    EmailClassificationResult,
+    DocumentExtractionResult,
+    TamperDetectionResult,
     ERPIntegrationResult
 )
 from .email_service import classify_email
-from .document_service import analyze_document, detect_tamper
+from .document_handle import DocumentHandle
+from .document_service import analyze_document_handle, detect_tamper_handle
 from .erp_service import (
     create_kyc_processing_record,
     create_customer_in_odoo
 )
+from .idempotency import get_idempotency_store, request_fingerprint
+from .llm_output import coerce_fields
+from .metrics import record_fallback, record_stage_timings
+from .prompts import DOCUMENT_ANALYSIS_SCHEMA, DOCUMENT_ANALYSIS_VALIDATOR
+from .stage_graph import StageGraph, StageListener
+from ..config import settings
+
+# Keys the LLM uses for the holder's name in structured_data
+CUSTOMER_NAME_FIELDS = ("fullName", "full_name", "name", "account_holder_name", "name_on_document")
+
+
+class DocumentIdentity(NamedTuple):
+    """The identifying part of a document analysis, available while the model is still writing the rest."""
+    document_type: str
+    confidence: float
+    extracted_data: Dict[str, Any]
+
+
+# What the customer stage sees per attachment: streamed identity, full result or nothing
+IdentitySource = Union[DocumentIdentity, DocumentExtractionResult, None]
+
+
+async def read_attachments(files: List[UploadFile]) -> List[DocumentHandle]:
+    """Read every upload exactly once into a handle shared by all workflow stages."""
+    return [await DocumentHandle.from_upload(file) for file in files]
+
+
+def close_attachments(attachments: List[DocumentHandle]) -> None:
+    for attachment in attachments:
+        attachment.close()
+
+
+def _identity_from_fields(fields: Dict[str, Any]) -> Optional[DocumentIdentity]:
+    """Identity from streamed answer members, once type, structured data and confidence are usable."""
+    # Same coercion as the final answer gets ("id document" -> "ID_Document", 85 -> 0.85)
+    identity = coerce_fields(
+        {key: fields[key] for key in ("document_type", "structured_data", "confidence") if key in fields},
+        DOCUMENT_ANALYSIS_VALIDATOR
+    )
+    document_type = identity.get("document_type")
+    extracted_data = identity.get("structured_data")
+    confidence = identity.get("confidence")
+    if document_type not in DOCUMENT_ANALYSIS_SCHEMA["document_type"] or not isinstance(extracted_data, dict):
+        return None
+    if isinstance(confidence, bool) or not isinstance(confidence, (int, float)) or not 0.0 <= confidence <= 1.0:
+        return None
+    return DocumentIdentity(document_type, float(confidence), extracted_data)
+
+
+def _customer_name_from(document: IdentitySource) -> Optional[str]:
+    """Return the holder name recorded in a document's structured data, if any."""
+    if not document or not document.extracted_data:
+        return None
+    for key in CUSTOMER_NAME_FIELDS:
+        value = document.extracted_data.get(key)
+        if value and str(value).strip():
+            return str(value).strip()
+    return None
+
+
+def _select_primary_document(analyses: Sequence[IdentitySource]) -> Optional[int]:
+    """
+    Pick the attachment that identifies the customer: the most confident ID
+    document carrying a name, then any named document, then the first result.
+    """
+    named = [i for i, doc in enumerate(analyses) if _customer_name_from(doc)]
+    id_documents = [i for i in named if analyses[i].document_type == "ID_Document"]
+    candidates = id_documents or named
+    if candidates:
+        return max(candidates, key=lambda i: analyses[i].confidence)
+    return next((i for i, doc in enumerate(analyses) if doc), None)
+
 
 async def process_complete_kyc_workflow(
     request: KYCWorkflowRequest,
     user: Any,
     db: AsyncSession
 ) -> KYCWorkflowResponse:
-    start_time = time.time()
-    
-    # 1. Email Classification
-    print(f"[KYC] Step 1: AI analyzing email...")
+    """Read the uploaded attachments once and run the KYC workflow."""
+    if request.attachments:
+        print(f"[KYC] Reading {len(request.attachments)} documents...")
+    attachments = await read_attachments(request.attachments)
     try:
-        email_result = classify_email(request.subject, request.body, user.__dict__ if user else None)
-        email_classification = EmailClassificationResult(**email_result)
-    except Exception as e:
-        print(f"[KYC] Email classification error: {e}")
-        email_classification = EmailClassificationResult(
-            category="Other", priority="Medium", sentiment="Neutral", confidence=0.5, tags=[], reasoning="Error"
+        return await run_kyc_workflow(request.subject, request.body, attachments, user)
+    finally:
+        close_attachments(attachments)
+
+
+async def process_idempotent_kyc_workflow(
+    request: KYCWorkflowRequest,
+    user: Any,
+    idempotency_key: str
+) -> Tuple[KYCWorkflowResponse, bool]:
+    """
+    Run the KYC workflow at most once per user and Idempotency-Key.
+    Returns the response and whether it was replayed from an earlier execution.
+    """
+    attachments = await read_attachments(request.attachments)
+    fingerprint = request_fingerprint(request.subject, request.body, attachments)
+
+    executed = False
+
+    async def execute() -> KYCWorkflowResponse:
+        nonlocal executed
+        executed = True
+        try:
+            return await run_kyc_workflow(request.subject, request.body, attachments, user)
+        finally:
+            close_attachments(attachments)
+
+    try:
+        response, replayed = await get_idempotency_store().run(
+            user.id, idempotency_key, fingerprint, KYCWorkflowResponse, execute
         )
-    
-    # 2. Document Analysis & 3. Tamper Detection
-    document_analysis = None
-    tamper_detection = None
-    attachments_for_erp = []
+    finally:
+        # Duplicates and replays never run `execute`; release their copy of the uploads here.
+        # The execution itself is shielded and outlives a cancelled request, so it closes its own.
+        if not executed:
+            close_attachments(attachments)
+    return response, replayed
 
-    if request.attachments:
-        print(f"[KYC] Analyzing {len(request.attachments)} documents...")
-        first_attachment = request.attachments[0]
-        
+
+async def run_kyc_workflow(
+    subject: str,
+    body: str,
+    attachments: List[DocumentHandle],
+    user: Any,
+    listener: Optional[StageListener] = None
+) -> KYCWorkflowResponse:
+    """
+    Run the KYC workflow as a stage graph. Email classification, document
+    analysis and tamper detection start together; the
+    Odoo writes start as soon as the results they need are available. The
+    Odoo customer is resolved from each document's identity (type, holder
+    data, confidence), which streams in before the rest of the analysis.
+    """
+    start_time = time.time()
+    graph = StageGraph(listener=listener)
+
+    # 1. Email Classification
+    async def email_classification_stage() -> EmailClassificationResult:
+        print(f"[KYC] AI analyzing email...")
         try:
-            # Prepare attachment for Odoo (Base64 encode)
-            # We need to read all attachments
-            for file in request.attachments:
-                await file.seek(0)
-                content = await file.read()
-                b64_content = base64.b64encode(content).decode('utf-8')
-                attachments_for_erp.append({
-                    "name": file.filename,
-                    "content": b64_content
-                })
-                # Reset for analysis
-                await file.seek(0)
-
-            # Analyze the first one for metadata
-            doc_result = await analyze_document(file=first_attachment, user=user)
-            document_analysis = DocumentExtractionResult(
-                document_type=doc_result["documentType"],
-                page_count=doc_result["pageCount"],
-                entities=doc_result["entities"],
-                detected_currency=doc_result.get("detectedCurrency"),
-                confidence=doc_result["confidence"],
-                received_at=doc_result["receivedAt"],
-                preview=doc_result.get("preview"),
-                extracted_data=doc_result.get("extractedData"),
-                processing_time=doc_result.get("processingTime", 0)
+            email_result = await classify_email(subject, body, user.__dict__ if user else None)
+            return EmailClassificationResult(**email_result)
+        except Exception as e:
+            print(f"[KYC] Email classification error: {e}")
+            record_fallback("kyc_email_stage")
+            return EmailClassificationResult(
+                category="Other", priority="Medium", sentiment="Neutral", confidence=0.5, tags=[], reasoning="Error"
             )
 
-            await first_attachment.seek(0)
-            tamper_result = await detect_tamper(file=first_attachment, user=user)
-            tamper_detection = TamperDetectionResult(
-                is_authentic=tamper_result["isAuthentic"],
-                confidence_score=tamper_result["confidenceScore"],
-                detected_issues=tamper_result["detectedIssues"],
-                risk_level=tamper_result["riskLevel"],
-                analysis_details=tamper_result["analysisDetails"],
-                processing_time=tamper_result["processingTime"]
-            )
-        except Exception as e:
-            print(f"[KYC] Document error: {e}")
+    # Attachments share a bounded pool so a large upload cannot monopolise
+    # the thread pool or the Groq rate limit.
+    document_slots = asyncio.Semaphore(max(1, settings.KYC_DOCUMENT_WORKERS))
+
+    # Set from the streamed answer or, at the latest, from the finished analysis
+    identities: List[asyncio.Future] = [asyncio.get_running_loop().create_future() for _ in attachments]
+
+    # 2. Document Analysis (every attachment)
+    def document_analysis_stage(index: int):
+        async def _analyze() -> Optional[DocumentExtractionResult]:
+            attachment = attachments[index]
+            identity = identities[index]
+            fields: Dict[str, Any] = {}
+
+            def on_field(path: Tuple[str, ...], value: Any) -> None:
+                if len(path) != 1 or identity.done():
+                    return
+                fields[path[0]] = value
+                early = _identity_from_fields(fields)
+                if early is not None:
+                    identity.set_result(early)
+
+            result = None
+            try:
+                async with document_slots:
+                    doc_result = await analyze_document_handle(attachment, user, on_field=on_field)
+                result = DocumentExtractionResult(
+                    document_type=doc_result["documentType"],
+                    page_count=doc_result["pageCount"],
+                    entities=doc_result["entities"],
+                    detected_currency=doc_result.get("detectedCurrency"),
+                    confidence=doc_result["confidence"],
+                    received_at=doc_result["receivedAt"],
+                    preview=doc_result.get("preview"),
+                    extracted_data=doc_result.get("extractedData"),
+                    processing_time=doc_result.get("processingTime", 0),
+                    filename=attachment.filename
+                )
+            except Exception as e:
+                print(f"[KYC] Document error ({attachment.filename}): {e}")
+            finally:
+                if not identity.done():
+                    identity.set_result(result)
+            return result
+        return _analyze
+
+    def document_identity_stage(index: int):
+        async def _identity() -> IdentitySource:
+            return await identities[index]
+        return _identity
+
+    # 3. Tamper Detection (every attachment)
+    def tamper_detection_stage(index: int):
+        async def _detect() -> Optional[TamperDetectionResult]:
+            attachment = attachments[index]
+            try:
+                async with document_slots:
+                    tamper_result = await detect_tamper_handle(attachment, user)
+                return TamperDetectionResult(
+                    is_authentic=tamper_result["isAuthentic"],
+                    confidence_score=tamper_result["confidenceScore"],
+                    detected_issues=tamper_result["detectedIssues"],
+                    risk_level=tamper_result["riskLevel"],
+                    analysis_details=tamper_result["analysisDetails"],
+                    processing_time=tamper_result["processingTime"],
+                    filename=attachment.filename
+                )
+            except Exception as e:
+                print(f"[KYC] Tamper detection error ({attachment.filename}): {e}")
+                return None
+        return _detect
 
     # 4. Create Customer in Odoo Contact App
-    # Extract name logic (simplified)
-    customer_name = "Unknown Customer"
-    if document_analysis and document_analysis.extracted_data:
-        customer_name = document_analysis.extracted_data.get("fullName", customer_name)
-    
-    # Create/Get Customer
-    customer_id = create_customer_in_odoo(customer_name, user.email if user else None)
+    async def erp_customer_stage(*documents: IdentitySource) -> Dict[str, Any]:
+        primary = _select_primary_document(documents)
+        document = documents[primary] if primary is not None else None
+        customer_name = _customer_name_from(document) or "Unknown Customer"
+
+        # Create/Get Customer
+        customer_id = await asyncio.to_thread(
+            create_customer_in_odoo, customer_name, user.email if user else None
+        )
+        return {"customer_name": customer_name, "customer_id": customer_id, "primary_index": primary}
 
     # 5. Create Lead in Odoo CRM with details and attachments
-    email_data = {
-        "customer_name": customer_name,
-        "subject": request.subject,
-        "category": email_classification.category,
-        "confidence": email_classification.confidence,
-        "tags": email_classification.tags,
-        "reasoning": email_classification.reasoning,
-        "sentiment": email_classification.sentiment,
-        "priority": email_classification.priority
-    }
-
-    doc_data = None
-    if document_analysis:
-        doc_data = document_analysis.dict(by_alias=True)
-    
-    tamper_data = None
-    if tamper_detection:
-        tamper_data = tamper_detection.dict(by_alias=True)
-
-    processing_record_id = create_kyc_processing_record(
-        customer_id=customer_id if customer_id else 0,
-        user_email=user.email if user else "system@demo.com",
-        email_data=email_data,
-        email_body=request.body,
-        document_data=doc_data,
-        tamper_data=tamper_data,
-        attachments=attachments_for_erp
-    )
+    async def erp_record_stage(
+        customer: Dict[str, Any],
+        email_classification: EmailClassificationResult,
+        *document_results: Any,
+    ) -> ERPIntegrationResult:
+        analyses = document_results[:attachment_count]
+        tampers = document_results[attachment_count:]
+        primary = customer["primary_index"]
+        document_analysis = analyses[primary] if primary is not None else None
+        tamper_detection = tampers[primary] if primary is not None else None
+
+        email_data = {
+            "customer_name": customer["customer_name"],
+            "subject": subject,
+            "category": email_classification.category,
+            "confidence": email_classification.confidence,
+            "tags": email_classification.tags,
+            "reasoning": email_classification.reasoning,
+            "sentiment": email_classification.sentiment,
+            "priority": email_classification.priority
+        }
+
+        doc_data = None
+        if document_analysis:
+            doc_data = document_analysis.dict(by_alias=True)
+
+        tamper_data = None
+        if tamper_detection:
+            tamper_data = tamper_detection.dict(by_alias=True)
+
+        document_list = [doc.dict(by_alias=True) for doc in analyses if doc]
+        tamper_list = [tamper.dict(by_alias=True) for tamper in tampers if tamper]
+
+        customer_id = customer["customer_id"]
+        processing_record_id = await asyncio.to_thread(
+            create_kyc_processing_record,
+            customer_id=customer_id if customer_id else 0,
+            user_email=user.email if user else "system@demo.com",
+            email_data=email_data,
+            email_body=body,
+            document_data=doc_data,
+            tamper_data=tamper_data,
+            attachments=attachments,
+            document_analyses=document_list,
+            tamper_detections=tamper_list
+        )
+
+        return ERPIntegrationResult(
+            customerId=str(customer_id),
+            status="Success" if processing_record_id else "Partial",
+            message=f"Stored in Odoo CRM (ID: {processing_record_id})"
+        )
 
-    erp_result = ERPIntegrationResult(
-        customerId=str(customer_id),
-        status="Success" if processing_record_id else "Partial",
-        message=f"Stored in Odoo CRM (ID: {processing_record_id})"
+    attachment_count = len(attachments)
+    analysis_stages = [f"document_analysis:{i}" for i in range(attachment_count)]
+    tamper_stages = [f"tamper_detection:{i}" for i in range(attachment_count)]
+    identity_stages = [f"document_identity:{i}" for i in range(attachment_count)]
+
+    graph.add("email_classification", email_classification_stage)
+    for i in range(attachment_count):
+        graph.add(analysis_stages[i], document_analysis_stage(i))
+        graph.add(tamper_stages[i], tamper_detection_stage(i))
+        graph.add(identity_stages[i], document_identity_stage(i))
+    graph.add("erp_customer", erp_customer_stage, depends_on=identity_stages)
+    graph.add(
+        "erp_record",
+        erp_record_stage,
+        depends_on=["erp_customer", "email_classification", *analysis_stages, *tamper_stages]
     )
 
+    results = await graph.run()
+    print(f"[KYC] Stage timings: {graph.timings}")
+    record_stage_timings(graph.timings)
+
+    analyses = [results[name] for name in analysis_stages]
+    tampers = [results[name] for name in tamper_stages]
+    primary = results["erp_customer"]["primary_index"]
+
     return KYCWorkflowResponse(
-        email_classification=email_classification,
-        document_analysis=document_analysis,
-        tamper_detection=tamper_detection,
-        erp_integration=erp_result,
-        processing_time=round(time.time() - start_time, 2)
-    )
\ No newline at end of file
+        email_classification=results["email_classification"],
+        document_analysis=analyses[primary] if primary is not None else None,
+        tamper_detection=tampers[primary] if primary is not None else None,
+        document_analyses=[doc for doc in analyses if doc],
+        tamper_detections=[tamper for tamper in tampers if tamper],
+        erp_integration=results["erp_record"],
+        processing_time=round(time.time() - start_time, 2),
+        stage_timings=graph.timings
+    )
+
+
+# Stages whose results are published to streaming clients, keyed by the
+# stage name prefix (per-attachment stages are suffixed with ":<index>").
+STREAMED_STAGE_EVENTS = {
+    "email_classification": "email_classification",
+    "document_analysis": "document_analysis",
+    "tamper_detection": "tamper_detection",
+    "erp_record": "erp_integration",
+}
+
+
+def stream_kyc_workflow(
+    subject: str,
+    body: str,
+    attachments: List[DocumentHandle],
+    user: Any
+) -> AsyncIterator[Tuple[str, Any]]:
+    """
+    Start the KYC workflow and return an iterator of ``(event, payload)``
+    pairs as stages finish.
+
+    Payloads are the same result models the full response is built from; the
+    last event is ``complete`` carrying the KYCWorkflowResponse, or ``error``.
+    The workflow starts right away and closes `attachments` when it is done,
+    whether or not the events are ever consumed (the client may disconnect
+    before the response starts).
+    """
+    events: asyncio.Queue = asyncio.Queue()
+    finished = object()
+
+    def listener(name: str, event: str, result: Any) -> None:
+        stream_event = STREAMED_STAGE_EVENTS.get(name.split(":", 1)[0])
+        if event == "completed" and stream_event and result is not None:
+            events.put_nowait((stream_event, result))
+
+    async def _run() -> KYCWorkflowResponse:
+        try:
+            return await run_kyc_workflow(subject, body, attachments, user, listener=listener)
+        finally:
+            events.put_nowait(finished)
+
+    workflow = asyncio.create_task(_run())
+    workflow.add_done_callback(lambda _: close_attachments(attachments))
+    # The Odoo writes should not be abandoned half way if the client goes
+    # away, so the workflow keeps running; just make sure failures are logged.
+    workflow.add_done_callback(
+        lambda task: task.cancelled() or task.exception() is None
+        or print(f"[KYC] Streamed workflow failed: {task.exception()}")
+    )
+    return _workflow_events(events, finished, workflow)
+
+
+async def _workflow_events(
+    events: asyncio.Queue,
+    finished: object,
+    workflow: asyncio.Task
+) -> AsyncIterator[Tuple[str, Any]]:
+    while True:
+        item = await events.get()
+        if item is finished:
+            break
+        yield item
+
+    try:
+        yield "complete", await workflow
+    except Exception as e:
+        yield "error", {"detail": f"Error processing complete KYC workflow: {str(e)}"}
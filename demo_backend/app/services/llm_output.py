@@ -0,0 +1,158 @@
+# demo_backend/app/services/llm_output.py
+"""
+Parse, validate and recover JSON answers from the LLM.
+
+A completion has already been paid for when it arrives, so a malformed
+answer is not thrown away at the first error:
+
+1. strict `json.loads`, checked against the precompiled schema (prompts.py)
+2. local repair of broken JSON (truncated output, code fences, single
+   quotes, trailing commas) with json_repair
+3. partial-field salvage: values are coerced where the intent is clear
+   ("onboarding" -> "Onboarding", "0.9" -> 0.9, 85 -> 0.85), fields that
+   still fail the schema are dropped and missing ones get neutral defaults,
+   as long as the essential fields survived
+
+Only when all of that fails does the caller fall back (or re-request).
+Every outcome is counted in `llm_output_parse_total`, and the tokens of
+recovered completions in `llm_output_recovered_tokens_total`.
+"""
+from __future__ import annotations
+
+import json
+from typing import Any, Dict, Mapping, Sequence, Tuple
+
+from json_repair import repair_json
+from jsonschema import Draft202012Validator
+
+from .metrics import LLM_OUTPUT_PARSES, LLM_TOKENS_RECOVERED
+
+VALID = "valid"
+REPAIRED = "repaired"
+SALVAGED = "salvaged"
+REJECTED = "rejected"
+
+
+class LLMOutputError(ValueError):
+    """Raised when an answer cannot be parsed or salvaged."""
+
+
+class LLMAnswer(dict):
+    """A usable answer object; `outcome` records how it was obtained (VALID, REPAIRED or SALVAGED)."""
+    outcome = VALID
+
+
+def _normalize_label(value: str) -> str:
+    return "".join(ch for ch in value.casefold() if ch.isalnum())
+
+
+def _coerce(value: Any, schema: Mapping[str, Any]) -> Any:
+    """Best-effort conversion of one field towards its schema; returns the value unchanged otherwise."""
+    if "enum" in schema and isinstance(value, str):
+        wanted = _normalize_label(value)
+        for option in schema["enum"]:
+            if isinstance(option, str) and _normalize_label(option) == wanted:
+                return option
+        return value
+    kind = schema.get("type")
+    if kind == "number":
+        if isinstance(value, str):
+            try:
+                value = float(value.strip().rstrip("%"))
+            except ValueError:
+                return value
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            maximum = schema.get("maximum")
+            # Percentages for a 0..1 score
+            if maximum == 1.0 and 1.0 < value <= 100.0:
+                value = value / 100.0
+            if maximum is not None:
+                value = min(value, maximum)
+            if schema.get("minimum") is not None:
+                value = max(value, schema["minimum"])
+        return value
+    if kind == "array":
+        if isinstance(value, str):
+            value = [value]
+        if isinstance(value, list) and schema.get("items", {}).get("type") == "string":
+            return [item if isinstance(item, str) else json.dumps(item, ensure_ascii=False) for item in value if item is not None]
+        return value
+    if kind == "string" and isinstance(value, (int, float)) and not isinstance(value, bool):
+        return str(value)
+    return value
+
+
+def coerce_fields(data: Mapping[str, Any], validator: Draft202012Validator) -> Dict[str, Any]:
+    """Apply `_coerce` to every field the schema describes; other fields are kept as they are."""
+    properties = validator.schema.get("properties", {})
+    return {key: _coerce(value, properties[key]) if key in properties else value for key, value in data.items()}
+
+
+def salvage(
+    data: Dict[str, Any],
+    validator: Draft202012Validator,
+    defaults: Mapping[str, Any],
+    essential: Sequence[str]
+) -> Dict[str, Any] | None:
+    """Keep every field that is (or can be made) valid; None if no essential field survives."""
+    result = coerce_fields(data, validator)
+    for error in validator.iter_errors(result):
+        if error.path:
+            result.pop(error.path[0], None)
+    if not any(field in result for field in essential):
+        return None
+    for field in validator.schema.get("required", []):
+        if field not in result and field in defaults:
+            result[field] = json.loads(json.dumps(defaults[field]))
+    return result if validator.is_valid(result) else None
+
+
+def validate_llm_object(
+    data: Any,
+    validator: Draft202012Validator,
+    operation: str,
+    defaults: Mapping[str, Any],
+    essential: Sequence[str],
+    outcome: str = VALID,
+    tokens_used: int = 0
+) -> Dict[str, Any] | None:
+    """Schema-check (and if needed salvage) one parsed answer; None, counted as rejected, if unusable."""
+    if isinstance(data, dict) and not validator.is_valid(data):
+        data = salvage(data, validator, defaults, essential)
+        outcome = SALVAGED
+    if not isinstance(data, dict):
+        LLM_OUTPUT_PARSES.labels(operation, REJECTED).inc()
+        return None
+
+    LLM_OUTPUT_PARSES.labels(operation, outcome).inc()
+    if outcome != VALID:
+        print(f"[LLM] Recovered {operation} answer ({outcome})")
+        LLM_TOKENS_RECOVERED.labels(operation).inc(tokens_used)
+    answer = LLMAnswer(data)
+    answer.outcome = outcome
+    return answer
+
+
+def load_llm_json(content: str | None) -> Tuple[Any, str]:
+    """Parse a completion, repairing broken JSON locally; returns the value and VALID or REPAIRED."""
+    try:
+        return json.loads(content or ""), VALID
+    except json.JSONDecodeError:
+        return repair_json(content or "", return_objects=True), REPAIRED
+
+
+def parse_llm_json(
+    content: str | None,
+    validator: Draft202012Validator,
+    operation: str,
+    defaults: Mapping[str, Any],
+    essential: Sequence[str],
+    tokens_used: int = 0
+) -> Dict[str, Any]:
+    """Validated answer object from a completion; raises LLMOutputError if nothing can be recovered."""
+    data, outcome = load_llm_json(content)
+    result = validate_llm_object(data, validator, operation, defaults, essential, outcome, tokens_used)
+    if result is None:
+        preview = (content or "")[:120].replace("\n", " ")
+        raise LLMOutputError(f"Unusable {operation} answer: {preview!r}")
+    return result
@@ -0,0 +1,187 @@
+# demo_backend/app/services/metrics.py
+"""
+Prometheus metrics for the KYC processing pipeline.
+
+Histograms cover each latency-relevant step (Groq calls, text extraction,
+OCR, document CPU pool tasks, tamper detection, Odoo RPCs, the auth user lookup and workflow stages);
+counters track Groq token usage, fallback activations, recovered LLM
+answers and cache lookups.
+An observation is a couple of dict lookups plus a locked float add, so
+recording stays negligible next to the work being measured. Scraped in
+text format from `GET /metrics`.
+"""
+from __future__ import annotations
+
+from typing import Any, Dict, Tuple
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+
+# Remote calls span sub-second to tens of seconds; local steps are much faster
+LLM_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 16.0, 32.0, 64.0)
+PROCESSING_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+DB_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+GROQ_REQUEST_SECONDS = Histogram(
+    "groq_request_duration_seconds",
+    "Latency of Groq chat completion calls",
+    ["operation"],
+    buckets=LLM_BUCKETS
+)
+GROQ_TIME_TO_FIRST_TOKEN = Histogram(
+    "groq_time_to_first_token_seconds",
+    "Time until the first content of a streamed Groq completion arrived",
+    ["operation"],
+    buckets=LLM_BUCKETS
+)
+GROQ_COALESCED_REQUESTS = Counter(
+    "groq_coalesced_requests_total",
+    "Requests served by joining an identical in-flight Groq call of the same user",
+    ["operation"]
+)
+GROQ_THROTTLE_SECONDS = Histogram(
+    "groq_throttle_wait_seconds",
+    "Time a Groq request waited for client-side rate limit budget",
+    ["operation"],
+    buckets=(0.0, 0.01, 0.05, 0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+)
+GROQ_RETRIES = Counter(
+    "groq_retries_total",
+    "Groq requests retried after a retryable failure",
+    ["operation", "reason"]
+)
+GROQ_HEDGED_REQUESTS = Counter(
+    "groq_hedged_requests_total",
+    "Slow Groq calls by hedge outcome (won, lost, denied by the ratio cap, no_budget)",
+    ["operation", "outcome"]
+)
+GROQ_TOKENS = Counter(
+    "groq_tokens_total",
+    "Tokens consumed by Groq chat completions",
+    ["operation", "kind"]
+)
+TEXT_EXTRACTION_SECONDS = Histogram(
+    "document_text_extraction_duration_seconds",
+    "Time to extract text from an uploaded document",
+    ["file_type"],
+    buckets=PROCESSING_BUCKETS
+)
+OCR_SECONDS = Histogram(
+    "document_ocr_duration_seconds",
+    "Time spent in Tesseract OCR per image",
+    buckets=PROCESSING_BUCKETS
+)
+TAMPER_DETECTION_SECONDS = Histogram(
+    "document_tamper_detection_duration_seconds",
+    "Time to run tamper detection on a document",
+    ["file_type"],
+    buckets=PROCESSING_BUCKETS
+)
+ODOO_RPC_SECONDS = Histogram(
+    "odoo_rpc_duration_seconds",
+    "Latency of Odoo JSON-RPC calls",
+    ["model", "method"],
+    buckets=LLM_BUCKETS
+)
+AUTH_DB_SECONDS = Histogram(
+    "auth_user_lookup_duration_seconds",
+    "Database time to resolve the authenticated user",
+    buckets=DB_BUCKETS
+)
+KYC_STAGE_SECONDS = Histogram(
+    "kyc_stage_duration_seconds",
+    "Wall-clock duration of each KYC workflow stage",
+    ["stage"],
+    buckets=LLM_BUCKETS
+)
+FALLBACKS = Counter(
+    "fallback_activations_total",
+    "Times a component fell back to its non-AI path",
+    ["component"]
+)
+EMAIL_FAST_PATH = Counter(
+    "email_fast_path_total",
+    "Emails answered by the local classifier vs. deferred to Groq",
+    ["result"]
+)
+CIRCUIT_BREAKER_STATE = Gauge(
+    "circuit_breaker_state",
+    "Circuit breaker state (0 closed, 1 half-open, 2 open)",
+    ["breaker"]
+)
+CIRCUIT_BREAKER_REJECTIONS = Counter(
+    "circuit_breaker_rejections_total",
+    "Calls short-circuited because the breaker was open",
+    ["breaker"]
+)
+LLM_OUTPUT_PARSES = Counter(
+    "llm_output_parse_total",
+    "LLM answers by parse outcome (valid, repaired, salvaged, rejected)",
+    ["operation", "outcome"]
+)
+LLM_TOKENS_RECOVERED = Counter(
+    "llm_output_recovered_tokens_total",
+    "Tokens of paid completions kept usable by JSON repair or field salvage",
+    ["operation"]
+)
+CPU_POOL_TASKS = Gauge(
+    "document_cpu_pool_tasks",
+    "Document CPU pool tasks of this process by state (running, queued)",
+    ["state"]
+)
+CPU_POOL_QUEUE_WAIT_SECONDS = Histogram(
+    "document_cpu_pool_queue_wait_seconds",
+    "Time a document CPU task waited for a free worker process",
+    ["task"],
+    buckets=PROCESSING_BUCKETS
+)
+CPU_POOL_TASK_SECONDS = Histogram(
+    "document_cpu_pool_task_duration_seconds",
+    "Time a document CPU task ran in its worker process",
+    ["task"],
+    buckets=PROCESSING_BUCKETS
+)
+CPU_POOL_TIMEOUTS = Counter(
+    "document_cpu_pool_timeouts_total",
+    "Document CPU tasks abandoned after the task timeout",
+    ["task"]
+)
+CPU_POOL_RESTARTS = Counter(
+    "document_cpu_pool_restarts_total",
+    "Times the worker processes were replaced (timeout, broken)",
+    ["reason"]
+)
+CACHE_LOOKUPS = Counter(
+    "result_cache_lookups_total",
+    "Result cache lookups by outcome",
+    ["cache", "result"]
+)
+CACHE_TOKENS_SAVED = Counter(
+    "llm_cache_tokens_saved_total",
+    "Groq tokens not spent because a cached response was reused",
+    ["cache"]
+)
+
+
+def record_groq_usage(operation: str, usage: Any) -> None:
+    """Count prompt/completion tokens from a Groq `usage` object."""
+    if usage is None:
+        return
+    prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+    completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+    GROQ_TOKENS.labels(operation, "prompt").inc(prompt_tokens)
+    GROQ_TOKENS.labels(operation, "completion").inc(completion_tokens)
+
+
+def record_fallback(component: str) -> None:
+    FALLBACKS.labels(component).inc()
+
+
+def record_stage_timings(timings: Dict[str, float]) -> None:
+    """Observe StageGraph timings; per-attachment suffixes (":<index>") are dropped."""
+    for name, seconds in timings.items():
+        KYC_STAGE_SECONDS.labels(name.split(":", 1)[0]).observe(seconds)
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """Current metrics in Prometheus text exposition format."""
+    return generate_latest(), CONTENT_TYPE_LATEST
@@ -0,0 +1,69 @@
+# demo_backend/app/services/micro_batcher.py
+"""
+Collects concurrent single-item calls into small batches.
+
+Callers `await batcher.submit(item)`; items queue up until either
+`max_batch_size` are pending or `max_wait_seconds` has passed since the
+first one arrived, then the handler processes the whole batch in one call
+and each caller receives its own result (or the batch's exception).
+"""
+from __future__ import annotations
+
+import asyncio
+from typing import Awaitable, Callable, Generic, List, Optional, Sequence, Tuple, TypeVar
+
+ItemT = TypeVar("ItemT")
+ResultT = TypeVar("ResultT")
+
+BatchHandler = Callable[[Sequence[ItemT]], Awaitable[Sequence[ResultT]]]
+
+
+class MicroBatcher(Generic[ItemT, ResultT]):
+    """Time/size-windowed batching in front of a batch handler."""
+
+    def __init__(self, name: str, handler: BatchHandler, max_batch_size: int, max_wait_seconds: float):
+        self.name = name
+        self.handler = handler
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait_seconds = max_wait_seconds
+        self._pending: List[Tuple[ItemT, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: set[asyncio.Task] = set()
+
+    async def submit(self, item: ItemT) -> ResultT:
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((item, future))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.max_wait_seconds, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        task = asyncio.create_task(self._run(batch), name=f"{self.name}-batch")
+        # Keep a reference so the task is not garbage collected mid-flight
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: List[Tuple[ItemT, asyncio.Future]]) -> None:
+        try:
+            results = await self.handler([item for item, _ in batch])
+            if len(results) != len(batch):
+                raise RuntimeError(f"{self.name}: handler returned {len(results)} results for {len(batch)} items")
+        except BaseException as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            if not isinstance(e, Exception):
+                raise
+            return
+
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
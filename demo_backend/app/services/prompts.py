@@ -4,6 +4,8 @@ Optimized prompts for KYC AI processing using Groq API.
 Contains system and user prompts for email classification and document analysis.
 """
 
+from jsonschema import Draft202012Validator
+
 # =============================================================================
 # EMAIL CLASSIFICATION PROMPTS
 # =============================================================================
@@ -173,76 +175,39 @@ DOCUMENT_ANALYSIS_SCHEMA = {
     "summary": {"type": "string", "min_length": 10}
 }
 
+# JSON Schemas for the model answers, compiled once at import
+EMAIL_CLASSIFICATION_JSON_SCHEMA = {
+    "type": "object",
+    "required": ["category", "priority", "sentiment", "confidence", "tags", "reasoning"],
+    "properties": {
+        "category": {"enum": EMAIL_CLASSIFICATION_SCHEMA["category"]},
+        "priority": {"enum": EMAIL_CLASSIFICATION_SCHEMA["priority"]},
+        "sentiment": {"enum": EMAIL_CLASSIFICATION_SCHEMA["sentiment"]},
+        "confidence": {"type": "number", "minimum": 0.0, "maximum": 1.0},
+        "tags": {"type": "array", "items": {"type": "string"}},
+        "reasoning": {"type": "string", "minLength": 10}
+    }
+}
+
+DOCUMENT_ANALYSIS_JSON_SCHEMA = {
+    "type": "object",
+    "required": ["document_type", "extracted_entities", "structured_data", "confidence", "summary"],
+    "properties": {
+        "document_type": {"enum": DOCUMENT_ANALYSIS_SCHEMA["document_type"]},
+        "extracted_entities": {"type": "array", "items": {"type": "string"}},
+        "structured_data": {"type": "object"},
+        "confidence": {"type": "number", "minimum": 0.0, "maximum": 1.0},
+        "summary": {"type": "string", "minLength": 10}
+    }
+}
+
+EMAIL_CLASSIFICATION_VALIDATOR = Draft202012Validator(EMAIL_CLASSIFICATION_JSON_SCHEMA)
+DOCUMENT_ANALYSIS_VALIDATOR = Draft202012Validator(DOCUMENT_ANALYSIS_JSON_SCHEMA)
+
 def validate_email_response(response_data: dict) -> bool:
     """Validate email classification response format"""
-    try:
-        # Check required fields exist
-        required_fields = ["category", "priority", "sentiment", "confidence", "tags", "reasoning"]
-        for field in required_fields:
-            if field not in response_data:
-                return False
-        
-        # Validate category
-        if response_data["category"] not in EMAIL_CLASSIFICATION_SCHEMA["category"]:
-            return False
-        
-        # Validate priority  
-        if response_data["priority"] not in EMAIL_CLASSIFICATION_SCHEMA["priority"]:
-            return False
-        
-        # Validate sentiment
-        if response_data["sentiment"] not in EMAIL_CLASSIFICATION_SCHEMA["sentiment"]:
-            return False
-        
-        # Validate confidence
-        confidence = response_data["confidence"]
-        if not isinstance(confidence, (int, float)) or confidence < 0.0 or confidence > 1.0:
-            return False
-        
-        # Validate tags is list
-        if not isinstance(response_data["tags"], list):
-            return False
-        
-        # Validate reasoning has content
-        if not isinstance(response_data["reasoning"], str) or len(response_data["reasoning"]) < 10:
-            return False
-        
-        return True
-        
-    except Exception:
-        return False
+    return EMAIL_CLASSIFICATION_VALIDATOR.is_valid(response_data)
 
 def validate_document_response(response_data: dict) -> bool:
     """Validate document analysis response format"""
-    try:
-        # Check required fields exist
-        required_fields = ["document_type", "extracted_entities", "structured_data", "confidence", "summary"]
-        for field in required_fields:
-            if field not in response_data:
-                return False
-        
-        # Validate document_type
-        if response_data["document_type"] not in DOCUMENT_ANALYSIS_SCHEMA["document_type"]:
-            return False
-        
-        # Validate extracted_entities is list
-        if not isinstance(response_data["extracted_entities"], list):
-            return False
-        
-        # Validate structured_data is dict
-        if not isinstance(response_data["structured_data"], dict):
-            return False
-        
-        # Validate confidence
-        confidence = response_data["confidence"]
-        if not isinstance(confidence, (int, float)) or confidence < 0.0 or confidence > 1.0:
-            return False
-        
-        # Validate summary has content
-        if not isinstance(response_data["summary"], str) or len(response_data["summary"]) < 10:
-            return False
-        
-        return True
-        
-    except Exception:
-        return False
\ No newline at end of file
+    return DOCUMENT_ANALYSIS_VALIDATOR.is_valid(response_data)
@@ -0,0 +1,154 @@
+# demo_backend/app/services/rate_limiter.py
+"""
+Client-side throttling for upstream LLM calls.
+
+Requests pass a requests-per-minute bucket, a tokens-per-minute bucket
+(charged with an estimate of the prompt before sending and settled with the
+real usage afterwards) and a concurrency cap. When the upstream answers 429
+the limiter pauses every caller until the Retry-After time has passed, so a
+burst slows down instead of falling through to the fallback classifiers.
+"""
+from __future__ import annotations
+
+import asyncio
+import random
+import time
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+from typing import AsyncIterator, Dict, List, Mapping, Optional
+
+# Rough chars-per-token ratio for English prompts; only used for budgeting
+CHARS_PER_TOKEN = 4
+
+
+def estimate_prompt_tokens(messages: List[Dict[str, str]]) -> int:
+    """Cheap prompt size estimate (no tokenizer needed)."""
+    chars = sum(len(message.get("content") or "") for message in messages)
+    # A few tokens of framing per message
+    return chars // CHARS_PER_TOKEN + 4 * len(messages)
+
+
+def parse_retry_after(headers: Optional[Mapping[str, str]]) -> Optional[float]:
+    """Seconds to wait according to Retry-After / retry-after-ms headers, if present."""
+    if not headers:
+        return None
+    retry_after_ms = headers.get("retry-after-ms")
+    if retry_after_ms:
+        try:
+            return max(0.0, float(retry_after_ms) / 1000)
+        except ValueError:
+            pass
+    retry_after = headers.get("retry-after")
+    if not retry_after:
+        return None
+    try:
+        return max(0.0, float(retry_after))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt: int, retry_after: Optional[float], base: float, cap: float) -> float:
+    """
+    Delay before retry `attempt` (0-based): the server's Retry-After plus a
+    little jitter, or full-jitter exponential backoff when no hint was sent.
+    """
+    if retry_after is not None:
+        return min(cap, retry_after) + random.uniform(0, min(1.0, 0.1 * retry_after + 0.1))
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class TokenBucket:
+    """Refills `rate_per_minute` units per minute up to `capacity`; may go negative when settled."""
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        self.rate_per_second = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self.level = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate_per_second)
+        self._updated = now
+
+    async def acquire(self, amount: float) -> float:
+        """Wait until `amount` units are available and take them; returns seconds waited."""
+        # Never ask for more than a full bucket or the caller would wait forever
+        amount = min(amount, self.capacity)
+        waited = 0.0
+        # The lock keeps waiters in FIFO order
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.level >= amount:
+                    self.level -= amount
+                    return waited
+                delay = (amount - self.level) / self.rate_per_second
+                await asyncio.sleep(delay)
+                waited += delay
+
+    def adjust(self, delta: float) -> None:
+        """Charge (positive) or refund (negative) units after the fact."""
+        self._refill()
+        self.level = min(self.capacity, self.level - delta)
+
+
+class RateLimiter:
+    """Requests/minute + tokens/minute buckets, a concurrency cap and a shared 429 cooldown."""
+
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int, max_concurrency: int):
+        self.request_bucket = TokenBucket(requests_per_minute) if requests_per_minute > 0 else None
+        self.token_bucket = TokenBucket(tokens_per_minute) if tokens_per_minute > 0 else None
+        self.max_concurrency = max(1, max_concurrency)
+        self._slots = asyncio.Semaphore(self.max_concurrency)
+        self._paused_until = 0.0
+        self.in_flight = 0
+
+    @asynccontextmanager
+    async def slot(self, estimated_tokens: int) -> AsyncIterator[float]:
+        """Hold a request slot; yields the seconds spent waiting for budget."""
+        waited = await self._wait_for_cooldown()
+        if self.request_bucket:
+            waited += await self.request_bucket.acquire(1)
+        if self.token_bucket:
+            waited += await self.token_bucket.acquire(estimated_tokens)
+        started = time.monotonic()
+        async with self._slots:
+            waited += time.monotonic() - started
+            # A 429 may have arrived while this caller was queued
+            waited += await self._wait_for_cooldown()
+            self.in_flight += 1
+            try:
+                yield waited
+            finally:
+                self.in_flight -= 1
+
+    def settle(self, estimated_tokens: int, actual_tokens: int) -> None:
+        """Correct the token bucket once the real usage is known."""
+        if self.token_bucket and actual_tokens:
+            self.token_bucket.adjust(actual_tokens - min(estimated_tokens, self.token_bucket.capacity))
+
+    def pause(self, seconds: float) -> None:
+        """Hold back every caller for `seconds` (after an upstream 429)."""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    async def _wait_for_cooldown(self) -> float:
+        delay = self._paused_until - time.monotonic()
+        if delay <= 0:
+            return 0.0
+        await asyncio.sleep(delay)
+        return delay
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "in_flight": self.in_flight,
+            "max_concurrency": self.max_concurrency,
+            "request_budget": round(self.request_bucket.level, 2) if self.request_bucket else None,
+            "token_budget": round(self.token_bucket.level, 2) if self.token_bucket else None,
+            "paused_for_seconds": round(max(0.0, self._paused_until - time.monotonic()), 2),
+        }
@@ -0,0 +1,196 @@
+# demo_backend/app/services/result_cache.py
+"""
+Two-tier result cache: a bounded in-memory LRU backed by JSON files on disk.
+
+Keys are content addresses (e.g. the SHA-256 of an upload plus a pipeline
+version), so entries never need invalidating - a new pipeline version simply
+produces new keys. The disk tier survives restarts and is shared by every
+worker process on the host. Its files are read and written in a worker
+thread; expired files are deleted when read, and once the directory holds
+more than `max_disk_entries` files the least recently used are removed.
+"""
+from __future__ import annotations
+
+import asyncio
+import copy
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from .metrics import CACHE_LOOKUPS
+
+
+class ResultCache:
+    """Bounded LRU of JSON-serialisable results with an optional disk tier."""
+
+    def __init__(
+        self,
+        name: str,
+        max_entries: int,
+        directory: Optional[str] = None,
+        ttl_seconds: Optional[float] = None,
+        max_disk_entries: int = 10000
+    ):
+        self.name = name
+        self.max_entries = max(1, max_entries)
+        self.directory = directory
+        self.ttl_seconds = ttl_seconds
+        self.max_disk_entries = max(1, max_disk_entries)
+        self._entries: "OrderedDict[str, tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Files in the directory as last counted plus those written since (None until counted)
+        self._disk_entries: Optional[int] = None
+        self._disk_lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(*parts: Any) -> str:
+        """Build a fixed-length key from arbitrary key parts."""
+        return hashlib.sha256("\x1f".join(str(p) for p in parts).encode("utf-8")).hexdigest()
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored_at, value = entry
+                if not self._expired(stored_at, now):
+                    self._entries.move_to_end(key)
+                    self.memory_hits += 1
+                    CACHE_LOOKUPS.labels(self.name, "memory_hit").inc()
+                    return copy.deepcopy(value)
+                del self._entries[key]
+
+        entry = await asyncio.to_thread(self._read_disk, key, now) if self.directory else None
+        if entry is not None:
+            with self._lock:
+                self._remember(key, entry)
+                self.disk_hits += 1
+            CACHE_LOOKUPS.labels(self.name, "disk_hit").inc()
+            return copy.deepcopy(entry[1])
+
+        with self._lock:
+            self.misses += 1
+        CACHE_LOOKUPS.labels(self.name, "miss").inc()
+        return None
+
+    async def set(self, key: str, value: Dict[str, Any]) -> None:
+        entry = (time.time(), copy.deepcopy(value))
+        with self._lock:
+            self._remember(key, entry)
+        if self.directory:
+            await asyncio.to_thread(self._write_disk, key, entry)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "name": self.name,
+                "entries_in_memory": len(self._entries),
+                "max_entries": self.max_entries,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+                "persistent": self.directory is not None,
+                "max_disk_entries": self.max_disk_entries if self.directory else None,
+            }
+
+    def _expired(self, stored_at: float, now: float) -> bool:
+        return self.ttl_seconds is not None and now - stored_at > self.ttl_seconds
+
+    def _remember(self, key: str, entry: tuple) -> None:
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def _read_disk(self, key: str, now: float) -> Optional[tuple]:
+        """Blocking; a live entry, or None (expired files are deleted)."""
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as fh:
+                payload = json.load(fh)
+            entry = payload["stored_at"], payload["value"]
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"[CACHE] {self.name}: unreadable entry {key[:12]}: {e}")
+            return None
+        try:
+            if self._expired(entry[0], now):
+                os.remove(path)
+                with self._disk_lock:
+                    if self._disk_entries:
+                        self._disk_entries -= 1
+                return None
+            # Pruning removes the least recently used files first
+            os.utime(path)
+        except OSError:
+            pass
+        return entry
+
+    def _write_disk(self, key: str, entry: tuple) -> None:
+        """Blocking; persist one entry, then prune the directory if it is over its cap."""
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            existed = os.path.exists(path)
+            # Write then rename so concurrent readers never see a partial file
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as fh:
+                json.dump({"stored_at": entry[0], "value": entry[1]}, fh)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            print(f"[CACHE] {self.name}: failed to persist entry {key[:12]}: {e}")
+            return
+
+        with self._disk_lock:
+            if self._disk_entries is None:
+                self._disk_entries = len(self._disk_files())
+            elif not existed:
+                self._disk_entries += 1
+            if self._disk_entries > self.max_disk_entries:
+                self._prune_disk()
+
+    def _disk_files(self) -> List[Tuple[float, str]]:
+        """(mtime, path) of every entry file in the directory."""
+        files = []
+        for root, _, names in os.walk(self.directory):
+            for filename in names:
+                if filename.endswith(".json"):
+                    path = os.path.join(root, filename)
+                    try:
+                        files.append((os.path.getmtime(path), path))
+                    except OSError:
+                        pass
+        return files
+
+    def _prune_disk(self) -> None:
+        """Delete expired files, then the least recently used down to 90% of the cap (holding _disk_lock)."""
+        files = sorted(self._disk_files())
+        now = time.time()
+        target = int(self.max_disk_entries * 0.9)
+        removed = 0
+        for index, (mtime, path) in enumerate(files):
+            remaining = len(files) - index
+            # mtime is the last use, so this only catches entries unread for a whole TTL
+            expired = self.ttl_seconds is not None and now - mtime > self.ttl_seconds
+            if remaining <= target and not expired:
+                break
+            try:
+                os.remove(path)
+                removed += 1
+            except OSError:
+                pass
+        self._disk_entries = len(files) - removed
+        print(f"[CACHE] {self.name}: pruned {removed} disk entries, {self._disk_entries} left")
@@ -0,0 +1,276 @@
+# demo_backend/app/services/token_ledger.py
+"""
+Persistent Groq token ledger shared by every worker process.
+
+The daily budget (GROQ_DAILY_TOKEN_LIMIT) lives in the database and is
+handed out in leases: a worker claims GROQ_TOKEN_LEASE_SIZE tokens with one
+atomic UPDATE and then reserves from that lease in memory, so the hot path
+never waits on the database. Actual usage per (day, user, model) is
+accumulated locally and flushed in batches with atomic upserts.
+"""
+from __future__ import annotations
+
+import asyncio
+from datetime import date, datetime
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy import func, update
+from sqlalchemy.future import select
+
+from ..config import settings
+from ..models.token_usage import TokenBudgetLease, TokenUsage
+from .database import AsyncSessionLocal, engine
+
+UsageKey = Tuple[date, int, str]
+
+
+class TokenBudgetExceeded(Exception):
+    """Raised when the shared daily token budget is used up."""
+
+
+def user_id_of(user: Any) -> Optional[int]:
+    """Ledger user id for a User model or its `__dict__`; None for anonymous calls."""
+    if user is None:
+        return None
+    if isinstance(user, dict):
+        return user.get("id")
+    return getattr(user, "id", None)
+
+
+def _today() -> date:
+    return datetime.utcnow().date()
+
+
+def _upsert(dialect: str):
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise RuntimeError(f"Token ledger does not support the {dialect} dialect")
+    return insert
+
+
+class TokenLedger:
+    """Per-process view of the shared budget plus a write-behind usage buffer."""
+
+    def __init__(self, daily_limit: int, lease_size: int, flush_interval: float, flush_threshold: int):
+        self.daily_limit = daily_limit
+        self.lease_size = max(1, lease_size)
+        self.flush_interval = flush_interval
+        self.flush_threshold = flush_threshold
+        self._lease_day: Optional[date] = None
+        self._lease_remaining = 0
+        self._lease_lock = asyncio.Lock()
+        self._pending: Dict[UsageKey, list[int]] = {}
+        self._pending_tokens = 0
+        self._flush_lock = asyncio.Lock()
+        self._flush_task: Optional[asyncio.Task] = None
+        # Flush started by record() once the buffer passes flush_threshold
+        self._threshold_flush: Optional[asyncio.Task] = None
+        self._dialect = engine.dialect.name
+
+    async def start(self) -> None:
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_loop(), name="token-ledger-flush")
+
+    async def stop(self) -> None:
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            await asyncio.gather(self._flush_task, return_exceptions=True)
+            self._flush_task = None
+        if self._threshold_flush is not None:
+            await asyncio.gather(self._threshold_flush, return_exceptions=True)
+            self._threshold_flush = None
+        await self.flush()
+        await self._return_lease()
+
+    async def reserve(self, tokens: int) -> None:
+        """Take `tokens` from the local lease, claiming more from the database when it runs out."""
+        self._roll_day()
+        if self._lease_remaining >= tokens:
+            self._lease_remaining -= tokens
+            return
+        async with self._lease_lock:
+            self._roll_day()
+            if self._lease_remaining < tokens:
+                need = max(self.lease_size, tokens - self._lease_remaining)
+                try:
+                    self._lease_remaining += await self._claim_lease(self._lease_day, need)
+                except Exception as e:
+                    # Fail open: a database hiccup must not take the AI features down
+                    print(f"[LEDGER] Could not claim a lease, continuing on a local one: {e}")
+                    self._lease_remaining += need
+            if self._lease_remaining < tokens:
+                raise TokenBudgetExceeded(f"Daily token limit ({self.daily_limit}) exceeded")
+            self._lease_remaining -= tokens
+
+    def release(self, tokens: int) -> None:
+        """Give back a reservation whose call never reached Groq."""
+        self._lease_remaining += tokens
+
+    def record(self, user_id: Optional[int], model: str, tokens: int, reserved: int) -> None:
+        """Book actual usage; the difference to the reservation is settled against the lease."""
+        self._lease_remaining -= tokens - reserved
+        entry = self._pending.setdefault((_today(), user_id or 0, model), [0, 0])
+        entry[0] += tokens
+        entry[1] += 1
+        self._pending_tokens += tokens
+        if self._pending_tokens >= self.flush_threshold and not self._flush_lock.locked():
+            if self._threshold_flush is None or self._threshold_flush.done():
+                self._threshold_flush = asyncio.get_running_loop().create_task(
+                    self.flush(), name="token-ledger-threshold-flush"
+                )
+                self._threshold_flush.add_done_callback(_log_flush_failure)
+
+    async def flush(self) -> None:
+        """Write buffered usage with one atomic upsert."""
+        async with self._flush_lock:
+            if not self._pending:
+                return
+            pending, self._pending, self._pending_tokens = self._pending, {}, 0
+            now = datetime.utcnow()
+            rows = [
+                {"usage_date": day, "user_id": user_id, "model": model, "tokens": tokens, "requests": requests, "updated_at": now}
+                for (day, user_id, model), (tokens, requests) in pending.items()
+            ]
+            insert = _upsert(self._dialect)
+            stmt = insert(TokenUsage).values(rows)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["usage_date", "user_id", "model"],
+                set_={
+                    "tokens": TokenUsage.tokens + stmt.excluded.tokens,
+                    "requests": TokenUsage.requests + stmt.excluded.requests,
+                    "updated_at": stmt.excluded.updated_at,
+                }
+            )
+            try:
+                async with AsyncSessionLocal() as db:
+                    await db.execute(stmt)
+                    await db.commit()
+            except Exception as e:
+                print(f"[LEDGER] Flush failed, keeping {len(rows)} rows for the next attempt: {e}")
+                for key, (tokens, requests) in pending.items():
+                    entry = self._pending.setdefault(key, [0, 0])
+                    entry[0] += tokens
+                    entry[1] += requests
+                    self._pending_tokens += tokens
+
+    async def usage_report(self, user_id: Optional[int] = None) -> Dict[str, Any]:
+        """Today's shared usage by model (and for `user_id`), including unflushed local usage."""
+        await self.flush()
+        today = _today()
+        async with AsyncSessionLocal() as db:
+            by_model = await db.execute(
+                select(TokenUsage.model, func.sum(TokenUsage.tokens), func.sum(TokenUsage.requests))
+                .where(TokenUsage.usage_date == today)
+                .group_by(TokenUsage.model)
+            )
+            models = {model: {"tokens": int(tokens or 0), "requests": int(requests or 0)} for model, tokens, requests in by_model}
+            user_models: Dict[str, Dict[str, int]] = {}
+            if user_id is not None:
+                by_user = await db.execute(
+                    select(TokenUsage.model, TokenUsage.tokens, TokenUsage.requests)
+                    .where(TokenUsage.usage_date == today, TokenUsage.user_id == user_id)
+                )
+                user_models = {model: {"tokens": int(tokens), "requests": int(requests)} for model, tokens, requests in by_user}
+            leased = await db.execute(
+                select(TokenBudgetLease.leased_tokens).where(TokenBudgetLease.usage_date == today)
+            )
+            leased_tokens = int(leased.scalar_one_or_none() or 0)
+
+        used = sum(m["tokens"] for m in models.values())
+        return {
+            "date": today.isoformat(),
+            "daily_token_limit": self.daily_limit,
+            "tokens_used": used,
+            "tokens_remaining": max(0, self.daily_limit - used),
+            "tokens_leased": leased_tokens,
+            "by_model": models,
+            "user": {"user_id": user_id, "by_model": user_models} if user_id is not None else None,
+            "worker_lease_remaining": self._lease_remaining if self._lease_day == today else 0,
+        }
+
+    def _roll_day(self) -> None:
+        today = _today()
+        if self._lease_day != today:
+            # Leases are per day; yesterday's leftovers don't carry over
+            self._lease_day = today
+            self._lease_remaining = 0
+
+    async def _claim_lease(self, day: date, need: int) -> int:
+        """Atomically move up to `need` tokens from the daily budget into this worker's lease."""
+        async with AsyncSessionLocal() as db:
+            insert = _upsert(self._dialect)
+            await db.execute(
+                insert(TokenBudgetLease).values(usage_date=day, leased_tokens=0).on_conflict_do_nothing()
+            )
+            result = await db.execute(
+                update(TokenBudgetLease)
+                .where(TokenBudgetLease.usage_date == day, TokenBudgetLease.leased_tokens + need <= self.daily_limit)
+                .values(leased_tokens=TokenBudgetLease.leased_tokens + need)
+            )
+            if result.rowcount:
+                await db.commit()
+                return need
+
+            # Not enough for a full lease: take whatever is left (compare-and-set)
+            current = await db.execute(
+                select(TokenBudgetLease.leased_tokens).where(TokenBudgetLease.usage_date == day)
+            )
+            leased = int(current.scalar_one())
+            remaining = self.daily_limit - leased
+            if remaining <= 0:
+                await db.commit()
+                return 0
+            result = await db.execute(
+                update(TokenBudgetLease)
+                .where(TokenBudgetLease.usage_date == day, TokenBudgetLease.leased_tokens == leased)
+                .values(leased_tokens=self.daily_limit)
+            )
+            await db.commit()
+            return remaining if result.rowcount else 0
+
+    async def _return_lease(self) -> None:
+        if self._lease_day != _today() or self._lease_remaining <= 0:
+            return
+        try:
+            async with AsyncSessionLocal() as db:
+                await db.execute(
+                    update(TokenBudgetLease)
+                    .where(TokenBudgetLease.usage_date == self._lease_day)
+                    .values(leased_tokens=TokenBudgetLease.leased_tokens - self._lease_remaining)
+                )
+                await db.commit()
+            self._lease_remaining = 0
+        except Exception as e:
+            print(f"[LEDGER] Could not return unused lease: {e}")
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"[LEDGER] Periodic flush failed: {e}")
+
+
+def _log_flush_failure(task: asyncio.Task) -> None:
+    if not task.cancelled() and task.exception() is not None:
+        print(f"[LEDGER] Threshold flush failed: {task.exception()}")
+
+
+# Global instance
+_token_ledger_instance = None
+
+def get_token_ledger() -> TokenLedger:
+    """Get singleton token ledger instance"""
+    global _token_ledger_instance
+    if _token_ledger_instance is None:
+        _token_ledger_instance = TokenLedger(
+            daily_limit=settings.GROQ_DAILY_TOKEN_LIMIT,
+            lease_size=settings.GROQ_TOKEN_LEASE_SIZE,
+            flush_interval=settings.GROQ_LEDGER_FLUSH_SECONDS,
+            flush_threshold=settings.GROQ_LEDGER_FLUSH_TOKENS
+        )
+    return _token_ledger_instance
@@ -0,0 +1,104 @@
+# demo_backend/app/services/train_email_classifier.py
+"""
+Offline training for the local fast-path email classifier.
+
+Reads the LLM labels logged to EMAIL_LABEL_LOG, reports holdout accuracy and
+how many emails the fast path would answer at the threshold, then trains on
+everything and writes the model to EMAIL_FAST_PATH_MODEL:
+
+    python -m app.services.train_email_classifier --labels data/training/email_labels.jsonl \\
+        --out data/models/email_classifier.json
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import time
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+from ..config import settings
+from .fast_classifier import DEFAULT_FEATURE_BITS, HEADS, LinearEmailClassifier
+
+
+def _read_labels(paths: Iterable[str]) -> List[Dict[str, Any]]:
+    examples = []
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if record.get("category") in HEADS["category"]:
+                    examples.append(record)
+    return examples
+
+
+def _evaluate(model: LinearEmailClassifier, examples: Sequence[Dict[str, Any]], threshold: float) -> Dict[str, float]:
+    correct = covered = covered_correct = 0
+    started = time.perf_counter()
+    for example in examples:
+        label, probability = model.predict(example.get("subject", ""), example.get("body", ""))["category"]
+        correct += label == example["category"]
+        if probability >= threshold:
+            covered += 1
+            covered_correct += label == example["category"]
+    elapsed = time.perf_counter() - started
+    n = max(1, len(examples))
+    return {
+        "accuracy": correct / n,
+        "fast_path_coverage": covered / n,
+        "fast_path_precision": covered_correct / covered if covered else 0.0,
+        "predict_ms": elapsed * 1000 / n,
+    }
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Train the local fast-path email classifier from logged LLM labels")
+    parser.add_argument(
+        "--labels", nargs="+", default=[settings.EMAIL_LABEL_LOG] if settings.EMAIL_LABEL_LOG else None, help="JSONL label log(s)"
+    )
+    parser.add_argument("--out", default=settings.EMAIL_FAST_PATH_MODEL, help="Where to write the model")
+    parser.add_argument("--epochs", type=int, default=8)
+    parser.add_argument("--learning-rate", type=float, default=0.5)
+    parser.add_argument("--feature-bits", type=int, default=DEFAULT_FEATURE_BITS)
+    parser.add_argument("--holdout", type=float, default=0.2, help="Share of examples kept for evaluation")
+    parser.add_argument("--threshold", type=float, default=settings.EMAIL_FAST_PATH_THRESHOLD)
+    args = parser.parse_args(argv)
+    if not args.labels:
+        parser.error("no label log: pass --labels or set EMAIL_LABEL_LOG")
+
+    examples = _read_labels(args.labels)
+    if not examples:
+        parser.error("no usable labelled examples found")
+    random.Random(7).shuffle(examples)
+    split = int(len(examples) * (1 - args.holdout)) if len(examples) > 10 else len(examples)
+    train, holdout = examples[:split], examples[split:]
+
+    model = LinearEmailClassifier(feature_bits=args.feature_bits)
+    model.fit(train, epochs=args.epochs, learning_rate=args.learning_rate)
+    report = _evaluate(model, holdout, args.threshold) if holdout else {}
+    print(f"[TRAIN] {len(train)} training / {len(holdout)} holdout examples")
+    for name, value in report.items():
+        print(f"[TRAIN] {name}: {value:.4f}")
+
+    if holdout:
+        # Final model uses every example
+        model = LinearEmailClassifier(feature_bits=args.feature_bits)
+        model.fit(examples, epochs=args.epochs, learning_rate=args.learning_rate)
+    model.metadata = {
+        "trained_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "examples": len(examples),
+        "threshold": args.threshold,
+        "holdout": {name: round(value, 4) for name, value in report.items()},
+    }
+    model.save(args.out)
+    print(f"[TRAIN] Model written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Shared fixtures: a GroqClient whose HTTP calls go to an in-process stand-in
+(httpx.MockTransport) instead of the Groq API, and an in-memory SQLite
+database in place of Postgres.
+"""
+from __future__ import annotations
+
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict, List, Tuple
+
+import httpx
+import pytest
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from app.config import settings
+from app.models.kyc import EmailClassificationResult, ERPIntegrationResult, KYCWorkflowResponse
+from app.services import database, idempotency, token_ledger
+from app.services.groq_client import GroqClient
+from app.services.token_ledger import TokenBudgetExceeded
+
+STANDIN_URL = "http://groq.test"
+
+
+def completion_body(model: str, content: str = '{"category": "Onboarding"}', total_tokens: int = 30) -> Dict[str, Any]:
+    """A minimal chat.completion response."""
+    return {
+        "id": "chatcmpl-test",
+        "object": "chat.completion",
+        "created": 0,
+        "model": model,
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": total_tokens - 10, "completion_tokens": 10, "total_tokens": total_tokens},
+    }
+
+
+def error_response(status: int, headers: Dict[str, str] | None = None) -> httpx.Response:
+    return httpx.Response(status, json={"error": {"message": f"injected {status}", "type": "test"}}, headers=headers)
+
+
+class FakeLedger:
+    """Records reservations and bookings instead of touching the database."""
+
+    def __init__(self, exhausted: bool = False):
+        self.exhausted = exhausted
+        self.reserved: List[int] = []
+        self.recorded: List[Tuple] = []
+        self.released: List[int] = []
+
+    async def reserve(self, tokens: int) -> None:
+        if self.exhausted:
+            raise TokenBudgetExceeded("daily budget used up")
+        self.reserved.append(tokens)
+
+    def record(self, user_id, model, tokens, reserved) -> None:
+        self.recorded.append((user_id, model, tokens, reserved))
+
+    def release(self, tokens: int) -> None:
+        self.released.append(tokens)
+
+
+def completion_args(model: str, text: str = "hello") -> Dict[str, Any]:
+    return {"messages": [{"role": "user", "content": text}], "model": model, "temperature": 0.1, "max_tokens": 50}
+
+
+def workflow_response(customer_id: str = "CUST-1") -> KYCWorkflowResponse:
+    """A minimal finished KYC workflow response."""
+    return KYCWorkflowResponse(
+        email_classification=EmailClassificationResult(
+            category="Onboarding", priority="High", sentiment="Neutral", confidence=0.9, tags=[], reasoning="test"
+        ),
+        erp_integration=ERPIntegrationResult(customer_id=customer_id, status="created", message="ok"),
+        processing_time=0.1
+    )
+
+
+@pytest.fixture
+def model(request: pytest.FixtureRequest) -> str:
+    # Circuit breakers are per model and global, so every test gets its own
+    return f"test-model-{request.node.name}"
+
+
+@pytest.fixture
+def groq_settings(monkeypatch: pytest.MonkeyPatch):
+    overrides = {
+        "GROQ_API_KEY": "test-key",
+        "GROQ_BASE_URL": STANDIN_URL,
+        "GROQ_REQUESTS_PER_MINUTE": 0,
+        "GROQ_TOKENS_PER_MINUTE": 0,
+        "GROQ_MAX_CONCURRENCY": 8,
+        "GROQ_MAX_RETRIES": 3,
+        "GROQ_BACKOFF_BASE_SECONDS": 0.01,
+        "GROQ_BACKOFF_MAX_SECONDS": 5.0,
+        "GROQ_ENABLE_TOKEN_TRACKING": False,
+        "GROQ_HEDGE_ENABLED": False,
+    }
+    for name, value in overrides.items():
+        monkeypatch.setattr(settings, name, value)
+    return settings
+
+
+@pytest.fixture
+def make_groq_client(groq_settings) -> Callable[[Callable[[httpx.Request], Any]], GroqClient]:
+    """Build a GroqClient whose requests are answered by `handler` (sync or async)."""
+    def make(handler: Callable[[httpx.Request], Any]) -> GroqClient:
+        return GroqClient(http_client=httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    return make
+
+
+@pytest.fixture
+def run():
+    """Run a coroutine to completion (the repo does not depend on an async pytest plugin)."""
+    return asyncio.run
+
+
+@pytest.fixture
+def sqlite_db(monkeypatch: pytest.MonkeyPatch):
+    """
+    `async with sqlite_db() as sessions:` - a fresh in-memory database with every
+    table, used by the services that open their own sessions.
+    """
+    @asynccontextmanager
+    async def open_db() -> AsyncIterator[async_sessionmaker]:
+        # One shared connection, since every new :memory: connection is an empty database
+        engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+        sessions = async_sessionmaker(bind=engine, expire_on_commit=False, autoflush=False)
+        for module in (database, idempotency, token_ledger):
+            monkeypatch.setattr(module, "AsyncSessionLocal", sessions)
+        monkeypatch.setattr(database, "engine", engine)
+        monkeypatch.setattr(token_ledger, "engine", engine)
+        try:
+            await database.init_db()
+            yield sessions
+        finally:
+            await engine.dispose()
+    return open_db
@@ -0,0 +1,110 @@
+"""Document analysis (document_service.analyze_document_handle) against a fake Groq client."""
+from __future__ import annotations
+
+import json
+import re
+from typing import Any, Callable, Dict, List
+
+import pytest
+
+from app.services import document_service
+from app.services.document_chunker import ExtractedPages
+from app.services.document_handle import DocumentHandle
+from app.services.result_cache import ResultCache
+
+
+class FakeGroqClient:
+    """Answers document analysis calls with `answer(user_prompt)` and records the prompts."""
+
+    def __init__(self, answer: Callable[[str], Dict[str, Any]]):
+        self.answer = answer
+        self.prompts: List[str] = []
+
+    async def chat_completion(self, messages, **kwargs) -> Dict[str, Any]:
+        prompt = messages[-1]["content"]
+        self.prompts.append(prompt)
+        return {"content": json.dumps(self.answer(prompt)), "tokens_used": 100, "model": "fake", "success": True}
+
+
+def filename_in(prompt: str) -> str:
+    return re.search(r"^FILENAME: (.*)$", prompt, re.MULTILINE).group(1)
+
+
+def analysis_answer(document_type: str = "ID_Document", **structured_data: Any) -> Dict[str, Any]:
+    return {
+        "document_type": document_type,
+        "structured_data": structured_data,
+        "confidence": 0.9,
+        "extracted_entities": [],
+        "summary": "A document analysed by the fake client",
+    }
+
+
+@pytest.fixture
+def fake_groq(monkeypatch):
+    def install(answer: Callable[[str], Dict[str, Any]]) -> FakeGroqClient:
+        client = FakeGroqClient(answer)
+        monkeypatch.setattr(document_service, "get_groq_client", lambda: client)
+        return client
+    return install
+
+
+@pytest.fixture
+def analysis_cache(monkeypatch):
+    cache = ResultCache("test_document_analysis", 16)
+    monkeypatch.setattr(document_service, "_analysis_cache", cache)
+    return cache
+
+
+def test_same_bytes_under_another_filename_are_analysed_again(fake_groq, analysis_cache, run):
+    client = fake_groq(lambda prompt: analysis_answer(source=filename_in(prompt)))
+    data = b"Name: Jane Doe\nDocument number: X123"
+
+    async def scenario():
+        first = await document_service.analyze_document_handle(DocumentHandle("passport.txt", "text/plain", data), None)
+        renamed = await document_service.analyze_document_handle(DocumentHandle("invoice.txt", "text/plain", data), None)
+        again = await document_service.analyze_document_handle(DocumentHandle("passport.txt", "text/plain", data), None)
+        return first, renamed, again
+
+    first, renamed, again = run(scenario())
+    assert [filename_in(prompt) for prompt in client.prompts] == ["passport.txt", "invoice.txt"]
+    assert first["extractedData"] == {"source": "passport.txt"}
+    assert renamed["extractedData"] == {"source": "invoice.txt"}
+    # Resubmitting the same file under the same name is still a cache hit
+    assert again["extractedData"] == {"source": "passport.txt"}
+    assert analysis_cache.memory_hits == 1
+
+
+def excerpt_in(prompt: str) -> str:
+    return re.search(r"^\[Excerpt: (.*) of \d+\]$", prompt, re.MULTILINE).group(1)
+
+
+def test_long_document_is_analysed_per_chunk_and_merged(fake_groq, analysis_cache, monkeypatch, run):
+    # Three 150-char pages per 100-token chunk would overflow, so pages go two by two
+    pages = [f"Page {number} " + "statement line " * 10 for number in range(1, 6)]
+
+    async def extract_pages(handle, budget_chars=None):
+        return ExtractedPages(pages=pages, page_count=8)
+
+    def answer(prompt: str) -> Dict[str, Any]:
+        excerpt = excerpt_in(prompt)
+        if excerpt == "pages 3-4":
+            raise RuntimeError("chunk request failed")
+        if excerpt == "pages 1-2":
+            return analysis_answer("Financial_Document", vendor="ACME", total_amount=None)
+        return analysis_answer("Other", vendor="Someone else", total_amount="50.00")
+
+    monkeypatch.setattr(document_service, "extract_pages", extract_pages)
+    monkeypatch.setattr(document_service.settings, "DOCUMENT_CHUNK_TOKENS", 100)
+    client = fake_groq(answer)
+
+    result = run(document_service.analyze_document_handle(DocumentHandle("statement.pdf", "application/pdf", b"%PDF"), None))
+
+    assert sorted(excerpt_in(prompt) for prompt in client.prompts) == ["page 5", "pages 1-2", "pages 3-4"]
+    # The failed chunk is left out; the others are merged
+    assert result["documentType"] == "Financial_Document"
+    assert result["extractedData"] == {"vendor": "ACME", "total_amount": "50.00"}
+    assert result["pageCount"] == 8
+    assert result["pagesAnalyzed"] == 5
+    text = "\n".join(pages)
+    assert [text[offset:offset + 6] for offset in result["pageOffsets"]] == [f"Page {number}" for number in range(1, 6)]
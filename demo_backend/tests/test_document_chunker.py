@@ -0,0 +1,121 @@
+"""Page-aligned chunking and per-chunk result merging (document_chunker)."""
+from __future__ import annotations
+
+from app.services.document_chunker import (
+    DocumentChunk,
+    ExtractedPages,
+    chunk_pages,
+    merge_chunk_results,
+    merge_structured_data,
+)
+from app.services.rate_limiter import CHARS_PER_TOKEN
+
+
+def page(number: int, chars: int) -> str:
+    """Page text of exactly `chars` characters that names its page."""
+    label = f"Page {number}. "
+    return (label + "x" * chars)[:chars]
+
+
+def test_offsets_point_at_each_page_in_the_joined_text():
+    extracted = ExtractedPages(pages=["first page", "", "third\npage", "4"], page_count=6)
+
+    text = extracted.text
+    assert extracted.offsets == [0, 11, 12, 23]
+    for offset, page_text in zip(extracted.offsets, extracted.pages):
+        assert text[offset:offset + len(page_text)] == page_text
+
+
+def test_pages_are_packed_without_crossing_the_chunk_budget():
+    # 100 tokens per chunk = 400 chars; three 150-char pages fit two to a chunk
+    pages = [page(number, 150) for number in range(1, 6)]
+
+    chunks = chunk_pages(pages, chunk_tokens=100, max_tokens=10_000)
+
+    assert [(chunk.first_page, chunk.last_page) for chunk in chunks] == [(1, 2), (3, 4), (5, 5)]
+    assert all(len(chunk.text) <= 100 * CHARS_PER_TOKEN for chunk in chunks)
+    assert "\n".join(chunk.text for chunk in chunks) == "\n".join(pages)
+
+
+def test_blank_pages_are_skipped_but_keep_their_numbers():
+    pages = [page(1, 150), "   \n", page(3, 150), page(4, 150)]
+
+    chunks = chunk_pages(pages, chunk_tokens=100, max_tokens=10_000)
+
+    assert [(chunk.first_page, chunk.last_page) for chunk in chunks] == [(1, 3), (4, 4)]
+    assert chunks[0].pages == "pages 1-3"
+    assert chunks[1].pages == "page 4"
+    assert chunks[1].text.startswith("Page 4.")
+
+
+def test_oversized_page_is_split_on_paragraphs_and_stays_on_its_page():
+    paragraphs = ["Paragraph %d " % number + "y" * 180 for number in range(4)]
+    pages = [page(1, 50), "\n\n".join(paragraphs), page(3, 50)]
+
+    chunks = chunk_pages(pages, chunk_tokens=100, max_tokens=10_000)
+
+    page_two = [chunk for chunk in chunks if chunk.first_page == chunk.last_page == 2]
+    assert len(page_two) >= 2
+    assert all(len(chunk.text) <= 100 * CHARS_PER_TOKEN for chunk in chunks)
+    # Cuts land on paragraph breaks, so every paragraph survives whole
+    joined = "\n".join(chunk.text for chunk in chunks)
+    assert all(paragraph in joined for paragraph in paragraphs)
+    assert chunks[-1].last_page == 3
+
+
+def test_text_past_the_token_budget_is_dropped():
+    pages = [page(number, 150) for number in range(1, 11)]
+
+    # 100 tokens = 400 chars: pages 1 and 2 whole, then 100 chars of page 3
+    chunks = chunk_pages(pages, chunk_tokens=1000, max_tokens=100)
+
+    assert len(chunks) == 1
+    assert (chunks[0].first_page, chunks[0].last_page) == (1, 3)
+    assert chunks[0].text == "\n".join([pages[0], pages[1], pages[2][:100]])
+
+
+def test_structured_data_keeps_the_first_value_and_concatenates_lists():
+    merged = merge_structured_data([
+        {"full_name": "Jane Doe", "total_amount": None, "items": ["rent"], "address": {"city": "Lyon"}},
+        {"full_name": "J. Doe", "total_amount": "120.00", "items": ["rent", "water"], "address": {"zip": "69001"}},
+        {"total_amount": "999.00", "document_number": "N/A"},
+    ])
+
+    assert merged == {
+        "full_name": "Jane Doe",
+        "total_amount": "120.00",
+        "items": ["rent", "water"],
+        "address": {"city": "Lyon", "zip": "69001"},
+        "document_number": "N/A",
+    }
+
+
+def test_chunk_results_are_merged_by_token_weight():
+    chunks = [
+        DocumentChunk("a" * 400, 1, 2, 100),
+        DocumentChunk("b" * 400, 3, 4, 100),
+        DocumentChunk("c" * 800, 5, 5, 200),
+    ]
+    results = [
+        {"document_type": "Invoice", "confidence": 0.9, "extracted_entities": ["ACME"],
+         "structured_data": {"vendor": "ACME"}, "summary": "Header"},
+        {"document_type": "Other", "confidence": 0.5, "extracted_entities": ["ACME", "Total"],
+         "structured_data": {"total_amount": "50.00"}, "summary": ""},
+        {"document_type": "Other", "confidence": 0.8, "extracted_entities": [],
+         "structured_data": {"vendor": "Someone else"}, "summary": "Terms"},
+    ]
+
+    merged = merge_chunk_results(results, chunks)
+
+    # "Other" outweighs "Invoice" but anything specific wins over it
+    assert merged["document_type"] == "Invoice"
+    assert merged["extracted_entities"] == ["ACME", "Total"]
+    assert merged["structured_data"] == {"vendor": "ACME", "total_amount": "50.00"}
+    assert merged["confidence"] == round((0.9 * 100 + 0.5 * 100 + 0.8 * 200) / 400, 3)
+    assert merged["summary"] == "pages 1-2: Header page 5: Terms"
+
+
+def test_single_chunk_result_is_returned_as_is():
+    result = {"document_type": "ID_Document", "confidence": 0.7, "structured_data": {}, "summary": "An ID"}
+
+    assert merge_chunk_results([result], [DocumentChunk("text", 1, 1, 1)]) is result
@@ -0,0 +1,67 @@
+"""PDF text extraction on the document CPU pool (document_service.extract_pages)."""
+from __future__ import annotations
+
+import fitz
+import pytest
+
+from app.services import document_service
+from app.services.cpu_pool import CPUPool
+from app.services.document_handle import DocumentHandle
+
+
+def make_pdf(page_count: int) -> bytes:
+    doc = fitz.open()
+    for number in range(1, page_count + 1):
+        doc.new_page().insert_text((72, 72), f"Page {number} " + "statement line " * 5)
+    try:
+        return doc.tobytes()
+    finally:
+        doc.close()
+
+
+@pytest.fixture(scope="module")
+def pdf_pool():
+    pool = CPUPool(workers=2, max_tasks_per_worker=50, task_timeout=60)
+    yield pool
+    pool.shutdown()
+
+
+@pytest.fixture
+def use_pool(pdf_pool, monkeypatch):
+    monkeypatch.setattr(document_service.settings, "DOCUMENT_PDF_PAGES_PER_TASK", 7)
+    monkeypatch.setattr(document_service, "get_cpu_pool", lambda: pdf_pool)
+
+
+@pytest.mark.parametrize("page_count, budget_chars", [(3, None), (7, None), (30, None), (30, 1000)])
+def test_pool_extraction_matches_serial_extraction(use_pool, page_count, budget_chars, run):
+    data = make_pdf(page_count)
+    handle = DocumentHandle("statement.pdf", "application/pdf", data)
+
+    extracted = run(document_service.extract_pages(handle, budget_chars))
+
+    serial = document_service.extract_pages_from_handle(DocumentHandle("statement.pdf", "application/pdf", data), budget_chars)
+    assert extracted.page_count == page_count
+    assert extracted.pages == serial.pages
+    # Page count and text both come from the workers
+    assert handle._pdf is None
+
+
+def test_budget_stops_extraction_in_the_first_task(use_pool, run):
+    handle = DocumentHandle("statement.pdf", "application/pdf", make_pdf(30))
+
+    extracted = run(document_service.extract_pages(handle, budget_chars=100))
+
+    assert extracted.page_count == 30
+    assert len(extracted.pages) == 2
+
+
+def test_unreadable_pdf_is_reported_as_text(use_pool, run):
+    extracted = run(document_service.extract_pages(DocumentHandle("broken.pdf", "application/pdf", b"not a pdf")))
+
+    assert extracted.page_count == 1
+    assert extracted.pages[0].startswith("Error extracting text from broken.pdf")
+
+
+def test_raw_bytes_are_not_copied():
+    data = make_pdf(1)
+    assert DocumentHandle("a.pdf", "application/pdf", data).raw_bytes() is data
@@ -0,0 +1,158 @@
+"""Batched email classification (email_service.classify_emails) and MicroBatcher against a fake Groq client."""
+from __future__ import annotations
+
+import asyncio
+import json
+import re
+from typing import Any, Callable, Dict, List, Optional
+
+import pytest
+
+from app.services import email_service
+from app.services.micro_batcher import MicroBatcher
+
+REASONING = "Classified by the fake Groq client"
+
+
+def answer_for(subject: str) -> Dict[str, Any]:
+    """The fake model's answer: the category is the first word of the subject."""
+    return {
+        "category": subject.split()[0],
+        "priority": "Medium",
+        "sentiment": "Neutral",
+        "confidence": 0.9,
+        "tags": [],
+        "reasoning": REASONING,
+    }
+
+
+class FakeGroqClient:
+    """Answers single and batched classification prompts; `batch_content` can override batch answers."""
+
+    def __init__(self, batch_content: Optional[Callable[[List[str]], str]] = None):
+        self.batch_content = batch_content
+        self.calls: List[tuple] = []
+
+    async def chat_completion(self, messages, operation: str = "chat", **kwargs) -> Dict[str, Any]:
+        prompt = messages[-1]["content"]
+        subjects = re.findall(r"^SUBJECT: (.*)$", prompt, re.MULTILINE)
+        self.calls.append((operation, subjects))
+        if operation == "email_classification_batch":
+            if self.batch_content is not None:
+                content = self.batch_content(subjects)
+            else:
+                content = json.dumps({"results": [{"index": i, **answer_for(s)} for i, s in enumerate(subjects)]})
+        else:
+            content = json.dumps(answer_for(subjects[0]))
+        return {"content": content, "tokens_used": 100, "model": "fake", "success": True}
+
+
+@pytest.fixture
+def fake_groq(monkeypatch):
+    """Install a fake client; the cache and the local fast path are off so every email reaches it."""
+    monkeypatch.setattr(email_service, "_classification_cache", None)
+    monkeypatch.setattr(email_service, "_fast_path_answer", lambda subject, body: None)
+    monkeypatch.setattr(email_service.settings, "EMAIL_BATCH_MAX_SIZE", 3)
+
+    def install(batch_content: Optional[Callable[[List[str]], str]] = None) -> FakeGroqClient:
+        client = FakeGroqClient(batch_content)
+        monkeypatch.setattr(email_service, "get_groq_client", lambda: client)
+        return client
+    return install
+
+
+EMAILS = [
+    ("Onboarding request 0", "Please open my account"),
+    ("Dispute about a charge 1", "I was charged twice"),
+    ("Other question 2", "What are your opening hours?"),
+    ("Onboarding documents 3", "Attached is my passport"),
+    ("Dispute follow-up 4", "Still no answer about the charge"),
+]
+
+
+def test_emails_are_split_into_batches_in_order(fake_groq, run):
+    client = fake_groq()
+
+    results = run(email_service.classify_emails(EMAILS, None))
+
+    assert [result["category"] for result in results] == ["Onboarding", "Dispute", "Other", "Onboarding", "Dispute"]
+    assert all(result["reasoning"] == REASONING for result in results)
+    # 3 + 2 emails: two batched requests, nothing classified one by one
+    assert sorted(len(subjects) for _, subjects in client.calls) == [2, 3]
+    assert {operation for operation, _ in client.calls} == {"email_classification_batch"}
+
+
+def test_invalid_and_missing_items_are_classified_individually(fake_groq, run):
+    def batch_content(subjects: List[str]) -> str:
+        items = [{"index": i, **answer_for(s)} for i, s in enumerate(subjects)]
+        items[0]["category"] = "Banana"  # nothing to salvage: the category is essential
+        del items[-1]  # the model skipped the last email
+        return json.dumps({"results": items})
+
+    client = fake_groq(batch_content)
+
+    results = run(email_service.classify_emails(EMAILS[:3], None))
+
+    assert [result["category"] for result in results] == ["Onboarding", "Dispute", "Other"]
+    assert all(result["reasoning"] == REASONING for result in results)
+    singles = sorted(subjects[0] for operation, subjects in client.calls if operation == "email_classification")
+    assert singles == [EMAILS[0][0], EMAILS[2][0]]
+
+
+def test_truncated_batch_keeps_the_complete_items(fake_groq, run):
+    def batch_content(subjects: List[str]) -> str:
+        full = json.dumps({"results": [{"index": i, **answer_for(s)} for i, s in enumerate(subjects)]})
+        # Cut off inside the last item, as with a hit max_tokens
+        return full[:full.rindex('"reasoning"')]
+
+    client = fake_groq(batch_content)
+
+    results = run(email_service.classify_emails(EMAILS[:3], None))
+
+    assert [result["category"] for result in results] == ["Onboarding", "Dispute", "Other"]
+    # The cut item kept its category, so it is salvaged instead of re-requested
+    assert [operation for operation, _ in client.calls] == ["email_classification_batch"]
+    assert [result["reasoning"] for result in results[:2]] == [REASONING, REASONING]
+    assert results[2]["reasoning"] != REASONING
+
+
+def test_unusable_batch_falls_back_to_one_request_per_email(fake_groq, run):
+    client = fake_groq(lambda subjects: "I cannot help with that.")
+
+    results = run(email_service.classify_emails(EMAILS[:3], None))
+
+    assert [result["category"] for result in results] == ["Onboarding", "Dispute", "Other"]
+    singles = sorted(subjects[0] for operation, subjects in client.calls if operation == "email_classification")
+    assert singles == sorted(subject for subject, _ in EMAILS[:3])
+
+
+def test_micro_batcher_flushes_on_size_and_on_timeout(run):
+    batches: List[List[int]] = []
+
+    async def handler(items):
+        batches.append(list(items))
+        return [item * 10 for item in items]
+
+    async def scenario():
+        batcher = MicroBatcher("test", handler, max_batch_size=3, max_wait_seconds=0.05)
+        full = await asyncio.gather(*(batcher.submit(i) for i in range(3)))
+        partial = await asyncio.gather(*(batcher.submit(i) for i in range(3, 5)))
+        return full, partial
+
+    full, partial = run(scenario())
+    assert full == [0, 10, 20]
+    assert partial == [30, 40]
+    assert batches == [[0, 1, 2], [3, 4]]
+
+
+def test_micro_batcher_fails_every_caller_of_a_failed_batch(run):
+    async def short_handler(items):
+        return items[:-1]
+
+    async def scenario():
+        batcher = MicroBatcher("test", short_handler, max_batch_size=2, max_wait_seconds=0.05)
+        return await asyncio.gather(batcher.submit(1), batcher.submit(2), return_exceptions=True)
+
+    results = run(scenario())
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert "returned 1 results for 2 items" in str(results[0])
@@ -0,0 +1,64 @@
+"""Coalescing of identical concurrent calls in GroqClient.chat_completion."""
+from __future__ import annotations
+
+import asyncio
+
+import httpx
+
+from app.services.rate_limiter import estimate_prompt_tokens
+from tests.conftest import FakeLedger, completion_body
+
+MESSAGES = [{"role": "user", "content": "classify this email"}]
+
+
+def slow_handler(model: str, requests: list):
+    async def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        await asyncio.sleep(0.1)
+        return httpx.Response(200, json=completion_body(model, total_tokens=40))
+    return handler
+
+
+def test_identical_calls_from_one_user_share_a_request(make_groq_client, model, groq_settings, run):
+    groq_settings.GROQ_ENABLE_TOKEN_TRACKING = True
+    requests = []
+    ledger = FakeLedger()
+
+    async def scenario():
+        client = make_groq_client(slow_handler(model, requests))
+        client.ledger = ledger
+        try:
+            return await asyncio.gather(*(
+                client.chat_completion(MESSAGES, model=model, operation="test", user_id=7) for _ in range(3)
+            ))
+        finally:
+            await client.aclose()
+
+    results = run(scenario())
+    assert len(requests) == 1
+    assert all(result["success"] for result in results)
+    # Booked once, to the user who sent it
+    estimate = estimate_prompt_tokens(MESSAGES)
+    assert ledger.recorded == [(7, model, 40, estimate)]
+
+
+def test_identical_calls_from_different_users_are_booked_to_each(make_groq_client, model, groq_settings, run):
+    groq_settings.GROQ_ENABLE_TOKEN_TRACKING = True
+    requests = []
+    ledger = FakeLedger()
+
+    async def scenario():
+        client = make_groq_client(slow_handler(model, requests))
+        client.ledger = ledger
+        try:
+            return await asyncio.gather(*(
+                client.chat_completion(MESSAGES, model=model, operation="test", user_id=user_id) for user_id in (7, 8)
+            ))
+        finally:
+            await client.aclose()
+
+    results = run(scenario())
+    assert len(requests) == 2
+    assert all(result["success"] for result in results)
+    estimate = estimate_prompt_tokens(MESSAGES)
+    assert sorted(ledger.recorded) == [(7, model, 40, estimate), (8, model, 40, estimate)]
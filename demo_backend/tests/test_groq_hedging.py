@@ -0,0 +1,142 @@
+"""Hedged Groq requests (GroqClient._send_hedged) against a latency-injecting stand-in."""
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import List, Tuple
+
+import httpx
+import pytest
+
+from app.services.hedging import HedgePolicy, get_hedge_policy
+from app.services.rate_limiter import estimate_prompt_tokens
+from tests.conftest import FakeLedger, completion_args, completion_body
+
+HEDGE_AFTER = 0.1
+SLOW = 2.0
+
+
+@pytest.fixture
+def hedged_operation(request, groq_settings):
+    """An operation with hedging on and a warmed-up latency window (hedge after HEDGE_AFTER s)."""
+    operation = f"hedge-{request.node.name}"
+    groq_settings.GROQ_HEDGE_ENABLED = True
+    groq_settings.GROQ_HEDGE_OPERATIONS = operation
+    groq_settings.GROQ_HEDGE_PERCENTILE = 95
+    groq_settings.GROQ_HEDGE_MAX_RATIO = 1.0
+    groq_settings.GROQ_HEDGE_MIN_SAMPLES = 20
+    groq_settings.GROQ_HEDGE_MIN_DELAY_SECONDS = 0.01
+    groq_settings.GROQ_ENABLE_TOKEN_TRACKING = True
+    policy = get_hedge_policy(operation)
+    for _ in range(20):
+        policy.observe(HEDGE_AFTER)
+    return operation, policy
+
+
+def slow_first_handler(model: str, events: List[Tuple[str, float]]):
+    """The first request hangs for SLOW seconds, every later one answers at once."""
+    async def handler(request: httpx.Request) -> httpx.Response:
+        index = len([name for name, _ in events if name == "arrived"])
+        events.append(("arrived", time.monotonic()))
+        if index == 0:
+            try:
+                await asyncio.sleep(SLOW)
+            except asyncio.CancelledError:
+                events.append(("cancelled", time.monotonic()))
+                raise
+            return httpx.Response(200, json=completion_body(model, '{"answer": "primary"}'))
+        return httpx.Response(200, json=completion_body(model, '{"answer": "hedge"}'))
+    return handler
+
+
+def test_hedge_fires_after_delay_and_first_answer_wins(make_groq_client, model, hedged_operation, run):
+    operation, policy = hedged_operation
+    events: List[Tuple[str, float]] = []
+    ledger = FakeLedger()
+    args = completion_args(model)
+
+    async def scenario():
+        client = make_groq_client(slow_first_handler(model, events))
+        client.ledger = ledger
+        try:
+            started = time.monotonic()
+            completion = await client._send_hedged(args, operation, user_id=7)
+            return completion, started, time.monotonic() - started
+        finally:
+            await client.aclose()
+
+    completion, started, elapsed = run(scenario())
+    arrivals = [at for name, at in events if name == "arrived"]
+    assert len(arrivals) == 2
+    # The hedge delay is measured from the start of the call
+    assert HEDGE_AFTER <= arrivals[1] - started < HEDGE_AFTER + 0.3
+    # The hedge answered first; the hanging primary was not waited for
+    assert completion.choices[0].message.content == '{"answer": "hedge"}'
+    assert elapsed < SLOW / 2
+    assert [name for name, _ in events].count("cancelled") == 1
+    assert policy.snapshot()["hedges"] == 1
+    # The cancelled primary is booked against the hedge's reservation
+    estimate = estimate_prompt_tokens(args["messages"])
+    assert ledger.reserved == [estimate]
+    assert ledger.recorded == [(7, model, estimate, estimate)]
+
+
+def test_no_hedge_when_daily_budget_is_used_up(make_groq_client, model, hedged_operation, run):
+    operation, policy = hedged_operation
+    events: List[Tuple[str, float]] = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        events.append(("arrived", time.monotonic()))
+        await asyncio.sleep(0.3)
+        return httpx.Response(200, json=completion_body(model))
+
+    async def scenario():
+        client = make_groq_client(handler)
+        client.ledger = FakeLedger(exhausted=True)
+        try:
+            return await client._send_hedged(completion_args(model), operation, user_id=None)
+        finally:
+            await client.aclose()
+
+    run(scenario())
+    assert len(events) == 1
+    # The hedge was granted, then refunded when the budget refused it
+    snapshot = policy.snapshot()
+    assert snapshot["hedges"] == 0
+    assert policy.try_hedge()
+
+
+def test_try_hedge_respects_max_ratio():
+    policy = HedgePolicy(percentile=95, max_ratio=0.05, window_size=200, min_samples=1, min_delay=0.0)
+    granted = 0
+    for _ in range(200):
+        policy.hedge_delay()
+        granted += policy.try_hedge()
+    assert granted == 10
+    snapshot = policy.snapshot()
+    assert snapshot["hedges"] == 10
+    assert snapshot["hedges_denied"] == 190
+    assert snapshot["hedge_ratio"] == pytest.approx(0.05)
+
+
+def test_hedge_denied_beyond_ratio_sends_one_request(make_groq_client, model, hedged_operation, run):
+    operation, policy = hedged_operation
+    policy.max_ratio = 0.0
+    events: List[Tuple[str, float]] = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        events.append(("arrived", time.monotonic()))
+        await asyncio.sleep(0.3)
+        return httpx.Response(200, json=completion_body(model))
+
+    async def scenario():
+        client = make_groq_client(handler)
+        client.ledger = FakeLedger()
+        try:
+            return await client._send_hedged(completion_args(model), operation, user_id=None)
+        finally:
+            await client.aclose()
+
+    run(scenario())
+    assert len(events) == 1
+    assert policy.snapshot()["hedges_denied"] == 1
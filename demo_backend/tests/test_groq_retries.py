@@ -0,0 +1,141 @@
+"""Retry behaviour of GroqClient._send_with_retries against an injecting stand-in."""
+from __future__ import annotations
+
+import asyncio
+import time
+
+import groq
+import httpx
+import pytest
+
+from app.services.circuit_breaker import HALF_OPEN, get_circuit_breaker
+from tests.conftest import completion_args, completion_body, error_response
+
+
+def test_retry_after_is_honoured(make_groq_client, model, run):
+    arrivals = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        arrivals.append(time.monotonic())
+        if len(arrivals) == 1:
+            return error_response(429, {"retry-after-ms": "300"})
+        return httpx.Response(200, json=completion_body(model))
+
+    async def scenario():
+        client = make_groq_client(handler)
+        try:
+            return await client._send_with_retries(completion_args(model), "test")
+        finally:
+            await client.aclose()
+
+    completion = run(scenario())
+    assert completion.choices[0].message.content
+    assert len(arrivals) == 2
+    assert arrivals[1] - arrivals[0] >= 0.3
+
+
+def test_rate_limit_pauses_every_caller(make_groq_client, model, run):
+    arrivals = {}
+
+    async def scenario():
+        first_limited = asyncio.Event()
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            text = request.read().decode()
+            caller = "first" if "first" in text else "second"
+            arrivals.setdefault(caller, []).append(time.monotonic())
+            if caller == "first" and len(arrivals[caller]) == 1:
+                first_limited.set()
+                return error_response(429, {"retry-after-ms": "400"})
+            return httpx.Response(200, json=completion_body(model))
+
+        client = make_groq_client(handler)
+        try:
+            first = asyncio.create_task(client._send_with_retries(completion_args(model, "first"), "test"))
+            await first_limited.wait()
+            # Let the first call process its 429 and set the shared cooldown
+            await asyncio.sleep(0.05)
+            assert client.rate_limiter.stats()["paused_for_seconds"] > 0
+            await client._send_with_retries(completion_args(model, "second"), "test")
+            await first
+        finally:
+            await client.aclose()
+
+    run(scenario())
+    # The second caller never had a 429 itself but waited out the first one's Retry-After
+    assert arrivals["second"][0] - arrivals["first"][0] >= 0.4
+
+
+def test_retries_stop_at_max_retries(make_groq_client, model, groq_settings, run):
+    groq_settings.GROQ_MAX_RETRIES = 2
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        return error_response(503, {"retry-after-ms": "1"})
+
+    async def scenario():
+        client = make_groq_client(handler)
+        try:
+            await client._send_with_retries(completion_args(model), "test")
+        finally:
+            await client.aclose()
+
+    with pytest.raises(groq.InternalServerError):
+        run(scenario())
+    assert len(calls) == 3  # first attempt + GROQ_MAX_RETRIES
+
+
+@pytest.mark.parametrize("status", [400, 401, 404, 422])
+def test_client_errors_are_not_retried(make_groq_client, model, status, run):
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        return error_response(status)
+
+    async def scenario():
+        client = make_groq_client(handler)
+        try:
+            await client._send_with_retries(completion_args(model), "test")
+        finally:
+            await client.aclose()
+
+    with pytest.raises(groq.APIStatusError) as excinfo:
+        run(scenario())
+    assert excinfo.value.status_code == status
+    assert len(calls) == 1
+
+
+def test_cancel_while_waiting_for_a_slot_returns_the_probe_permit(make_groq_client, model, groq_settings, run):
+    groq_settings.GROQ_BREAKER_HALF_OPEN_PROBES = 1
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        return httpx.Response(200, json=completion_body(model))
+
+    breaker = get_circuit_breaker(model)
+    with breaker._lock:
+        breaker._transition(HALF_OPEN)
+
+    async def scenario():
+        client = make_groq_client(handler)
+        try:
+            # Every caller is held back, so the probe is still waiting for a slot when cancelled
+            client.rate_limiter.pause(10)
+            probe = asyncio.create_task(client._send_with_retries(completion_args(model), "test"))
+            await asyncio.sleep(0.05)
+            assert not breaker.allow_request() and breaker.rejected == 1
+            probe.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await probe
+
+            client.rate_limiter._paused_until = 0.0
+            return await client._send_with_retries(completion_args(model), "test")
+        finally:
+            await client.aclose()
+
+    assert run(scenario()).choices[0].message.content
+    assert len(calls) == 1
+    assert breaker.state == "closed"
@@ -0,0 +1,176 @@
+"""IdempotencyStore and the idempotent KYC workflow against an in-memory SQLite database."""
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy.future import select
+
+from app.models.idempotency_key import IdempotencyKey
+from app.models.kyc import KYCWorkflowRequest, KYCWorkflowResponse
+from app.services import kyc_service
+from app.services.document_handle import DocumentHandle
+from app.services.idempotency import IdempotencyKeyInProgress, IdempotencyKeyMismatch, IdempotencyStore
+from tests.conftest import workflow_response
+
+USER_ID = 1
+
+
+class CountingExecute:
+    """An `execute` callable that counts its runs and can be held until released."""
+
+    def __init__(self, response: KYCWorkflowResponse | None = None, error: Exception | None = None):
+        self.response = response or workflow_response()
+        self.error = error
+        self.calls = 0
+        self.started = asyncio.Event()
+        self.release = asyncio.Event()
+        self.release.set()
+
+    async def __call__(self) -> KYCWorkflowResponse:
+        self.calls += 1
+        self.started.set()
+        await self.release.wait()
+        if self.error is not None:
+            raise self.error
+        return self.response
+
+
+def make_store(lock_timeout_seconds: float = 5) -> IdempotencyStore:
+    return IdempotencyStore(ttl_seconds=3600, lock_timeout_seconds=lock_timeout_seconds, poll_interval=0.05)
+
+
+async def stored_rows(sessions) -> list:
+    async with sessions() as db:
+        return list((await db.execute(select(IdempotencyKey))).scalars())
+
+
+def test_completed_key_is_replayed_from_the_database(sqlite_db, run):
+    async def scenario():
+        async with sqlite_db() as sessions:
+            execute = CountingExecute()
+            first, first_replayed = await make_store().run(USER_ID, "key-1", "hash", KYCWorkflowResponse, execute)
+            # A new store has no in-process state, like another worker
+            second, second_replayed = await make_store().run(USER_ID, "key-1", "hash", KYCWorkflowResponse, execute)
+            return execute.calls, first, first_replayed, second, second_replayed, await stored_rows(sessions)
+
+    calls, first, first_replayed, second, second_replayed, rows = run(scenario())
+    assert calls == 1
+    assert (first_replayed, second_replayed) == (False, True)
+    assert second == first
+    assert [row.status for row in rows] == ["completed"]
+
+
+def test_concurrent_duplicate_waits_for_the_running_execution(sqlite_db, run):
+    async def scenario():
+        async with sqlite_db():
+            store = make_store()
+            execute = CountingExecute()
+            execute.release.clear()
+            original = asyncio.create_task(store.run(USER_ID, "key-1", "hash", KYCWorkflowResponse, execute))
+            await execute.started.wait()
+            duplicate = asyncio.create_task(store.run(USER_ID, "key-1", "hash", KYCWorkflowResponse, execute))
+            await asyncio.sleep(0.05)
+            assert not duplicate.done()
+            execute.release.set()
+            return execute.calls, await original, await duplicate
+
+    calls, (first, first_replayed), (second, second_replayed) = run(scenario())
+    assert calls == 1
+    assert (first_replayed, second_replayed) == (False, True)
+    assert second == first
+
+
+def test_key_reused_with_another_payload_is_rejected(sqlite_db, run):
+    async def scenario():
+        async with sqlite_db():
+            store = make_store()
+            await store.run(USER_ID, "key-1", "hash-a", KYCWorkflowResponse, CountingExecute())
+            await store.run(USER_ID, "key-1", "hash-b", KYCWorkflowResponse, CountingExecute())
+
+    with pytest.raises(IdempotencyKeyMismatch):
+        run(scenario())
+
+
+def test_key_held_by_another_worker_times_out_with_in_progress(sqlite_db, run):
+    async def scenario():
+        async with sqlite_db() as sessions:
+            async with sessions() as db:
+                # Claimed by another worker a moment after this request started waiting
+                db.add(IdempotencyKey(
+                    user_id=USER_ID,
+                    key="key-1",
+                    request_hash="hash",
+                    status="in_progress",
+                    created_at=datetime.utcnow() + timedelta(seconds=1)
+                ))
+                await db.commit()
+            await make_store(lock_timeout_seconds=0.3).run(USER_ID, "key-1", "hash", KYCWorkflowResponse, execute)
+
+    execute = CountingExecute()
+    with pytest.raises(IdempotencyKeyInProgress):
+        run(scenario())
+    assert execute.calls == 0
+
+
+def test_failed_execution_releases_the_key(sqlite_db, run):
+    async def scenario():
+        async with sqlite_db() as sessions:
+            store = make_store()
+            with pytest.raises(RuntimeError):
+                await store.run(USER_ID, "key-1", "hash", KYCWorkflowResponse, CountingExecute(error=RuntimeError("odoo down")))
+            rows_after_failure = await stored_rows(sessions)
+            retry = CountingExecute()
+            response, replayed = await store.run(USER_ID, "key-1", "hash", KYCWorkflowResponse, retry)
+            return rows_after_failure, retry.calls, replayed
+
+    rows_after_failure, retry_calls, replayed = run(scenario())
+    assert rows_after_failure == []
+    assert retry_calls == 1
+    assert replayed is False
+
+
+def test_cancelled_request_leaves_the_uploads_to_the_running_workflow(sqlite_db, monkeypatch, run):
+    handle = DocumentHandle("id.txt", "text/plain", b"Jane Doe")
+    workflow_release = asyncio.Event()
+    events = []
+
+    async def read_attachments(files):
+        return [handle]
+
+    def close_attachments(attachments):
+        events.append("closed")
+
+    async def run_kyc_workflow(subject, body, attachments, user):
+        events.append("started")
+        await workflow_release.wait()
+        events.append("finished")
+        return workflow_response()
+
+    monkeypatch.setattr(kyc_service, "read_attachments", read_attachments)
+    monkeypatch.setattr(kyc_service, "close_attachments", close_attachments)
+    monkeypatch.setattr(kyc_service, "run_kyc_workflow", run_kyc_workflow)
+    store = make_store()
+    monkeypatch.setattr(kyc_service, "get_idempotency_store", lambda: store)
+
+    async def scenario():
+        async with sqlite_db() as sessions:
+            user = type("User", (), {"id": USER_ID})()
+            request = KYCWorkflowRequest(subject="Onboarding", body="Please onboard me")
+            call = asyncio.create_task(kyc_service.process_idempotent_kyc_workflow(request, user, "key-1"))
+            while "started" not in events:
+                await asyncio.sleep(0.01)
+            # The client disconnects while the workflow is running
+            call.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await call
+            events.append("request cancelled")
+            workflow_release.set()
+            while store._inflight:
+                await asyncio.sleep(0.01)
+            return await stored_rows(sessions)
+
+    rows = run(scenario())
+    assert events == ["started", "request cancelled", "finished", "closed"]
+    assert [row.status for row in rows] == ["completed"]
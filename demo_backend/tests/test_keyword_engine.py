@@ -0,0 +1,40 @@
+"""KeywordMatcher against the bundled keyword table."""
+from __future__ import annotations
+
+import pytest
+
+from app.services.keyword_engine import DEFAULT_RULES_PATH, KeywordMatcher
+
+
+@pytest.fixture(scope="module")
+def matcher() -> KeywordMatcher:
+    return KeywordMatcher.from_file(DEFAULT_RULES_PATH)
+
+
+@pytest.mark.parametrize(
+    "filename, expected",
+    [
+        ("DriversLicense.pdf", "ID_Document"),
+        ("passportscan.jpg", "ID_Document"),
+        ("id_scan.png", "ID_Document"),
+        ("PhoneBill.pdf", "Financial_Document"),
+        ("bank-statements-2024.pdf", "Financial_Document"),
+        ("video.mp4", None),
+        ("profile.pdf", None),
+        ("billboard.png", None),
+    ],
+)
+def test_document_type_from_filename(matcher, filename, expected):
+    assert matcher.first(matcher.scan(filename), "document_type") == expected
+
+
+def test_wildcards_respect_word_boundaries():
+    matcher = KeywordMatcher({"g": {"start": ["attach*"], "end": ["*bill"], "inside": ["*cense*"], "word": ["new"]}})
+
+    assert matcher.labels(matcher.scan("see attached"), "g") == ["start"]
+    assert matcher.labels(matcher.scan("reattach it"), "g") == []
+    assert matcher.labels(matcher.scan("my phonebill"), "g") == ["end"]
+    assert matcher.labels(matcher.scan("the bills"), "g") == []
+    assert matcher.labels(matcher.scan("DriversLicense"), "g") == ["inside"]
+    assert matcher.labels(matcher.scan("renewal"), "g") == []
+    assert matcher.labels(matcher.scan("New"), "g") == ["word"]
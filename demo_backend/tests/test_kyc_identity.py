@@ -0,0 +1,44 @@
+"""Customer identity taken from a streamed document analysis (kyc_service._identity_from_fields)."""
+from __future__ import annotations
+
+import pytest
+
+from app.services.kyc_service import DocumentIdentity, _identity_from_fields, _select_primary_document
+
+
+@pytest.mark.parametrize(
+    "document_type, confidence, expected_type, expected_confidence",
+    [
+        ("ID_Document", 0.9, "ID_Document", 0.9),
+        ("id document", 0.9, "ID_Document", 0.9),
+        ("ID-DOCUMENT", "0.9", "ID_Document", 0.9),
+        ("proof of address", 85, "Proof_of_Address", 0.85),
+    ],
+)
+def test_streamed_fields_are_normalised(document_type, confidence, expected_type, expected_confidence):
+    identity = _identity_from_fields(
+        {"document_type": document_type, "structured_data": {"fullName": "Jane Doe"}, "confidence": confidence}
+    )
+    assert identity == DocumentIdentity(expected_type, expected_confidence, {"fullName": "Jane Doe"})
+
+
+@pytest.mark.parametrize(
+    "fields",
+    [
+        {"document_type": "passport", "structured_data": {}, "confidence": 0.9},
+        {"document_type": "ID_Document", "structured_data": {}},
+        {"document_type": "ID_Document", "structured_data": "Jane Doe", "confidence": 0.9},
+    ],
+)
+def test_unusable_fields_give_no_identity(fields):
+    assert _identity_from_fields(fields) is None
+
+
+def test_normalised_id_document_is_selected_as_primary():
+    statement = _identity_from_fields(
+        {"document_type": "Financial_Document", "structured_data": {"name": "Jane Doe"}, "confidence": 0.95}
+    )
+    passport = _identity_from_fields(
+        {"document_type": "id_document", "structured_data": {"fullName": "Jane Doe"}, "confidence": 0.7}
+    )
+    assert _select_primary_document([statement, passport]) == 1
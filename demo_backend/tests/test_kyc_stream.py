@@ -0,0 +1,69 @@
+"""Streamed KYC workflow (kyc_service.stream_kyc_workflow) with the workflow itself stubbed."""
+from __future__ import annotations
+
+import asyncio
+
+from app.models.kyc import ERPIntegrationResult
+from app.services import kyc_service
+from app.services.document_handle import DocumentHandle
+from tests.conftest import workflow_response
+
+
+def install_workflow(monkeypatch, closed: list, release: asyncio.Event | None = None) -> None:
+    async def run_kyc_workflow(subject, body, attachments, user, listener=None):
+        if release is not None:
+            await release.wait()
+        erp = ERPIntegrationResult(customer_id="CUST-1", status="created", message="ok")
+        listener("erp_record", "completed", erp)
+        return workflow_response()
+
+    monkeypatch.setattr(kyc_service, "run_kyc_workflow", run_kyc_workflow)
+    monkeypatch.setattr(kyc_service, "close_attachments", lambda attachments: closed.append(list(attachments)))
+
+
+def test_events_are_streamed_and_uploads_closed(monkeypatch, run):
+    closed = []
+    install_workflow(monkeypatch, closed)
+    handle = DocumentHandle("id.txt", "text/plain", b"Jane Doe")
+
+    async def scenario():
+        return [event async for event, _ in kyc_service.stream_kyc_workflow("s", "b", [handle], None)]
+
+    assert run(scenario()) == ["erp_integration", "complete"]
+    assert closed == [[handle]]
+
+
+def test_uploads_are_closed_when_the_stream_is_never_read(monkeypatch, run):
+    closed = []
+    install_workflow(monkeypatch, closed)
+    handle = DocumentHandle("id.txt", "text/plain", b"Jane Doe")
+
+    async def scenario():
+        # The client disconnected before the response started, so nothing iterates the events
+        kyc_service.stream_kyc_workflow("s", "b", [handle], None)
+        for _ in range(10):
+            await asyncio.sleep(0)
+
+    run(scenario())
+    assert closed == [[handle]]
+
+
+def test_workflow_keeps_running_when_the_reader_goes_away(monkeypatch, run):
+    closed = []
+    release = asyncio.Event()
+    install_workflow(monkeypatch, closed, release)
+    handle = DocumentHandle("id.txt", "text/plain", b"Jane Doe")
+
+    async def scenario():
+        events = kyc_service.stream_kyc_workflow("s", "b", [handle], None)
+        reader = asyncio.create_task(events.__anext__())
+        await asyncio.sleep(0.01)
+        reader.cancel()
+        await asyncio.gather(reader, return_exceptions=True)
+        assert closed == []
+        release.set()
+        for _ in range(10):
+            await asyncio.sleep(0)
+
+    run(scenario())
+    assert closed == [[handle]]
@@ -0,0 +1,147 @@
+"""Parsing, repair and field salvage of LLM answers (llm_output)."""
+from __future__ import annotations
+
+import json
+
+import pytest
+
+from app.services.email_service import EMAIL_ANSWER_DEFAULTS, EMAIL_ANSWER_ESSENTIAL
+from app.services.llm_output import (
+    REJECTED,
+    REPAIRED,
+    SALVAGED,
+    VALID,
+    LLMOutputError,
+    load_llm_json,
+    parse_llm_json,
+    salvage,
+)
+from app.services.metrics import LLM_OUTPUT_PARSES, LLM_TOKENS_RECOVERED
+from app.services.prompts import EMAIL_CLASSIFICATION_VALIDATOR
+
+ANSWER = {
+    "category": "Onboarding",
+    "priority": "High",
+    "sentiment": "Positive",
+    "confidence": 0.92,
+    "tags": ["new_customer"],
+    "reasoning": "The customer asks to open an account",
+}
+
+
+def parse(content: str, operation: str, tokens_used: int = 0):
+    return parse_llm_json(
+        content, EMAIL_CLASSIFICATION_VALIDATOR, operation, EMAIL_ANSWER_DEFAULTS, EMAIL_ANSWER_ESSENTIAL, tokens_used
+    )
+
+
+def parses(operation: str, outcome: str) -> float:
+    return LLM_OUTPUT_PARSES.labels(operation, outcome)._value.get()
+
+
+def test_valid_answer_is_returned_as_is():
+    before = parses("test_valid", VALID)
+
+    answer = parse(json.dumps(ANSWER), "test_valid")
+
+    assert answer == ANSWER
+    assert answer.outcome == VALID
+    assert parses("test_valid", VALID) == before + 1
+
+
+@pytest.mark.parametrize(
+    "content",
+    [
+        "```json\n" + json.dumps(ANSWER) + "\n```",
+        json.dumps(ANSWER).replace('"', "'"),
+        json.dumps(ANSWER)[:-1] + ",}",
+        # Cut off after the last value, as with a hit max_tokens
+        json.dumps(ANSWER)[:-1],
+    ],
+    ids=["code fence", "single quotes", "trailing comma", "missing brace"],
+)
+def test_broken_json_is_repaired(content):
+    answer = parse(content, "test_repaired", tokens_used=120)
+
+    assert answer == ANSWER
+    assert answer.outcome == REPAIRED
+
+
+def test_repaired_tokens_are_counted_as_recovered():
+    recovered = LLM_TOKENS_RECOVERED.labels("test_recovered_tokens")
+    before = parses("test_recovered_tokens", REPAIRED), recovered._value.get()
+
+    parse(json.dumps(ANSWER)[:-1], "test_recovered_tokens", tokens_used=120)
+
+    assert (parses("test_recovered_tokens", REPAIRED), recovered._value.get()) == (before[0] + 1, before[1] + 120)
+
+
+def test_truncated_answer_keeps_the_complete_fields():
+    content = json.dumps(ANSWER)
+    # Cut inside the reasoning string: too short for the schema once repaired
+    content = content[:content.index('"reasoning"') + len('"reasoning": "The')]
+
+    answer = parse(content, "test_truncated")
+
+    assert answer.outcome == SALVAGED
+    assert {key: answer[key] for key in ("category", "priority", "sentiment", "confidence", "tags")} == {
+        key: ANSWER[key] for key in ("category", "priority", "sentiment", "confidence", "tags")
+    }
+    assert answer["reasoning"] == EMAIL_ANSWER_DEFAULTS["reasoning"]
+
+
+def test_fields_are_coerced_where_the_intent_is_clear():
+    content = json.dumps({
+        "category": "onboarding",
+        "priority": "HIGH",
+        "sentiment": "positive",
+        "confidence": "85%",
+        "tags": "new_customer",
+        "reasoning": "The customer asks to open an account",
+    })
+
+    answer = parse(content, "test_coerced")
+
+    assert answer == ANSWER | {"confidence": 0.85}
+    assert answer.outcome == SALVAGED
+
+
+def test_invalid_optional_fields_are_replaced_by_defaults():
+    data = ANSWER | {"priority": "Urgent", "confidence": "very sure"}
+    data.pop("tags")
+
+    result = salvage(data, EMAIL_CLASSIFICATION_VALIDATOR, EMAIL_ANSWER_DEFAULTS, EMAIL_ANSWER_ESSENTIAL)
+
+    assert result == ANSWER | {
+        "priority": EMAIL_ANSWER_DEFAULTS["priority"],
+        "confidence": EMAIL_ANSWER_DEFAULTS["confidence"],
+        "tags": [],
+    }
+    # Defaults are copied, not shared between answers
+    result["tags"].append("changed")
+    assert EMAIL_ANSWER_DEFAULTS["tags"] == []
+
+
+@pytest.mark.parametrize(
+    "content",
+    [
+        json.dumps(ANSWER | {"category": "Banana"}),
+        json.dumps({key: value for key, value in ANSWER.items() if key != "category"}),
+        "I cannot classify this email.",
+        "",
+        "[1, 2, 3]",
+    ],
+    ids=["invalid essential field", "missing essential field", "prose", "empty", "not an object"],
+)
+def test_unusable_answer_is_rejected(content):
+    before = parses("test_rejected", REJECTED)
+
+    with pytest.raises(LLMOutputError):
+        parse(content, "test_rejected")
+
+    assert parses("test_rejected", REJECTED) == before + 1
+
+
+def test_load_reports_whether_the_json_was_repaired():
+    assert load_llm_json('{"results": []}') == ({"results": []}, VALID)
+    assert load_llm_json('{"results": [{"index": 0}') == ({"results": [{"index": 0}]}, REPAIRED)
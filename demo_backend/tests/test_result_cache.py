@@ -0,0 +1,52 @@
+"""Disk tier of ResultCache: expiry, pruning and reads across instances."""
+from __future__ import annotations
+
+import glob
+import os
+import time
+
+from app.services.result_cache import ResultCache
+
+
+def _files(directory) -> list:
+    return glob.glob(os.path.join(str(directory), "*", "*.json"))
+
+
+def test_disk_entry_survives_a_new_instance(tmp_path, run):
+    key = ResultCache.make_key("doc", 1)
+    run(ResultCache("test", 4, str(tmp_path)).set(key, {"answer": 42}))
+
+    fresh = ResultCache("test", 4, str(tmp_path))
+    assert run(fresh.get(key)) == {"answer": 42}
+    assert fresh.disk_hits == 1
+
+
+def test_expired_disk_entry_is_deleted_on_read(tmp_path, run):
+    cache = ResultCache("test", 4, str(tmp_path), ttl_seconds=60)
+    key = ResultCache.make_key("email", 1)
+    # Stored an hour ago, e.g. by an earlier run
+    cache._write_disk(key, (time.time() - 3600, {"answer": 1}))
+    assert len(_files(tmp_path)) == 1
+
+    assert run(cache.get(key)) is None
+    assert _files(tmp_path) == []
+
+
+def test_disk_tier_is_pruned_to_its_cap(tmp_path, run):
+    cache = ResultCache("test", 2, str(tmp_path), max_disk_entries=10)
+    keys = [ResultCache.make_key("doc", i) for i in range(10)]
+    for i, key in enumerate(keys):
+        run(cache.set(key, {"i": i}))
+        os.utime(cache._path(key), (1000 + i, 1000 + i))
+    assert len(_files(tmp_path)) == 10
+
+    # A read marks the oldest entry as recently used, so it outlives the pruning
+    fresh = ResultCache("test", 2, str(tmp_path), max_disk_entries=10)
+    assert run(fresh.get(keys[0])) == {"i": 0}
+    run(fresh.set(ResultCache.make_key("doc", 10), {"i": 10}))
+
+    remaining = _files(tmp_path)
+    assert len(remaining) == 9
+    assert os.path.exists(fresh._path(keys[0]))
+    assert not os.path.exists(fresh._path(keys[1]))
+    assert not os.path.exists(fresh._path(keys[2]))
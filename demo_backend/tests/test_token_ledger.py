@@ -0,0 +1,81 @@
+"""TokenLedger write-behind flushing against an in-memory SQLite database."""
+from __future__ import annotations
+
+import asyncio
+
+from sqlalchemy.future import select
+
+from app.models.token_usage import TokenUsage
+from app.services.token_ledger import TokenLedger
+
+
+def make_ledger() -> TokenLedger:
+    return TokenLedger(daily_limit=1_000_000, lease_size=1000, flush_interval=3600, flush_threshold=100)
+
+
+async def usage_rows(sessions) -> list:
+    async with sessions() as db:
+        result = await db.execute(select(TokenUsage.user_id, TokenUsage.model, TokenUsage.tokens, TokenUsage.requests))
+        return sorted(tuple(row) for row in result)
+
+
+def test_threshold_flush_writes_the_buffer(sqlite_db, run):
+    async def scenario():
+        async with sqlite_db() as sessions:
+            ledger = make_ledger()
+            ledger.record(7, "model-a", 60, 0)
+            assert ledger._threshold_flush is None
+            ledger.record(7, "model-a", 60, 0)
+            await ledger._threshold_flush
+            return await usage_rows(sessions), ledger._pending
+
+    rows, pending = run(scenario())
+    assert rows == [(7, "model-a", 120, 2)]
+    assert pending == {}
+
+
+def test_only_one_threshold_flush_runs_at_a_time(sqlite_db, monkeypatch, run):
+    async def scenario():
+        async with sqlite_db() as sessions:
+            ledger = make_ledger()
+            flushes = []
+            release = asyncio.Event()
+            flush = ledger.flush
+
+            async def slow_flush() -> None:
+                flushes.append(len(ledger._pending))
+                await release.wait()
+                await flush()
+
+            monkeypatch.setattr(ledger, "flush", slow_flush)
+            ledger.record(7, "model-a", 150, 0)
+            first = ledger._threshold_flush
+            await asyncio.sleep(0)
+            ledger.record(8, "model-a", 150, 0)
+            assert ledger._threshold_flush is first
+            release.set()
+            await ledger.stop()
+            return flushes, await usage_rows(sessions)
+
+    flushes, rows = run(scenario())
+    # The threshold flush and the final flush in stop(); the second record() did not start another
+    assert len(flushes) == 2
+    assert rows == [(7, "model-a", 150, 1), (8, "model-a", 150, 1)]
+
+
+def test_failed_threshold_flush_is_logged(sqlite_db, monkeypatch, capsys, run):
+    async def scenario():
+        async with sqlite_db():
+            ledger = make_ledger()
+
+            async def broken_flush() -> None:
+                raise RuntimeError("database is gone")
+
+            monkeypatch.setattr(ledger, "flush", broken_flush)
+            ledger.record(7, "model-a", 150, 0)
+            task = ledger._threshold_flush
+            await asyncio.gather(task, return_exceptions=True)
+            await asyncio.sleep(0)
+
+    run(scenario())
+    assert "[LEDGER] Threshold flush failed: database is gone" in capsys.readouterr().out
@@ -37,6 +37,8 @@ export interface EmailClassificationResponse {
 export interface DocumentAnalysisResponse {
   documentType: string;
   pageCount: number;
+  pagesAnalyzed?: number;
+  pageOffsets?: number[];
   entities: string[];
   detectedCurrency?: string;
   confidence: number;